@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+"""
+Async serving mode (optional; needs ``pip install -r requirements-async.txt``).
+
+An aiohttp application that serves the I/O-bound routes on an event loop:
+``/api/chatbot``, ``/api/chatbot/stream``, ``/api/weather`` and
+``/api/advisory`` call Gemini (REST) and OpenWeatherMap through non-blocking
+clients, so a waiting request costs a coroutine rather than a worker thread. ``/api/predict`` is scored in
+a thread pool so the loop never runs the forest. Every other route is served
+by the Flask app from app.py in a thread pool, so this is a drop-in
+replacement for it; caches, models, analytics and metrics are shared.
+
+    python async_app.py
+    GUNICORN_WORKER_CLASS=aiohttp.GunicornWebWorker gunicorn async_app:app
+"""
+
+import asyncio
+import contextvars
+import functools
+import io
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from aiohttp import web
+except ImportError as e:
+    raise ImportError('Async mode needs aiohttp: pip install -r requirements-async.txt') from e
+
+import app as sync_app
+from backend.advisory import AdvisoryRequest, StageTimings, advisory_payload, explanation_question
+from backend.chat_cache import cache_key
+from backend.crop_model import features_from_sample
+from backend.http_client import AsyncUpstreamClient, get_client
+from backend.responses import dumps_bytes
+from backend.singleflight import AsyncSingleFlight
+
+logger = logging.getLogger(__name__)
+
+GEMINI_REST_ENDPOINT = (sync_app.GEMINI_API_ENDPOINT or 'https://generativelanguage.googleapis.com').rstrip('/')
+# Concurrent upstream calls per worker; waiting calls are cheap here
+ASYNC_MAX_IN_FLIGHT = int(os.environ.get('ASYNC_MAX_IN_FLIGHT', 1000))
+ASYNC_PREDICT_THREADS = int(os.environ.get('ASYNC_PREDICT_THREADS', min(4, os.cpu_count() or 1)))
+ASYNC_WSGI_THREADS = int(os.environ.get('ASYNC_WSGI_THREADS', 16))
+
+weather_client = get_client(
+    'openweathermap-async', client_class=AsyncUpstreamClient,
+    base_url=sync_app.weather_client.base_url,
+    read_timeout=sync_app.weather_client.timeout[1],
+    max_in_flight=ASYNC_MAX_IN_FLIGHT,
+)
+gemini_client = get_client(
+    'gemini-async', client_class=AsyncUpstreamClient,
+    read_timeout=sync_app.GEMINI_TIMEOUT, retries=1,
+    max_in_flight=ASYNC_MAX_IN_FLIGHT,
+)
+weather_flight = AsyncSingleFlight('weather')
+gemini_flight = AsyncSingleFlight('gemini')
+predict_pool = ThreadPoolExecutor(max_workers=ASYNC_PREDICT_THREADS, thread_name_prefix='predict')
+wsgi_pool = ThreadPoolExecutor(max_workers=ASYNC_WSGI_THREADS, thread_name_prefix='wsgi')
+
+_FALLBACK_ROUTE = '/{tail:.*}'
+# Same encoder as the Flask app's JSON provider (orjson when installed)
+json_response = functools.partial(web.json_response, dumps=lambda obj: dumps_bytes(obj).decode('utf-8'))
+_HOP_BY_HOP = frozenset(['connection', 'keep-alive', 'transfer-encoding', 'upgrade'])
+
+
+class GeminiError(Exception):
+    """Non-success response from the Gemini REST API"""
+
+
+async def _fetch_weather_async(lat, lon):
+    if not sync_app.WEATHER_API_KEY:
+        logger.error("Weather API key not configured")
+        return None
+    try:
+        params = {'lat': str(lat), 'lon': str(lon), 'appid': sync_app.WEATHER_API_KEY, 'units': 'metric'}
+        response = await weather_client.get('weather', params=params)
+        if response.status_code == 200:
+            return sync_app.weather_from_response(response.json())
+        logger.error(f"Weather API error: {response.status_code} - {response.text}")
+    except Exception as e:
+        logger.error(f"Weather API error: {e!r}")
+    return None
+
+
+sync_app.weather_cache.use_async(_fetch_weather_async, weather_flight)
+
+
+def _gemini_request(method, prompt):
+    url = f"{GEMINI_REST_ENDPOINT}/v1beta/models/{sync_app.GEMINI_MODEL_NAME}:{method}"
+    body = {'contents': [{'role': 'user', 'parts': [{'text': prompt}]}]}
+    return url, {'json': body, 'headers': {'x-goog-api-key': sync_app.GEMINI_API_KEY}}
+
+
+def _candidate_text(payload):
+    candidates = payload.get('candidates') or [{}]
+    parts = candidates[0].get('content', {}).get('parts', [])
+    return ''.join(part.get('text', '') for part in parts)
+
+
+async def generate_gemini(prompt):
+    """Blocking-mode generateContent over REST; returns the answer text"""
+    url, kwargs = _gemini_request('generateContent', prompt)
+    with sync_app.dependency_in_flight.track_inprogress(('gemini',)), sync_app.gemini_latency.time(('blocking',)):
+        response = await gemini_client.request('POST', url, **kwargs)
+    if response.status_code != 200:
+        raise GeminiError(f"{response.status_code} {response.text[:200]}")
+    return _candidate_text(response.json())
+
+
+@web.middleware
+async def metrics_middleware(request, handler):
+    if request.match_info.handler is wsgi_fallback:
+        # Flask's own request hooks count these
+        return await handler(request)
+    resource = request.match_info.route.resource
+    route = resource.canonical if resource is not None else 'unmatched'
+    sync_app.metrics.start_writer()
+    started = time.perf_counter()
+    status = '500'
+    sync_app.http_in_flight.inc(1, (route,))
+    try:
+        response = await handler(request)
+        status = str(response.status)
+        if 'Origin' in request.headers:
+            # Same policy as flask_cors on the Flask routes
+            response.headers.setdefault('Access-Control-Allow-Origin', '*')
+        return response
+    finally:
+        sync_app.http_latency.observe(time.perf_counter() - started, (route, request.method))
+        sync_app.http_requests.inc(1, (route, request.method, status))
+        sync_app.http_in_flight.dec(1, (route,))
+
+
+async def _json_body(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+async def predict(request):
+    try:
+        data = await _json_body(request)
+        try:
+            features = features_from_sample(data)
+        except ValueError as e:
+            return json_response({'success': False, 'error': str(e)}, status=400)
+
+        model = sync_app.model_holder.current
+        if model.lookup is not None and model.lookup.index(features) >= 0:
+            # A table hit is a few index operations: not worth the executor hop
+            pred, conf = sync_app.score_crop(model, features)
+        else:
+            pred, conf = await asyncio.get_running_loop().run_in_executor(predict_pool, sync_app.score_crop, model, features)
+        sync_app.crop_predictions.inc(1, (model.version,))
+        sync_app.analytics_manager.record_prediction(pred, conf)
+        return json_response({'success': True, **sync_app.prediction_payload(pred, conf, model.version)})
+    except Exception as e:
+        logger.error(f"Prediction error: {e}")
+        return json_response({'success': False, 'error': 'Prediction failed'}, status=500)
+
+
+async def get_weather(lat, lon):
+    """``get_weather_data`` for coroutines"""
+    try:
+        with sync_app.dependency_in_flight.track_inprogress(('weather',)), sync_app.weather_latency.time():
+            return await sync_app.weather_cache.get_async(lat, lon)
+    except (TypeError, ValueError):
+        logger.error(f"Invalid coordinates: {lat}, {lon}")
+        return None
+
+
+async def weather(request):
+    data = await _json_body(request) or {}
+    lat = data.get('latitude', 19.076)
+    lon = data.get('longitude', 72.8777)
+    result = await get_weather(lat, lon)
+    if result:
+        return json_response({'success': True, 'weather': result})
+    return json_response({'success': False, 'error': 'Weather fetch failed'}, status=500)
+
+
+async def answer_chat(user_msg, lang, concise):
+    """``answer_chat`` from app.py for coroutines: (answer text, from cache)"""
+    cached = sync_app.chat_cache.get(user_msg, lang, concise)
+    if cached is not None:
+        return cached, True
+
+    async def answer():
+        text = (await generate_gemini(sync_app.chat_prompt(user_msg, lang, concise))).strip()
+        if text:
+            sync_app.chat_cache.set(user_msg, lang, concise, text)
+        return text
+
+    return await gemini_flight.do(cache_key(user_msg, lang, concise), answer), False
+
+
+async def chatbot(request):
+    if request.content_type != 'application/json':
+        return json_response({'success': False, 'error': 'Content-Type must be application/json'}, status=415)
+    data = await _json_body(request)
+    if not data:
+        return json_response({'success': False, 'error': 'Invalid JSON data'}, status=400)
+
+    user_msg = data.get('message', '')
+    lang = data.get('lang', 'en-US')
+    concise = bool(data.get('concise', True))
+    if not user_msg:
+        return json_response({'success': False, 'error': 'No message provided'}, status=400)
+    try:
+        if not sync_app.GEMINI_API_KEY:
+            logger.warning('Gemini API key missing; returning fallback reply')
+            return json_response({'success': True, 'response': 'I cannot access the assistant right now. Please try again later.'})
+
+        text, cached = await answer_chat(user_msg, lang, concise)
+        if cached:
+            return json_response({'success': True, 'response': text, 'lang': lang, 'concise': concise, 'cached': True})
+        if not text:
+            text = 'Sorry, I could not generate a response.'
+        return json_response({'success': True, 'response': text, 'lang': lang, 'concise': concise})
+    except Exception as e:
+        logger.error(f"Chatbot error: {e!r}")
+        return json_response({'success': False, 'error': f'AI service error: {str(e)}', 'response': 'Please consult local experts.'})
+
+
+async def _gemini_stream_chunks(prompt):
+    """Text chunks of streamGenerateContent (SSE framing); closing the generator aborts the call"""
+    url, kwargs = _gemini_request('streamGenerateContent', prompt)
+    with sync_app.dependency_in_flight.track_inprogress(('gemini',)):
+        with sync_app.gemini_latency.time(('stream',)):
+            response = await gemini_client.stream('POST', f"{url}?alt=sse", **kwargs)
+        completed = False
+        try:
+            if response.status != 200:
+                raise GeminiError(f"{response.status} {(await response.text())[:200]}")
+            async for line in response.content:
+                if line.startswith(b'data:'):
+                    yield _candidate_text(json.loads(line[5:]))
+            completed = True
+        finally:
+            if completed:
+                response.release()
+            else:
+                # Drop the connection so the upstream stops generating
+                response.close()
+
+
+async def chatbot_stream(request):
+    """Server-sent events version of /api/chatbot, as in app.py"""
+    started = time.perf_counter()
+    if request.method == 'POST':
+        data = await _json_body(request)
+        if not data:
+            return json_response({'success': False, 'error': 'Invalid JSON data'}, status=400)
+    else:
+        data = request.query
+    user_msg = data.get('message', '')
+    lang = data.get('lang', 'en-US')
+    concise = data.get('concise', True)
+    if isinstance(concise, str):
+        concise = concise.lower() not in ('0', 'false', 'no')
+    concise = bool(concise)
+    if not user_msg:
+        return json_response({'success': False, 'error': 'No message provided'}, status=400)
+
+    response = web.StreamResponse(headers={
+        'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no',
+    })
+    if 'Origin' in request.headers:
+        response.headers['Access-Control-Allow-Origin'] = '*'
+    await response.prepare(request)
+
+    sync_app.count_chat_stream('streams')
+    first_byte_at = None
+    upstream = None
+    parts = []
+    try:
+        cached = sync_app.chat_cache.get(user_msg, lang, concise) if sync_app.GEMINI_API_KEY else None
+        if not sync_app.GEMINI_API_KEY:
+            chunks = ['I cannot access the assistant right now. Please try again later.']
+        elif cached is not None:
+            sync_app.count_chat_stream('cached')
+            chunks = [cached]
+        else:
+            upstream = _gemini_stream_chunks(sync_app.chat_prompt(user_msg, lang, concise))
+
+        async def texts():
+            if upstream is None:
+                for text in chunks:
+                    yield text
+            else:
+                async for text in upstream:
+                    yield text
+
+        async for text in texts():
+            if not text:
+                continue
+            if first_byte_at is None:
+                first_byte_at = time.perf_counter()
+                sync_app.chat_stream_stats['ttfb'].observe(first_byte_at - started)
+            parts.append(text)
+            await response.write(sync_app.sse_event('chunk', {'text': text}).encode('utf-8'))
+
+        if upstream is not None and parts:
+            sync_app.chat_cache.set(user_msg, lang, concise, ''.join(parts).strip())
+        total = time.perf_counter() - started
+        sync_app.chat_stream_stats['total'].observe(total)
+        sync_app.count_chat_stream('completed')
+        await response.write(sync_app.sse_event('done', {
+            'lang': lang,
+            'concise': concise,
+            'cached': cached is not None,
+            'ttfb_ms': round((first_byte_at - started) * 1000, 1) if first_byte_at else None,
+            'total_ms': round(total * 1000, 1),
+        }).encode('utf-8'))
+    except (asyncio.CancelledError, ConnectionResetError):
+        # Client went away; closing the upstream generator stops the generation
+        sync_app.count_chat_stream('cancelled')
+        if upstream is not None:
+            await upstream.aclose()
+        raise
+    except Exception as e:
+        logger.error(f"Chatbot stream error: {e!r}")
+        sync_app.count_chat_stream('errors')
+        if upstream is not None:
+            await upstream.aclose()
+        await response.write(sync_app.sse_event('error', {'error': f'AI service error: {str(e)}', 'response': 'Please consult local experts.'}).encode('utf-8'))
+    await response.write_eof()
+    return response
+
+
+async def _advisory_stage(timings, name, task):
+    """``_advisory_stage`` from app.py: the task keeps running past its deadline and fills the caches"""
+    try:
+        result = await asyncio.wait_for(asyncio.shield(task), timings.remaining(name))
+    except asyncio.TimeoutError:
+        timings.finish(name, 'timeout', f"No result within {timings.deadlines[name]:g} s")
+        return None
+    except Exception as e:
+        logger.error(f"Advisory {name} error: {e!r}")
+        timings.finish(name, 'error', f"{name.capitalize()} failed")
+        return None
+    timings.finish(name, 'ok' if result else 'error', None if result else f"{name.capitalize()} failed")
+    return result
+
+
+def _background(coroutine):
+    """A task whose failure after its caller stopped waiting is not logged as unhandled"""
+    task = asyncio.ensure_future(coroutine)
+    task.add_done_callback(lambda finished: finished.cancelled() or finished.exception())
+    return task
+
+
+async def _explain(crop, sample, lang, concise):
+    text, cached = await answer_chat(explanation_question(crop, sample), lang, concise)
+    return {'text': text, 'cached': cached} if text else None
+
+
+async def advisory(request):
+    """The /api/advisory flow of app.py on the event loop"""
+    try:
+        req = AdvisoryRequest.from_request(await _json_body(request))
+    except ValueError as e:
+        return json_response({'success': False, 'error': str(e)}, status=400)
+
+    timings = StageTimings(sync_app.ADVISORY_DEADLINES)
+    model = sync_app.model_holder.current
+    loop = asyncio.get_running_loop()
+    weather = prediction = explanation = weather_task = None
+    if req.has_location:
+        timings.start('weather')
+        weather_task = _background(get_weather(req.latitude, req.longitude))
+
+    sample, sources = req.complete_sample(None)
+    if sample is None:
+        weather = await _advisory_stage(timings, 'weather', weather_task)
+        sample, sources = req.complete_sample(weather)
+
+    if sample is None:
+        timings.skip('prediction', f"Temperature and humidity unavailable (weather {timings.stages['weather']['status']})")
+    else:
+        timings.start('prediction')
+        scoring = _background(loop.run_in_executor(predict_pool, sync_app.advisory_prediction, model, sample))
+        prediction = await _advisory_stage(timings, 'prediction', scoring)
+
+    explanation_task = None
+    if prediction is None:
+        timings.skip('explanation', 'No prediction to explain')
+    elif not sync_app.GEMINI_API_KEY:
+        timings.skip('explanation', 'Gemini is not configured')
+    else:
+        timings.start('explanation')
+        explanation_task = _background(_explain(prediction['prediction']['crop'], sample, req.lang, req.concise))
+
+    if weather_task is not None and 'weather' not in timings.stages:
+        weather = await _advisory_stage(timings, 'weather', weather_task)
+    if explanation_task is not None:
+        explanation = await _advisory_stage(timings, 'explanation', explanation_task)
+
+    sync_app.record_advisory_stages(timings)
+    return json_response(advisory_payload(req, timings, weather, sources, prediction, explanation))
+
+
+def _wsgi_environ(request, body):
+    environ = {
+        'REQUEST_METHOD': request.method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': request.path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': request.query_string,
+        'SERVER_NAME': request.host.split(':')[0],
+        'SERVER_PORT': str(request.url.port or ''),
+        'SERVER_PROTOCOL': f"HTTP/{request.version.major}.{request.version.minor}",
+        'REMOTE_ADDR': request.remote or '',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': request.scheme,
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if 'Content-Type' in request.headers:
+        environ['CONTENT_TYPE'] = request.headers['Content-Type']
+    for name, value in request.headers.items():
+        key = 'HTTP_' + name.upper().replace('-', '_')
+        if key in ('HTTP_CONTENT_TYPE', 'HTTP_CONTENT_LENGTH'):
+            continue
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+async def wsgi_fallback(request):
+    """Serve any other route with the Flask app, running it (and its body iterator) in wsgi_pool"""
+    loop = asyncio.get_running_loop()
+    environ = _wsgi_environ(request, await request.read())
+    started = {}
+    done = object()
+    # Flask's streamed responses hold context variables, so every step of one
+    # response runs in the same context, whichever pool thread picks it up
+    context = contextvars.copy_context()
+
+    def start_response(status, headers, exc_info=None):
+        started['status'], started['headers'] = status, headers
+
+    def begin():
+        result = sync_app.app.wsgi_app(environ, start_response)
+        iterator = iter(result)
+        # Generators only call start_response once their first item is produced
+        return result, iterator, next(iterator, done)
+
+    result, iterator, chunk = await loop.run_in_executor(wsgi_pool, context.run, begin)
+    try:
+        response = web.StreamResponse(status=int(started['status'].split(' ', 1)[0]))
+        for name, value in started['headers']:
+            if name.lower() not in _HOP_BY_HOP:
+                response.headers.add(name, value)
+        await response.prepare(request)
+        while chunk is not done:
+            if chunk:
+                await response.write(chunk)
+            chunk = await loop.run_in_executor(wsgi_pool, context.run, next, iterator, done)
+        await response.write_eof()
+        return response
+    finally:
+        # Runs the response's close hooks (metrics) and stops abandoned streams
+        close = getattr(result, 'close', None)
+        if close is not None:
+            await loop.run_in_executor(wsgi_pool, context.run, close)
+
+
+def create_app():
+    application = web.Application(
+        middlewares=[metrics_middleware],
+        client_max_size=sync_app.image_store.max_bytes + 1024 * 1024,
+    )
+    application.router.add_post('/api/predict', predict)
+    application.router.add_post('/api/weather', weather)
+    application.router.add_post('/api/chatbot', chatbot)
+    application.router.add_post('/api/advisory', advisory)
+    application.router.add_route('GET', '/api/chatbot/stream', chatbot_stream)
+    application.router.add_route('POST', '/api/chatbot/stream', chatbot_stream)
+    application.router.add_route('*', _FALLBACK_ROUTE, wsgi_fallback)
+
+    async def start_background(_application):
+        # Predictions here bypass the Flask hooks that start these
+        sync_app.metrics.start_writer()
+        sync_app.model_holder.start_watcher(sync_app.MODEL_WATCH_INTERVAL)
+
+    async def close_clients(_application):
+        await weather_client.close()
+        await gemini_client.close()
+
+    application.on_startup.append(start_background)
+    application.on_cleanup.append(close_clients)
+    return application
+
+
+app = create_app()
+
+if __name__ == '__main__':
+    web.run_app(app, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
@@ -0,0 +1,158 @@
+"""
+Composite advisory: weather, crop prediction and a Gemini explanation in one call.
+
+``/api/advisory`` replaces the frontend's three sequential round trips to
+/api/weather, /api/predict and /api/chatbot. The stages depend on each other
+only through data:
+
+    weather      needs the location
+    prediction   needs temperature and humidity (from the request, else from weather)
+    explanation  needs the predicted crop
+
+so weather starts immediately, the prediction starts as soon as its inputs
+are known (at once when the request carries temperature and humidity, in
+parallel with weather) and the explanation as soon as the prediction is in.
+Each stage has its own deadline counted from its start. A stage that misses
+it is reported as ``timeout`` and its dependents as ``skipped``; the response
+still carries everything that did finish. A timed-out call is not cancelled:
+it completes in the background and fills the weather or chat cache, so a retry
+is answered from there.
+
+The flows live next to their routes (threads in app.py, coroutines in
+async_app.py); this module holds what they share.
+"""
+
+import math
+import time
+
+from backend.crop_model import REQUEST_FIELDS, features_from_sample
+
+STAGES = ('weather', 'prediction', 'explanation')
+DEFAULT_DEADLINES = {'weather': 3.0, 'prediction': 1.0, 'explanation': 8.0}
+# Inputs the prediction can take from the weather stage
+WEATHER_FIELDS = ('temperature', 'humidity')
+
+
+def _coordinate(data, name, limit):
+    try:
+        value = float(data[name])
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid {name}') from None
+    if not math.isfinite(value) or abs(value) > limit:
+        raise ValueError(f'Invalid {name}')
+    return value
+
+
+class AdvisoryRequest:
+    """A validated /api/advisory body"""
+
+    def __init__(self, sample, latitude=None, longitude=None, lang='en-US', concise=True):
+        self.sample = sample
+        self.latitude = latitude
+        self.longitude = longitude
+        self.lang = lang
+        self.concise = concise
+
+    @classmethod
+    def from_request(cls, data):
+        """Raises ValueError with a client-facing message"""
+        if not isinstance(data, dict):
+            raise ValueError('Expected a JSON object with latitude, longitude and soil inputs')
+        has_location = 'latitude' in data or 'longitude' in data
+        if has_location and not ('latitude' in data and 'longitude' in data):
+            raise ValueError('Provide both latitude and longitude')
+        latitude = _coordinate(data, 'latitude', 90) if has_location else None
+        longitude = _coordinate(data, 'longitude', 180) if has_location else None
+
+        sample = {field: data[field] for field in REQUEST_FIELDS if data.get(field) is not None}
+        # Soil inputs are validated now; weather inputs once they are known
+        features_from_sample({**dict.fromkeys(WEATHER_FIELDS, 0), **sample})
+        if not has_location and any(field not in sample for field in WEATHER_FIELDS):
+            raise ValueError('Provide latitude and longitude, or temperature and humidity')
+
+        lang = data.get('lang', 'en-US')
+        if not isinstance(lang, str):
+            raise ValueError('Invalid lang')
+        return cls(sample, latitude, longitude, lang, bool(data.get('concise', True)))
+
+    @property
+    def has_location(self):
+        return self.latitude is not None
+
+    def complete_sample(self, weather):
+        """(prediction sample, where each weather field came from) or (None, sources) if one is missing"""
+        sample = dict(self.sample)
+        sources = {}
+        for field in WEATHER_FIELDS:
+            if field in sample:
+                sources[field] = 'request'
+            elif weather and weather.get(field) is not None:
+                sample[field] = weather[field]
+                sources[field] = 'weather'
+        if len(sources) < len(WEATHER_FIELDS):
+            return None, sources
+        return sample, sources
+
+
+def explanation_question(crop, sample):
+    """The question asked of Gemini; inputs are rounded so nearby fields share cache entries"""
+    return (
+        f"Why is {crop} a good crop for a field with nitrogen {float(sample['nitrogen']):.0f}, "
+        f"phosphorus {float(sample['phosphorus']):.0f} and potassium {float(sample['potassium']):.0f} kg/ha, "
+        f"soil pH {float(sample['ph']):.1f}, {float(sample['rainfall']):.0f} mm rainfall, "
+        f"{float(sample['temperature']):.0f}°C and {float(sample['humidity']):.0f}% humidity? "
+        f"Give practical next steps for sowing it."
+    )
+
+
+class StageTimings:
+    """Start, duration, deadline and outcome of each stage, relative to the request start"""
+
+    def __init__(self, deadlines=None):
+        self.deadlines = {**DEFAULT_DEADLINES, **(deadlines or {})}
+        self.started = time.perf_counter()
+        self._starts = {}
+        self.stages = {}
+
+    def start(self, name):
+        self._starts[name] = time.perf_counter()
+
+    def remaining(self, name):
+        """Seconds left before ``name`` misses its deadline"""
+        return max(0.0, self.deadlines[name] - (time.perf_counter() - self._starts[name]))
+
+    def finish(self, name, status, error=None):
+        started = self._starts[name]
+        self.stages[name] = {
+            'status': status,
+            'start_ms': round((started - self.started) * 1000, 1),
+            'duration_ms': round((time.perf_counter() - started) * 1000, 1),
+            'deadline_ms': round(self.deadlines[name] * 1000),
+            **({'error': error} if error else {}),
+        }
+        return self.stages[name]
+
+    def skip(self, name, reason):
+        self.stages[name] = {'status': 'skipped', 'error': reason}
+
+    def payload(self):
+        return {
+            'stages': {name: self.stages[name] for name in STAGES if name in self.stages},
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 1),
+        }
+
+
+def advisory_payload(req, timings, weather=None, sources=None, prediction=None, explanation=None):
+    """The /api/advisory response: every stage's result or null, and per-stage timings"""
+    return {
+        'success': True,
+        # A request without a location has no weather stage; that alone is not partial
+        'partial': any(stage['status'] != 'ok' for stage in timings.stages.values()),
+        'location': {'latitude': req.latitude, 'longitude': req.longitude} if req.has_location else None,
+        'weather': weather,
+        'input_sources': sources or {},
+        # prediction, crop_info and model_version, as /api/predict returns them
+        **(prediction or {'prediction': None, 'crop_info': None, 'model_version': None}),
+        'explanation': explanation,
+        **timings.payload(),
+    }
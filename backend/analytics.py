@@ -1,24 +1,173 @@
+"""
+Prediction analytics shared by all workers through SQLite.
+
+Totals live in a WAL-mode SQLite database, so every gunicorn worker adds to
+the same counters and readers never block writers. Recording a prediction
+only folds it into an in-memory delta; a background thread in each worker
+applies the accumulated delta once per flush interval as a single
+transaction of ``value = value + ?`` updates, which SQLite serializes across
+processes. A crash loses at most one flush interval of that worker's events.
+
+Alongside the lifetime totals, each flush adds to per-minute, per-hour and
+per-day rollup buckets (overall and per crop). Every resolution is a ring of
+slots reused once their bucket ages out, so storage stays bounded: recent
+activity is kept by the minute, older activity only by the hour or day.
+Window and growth queries read just the buckets they cover.
+"""
+
+import atexit
 import json
+import logging
 import os
-from datetime import datetime, timedelta
 import random
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ANALYTICS_PATH = os.environ.get('ANALYTICS_DB_PATH', 'analytics_data.sqlite3')
+# Snapshot + event log written by earlier versions; imported once if present
+LEGACY_ANALYTICS_PATH = 'analytics_data.json'
+
+# resolution -> (seconds per bucket, buckets kept); buckets are aligned to UTC
+ROLLUPS = {
+    'minute': (60, 180),
+    'hour': (3600, 24 * 14),
+    'day': (86400, 400),
+}
+# Crop key of the rows that total every crop
+ALL_CROPS = '*'
+
+
+def _growth(current, previous):
+    """Percent change, or None when there is no previous activity to compare with"""
+    if not previous:
+        return None
+    return round((current - previous) / previous * 100, 1)
+
+
+def growth_label(value, unit='%'):
+    """Signed display form of a ``compare`` growth figure"""
+    return f"{value:+.1f}{unit}" if value is not None else 'n/a'
+
+
+def _legacy_analytics(path):
+    """Totals from a legacy JSON snapshot and its event log, or None"""
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    last_seq = data.get('last_seq', 0)
+    try:
+        with open(f"{path}.log", 'r') as f:
+            lines = f.readlines()
+    except OSError:
+        lines = []
+    for line in lines:
+        try:
+            event = json.loads(line)
+            if event['seq'] <= last_seq:
+                continue
+        except (ValueError, KeyError, TypeError):
+            continue
+        data['total_predictions'] += 1
+        data['successful_predictions'] += 1 if event.get('ok', True) else 0
+        if 'acc' in event:
+            data['crop_accuracy'][event['crop']] = event['acc']
+    return data
+
+
+class _Delta:
+    """Increments accumulated in one worker since its last flush"""
+
+    __slots__ = ('events', 'successful', 'crops', 'minutes', 'last_updated')
 
-class AnalyticsManager:
     def __init__(self):
-        self.analytics_file = 'analytics_data.json'
-        self.load_analytics()
-    
-    def load_analytics(self):
-        """Load analytics data from file or create default"""
-        if os.path.exists(self.analytics_file):
-            try:
-                with open(self.analytics_file, 'r') as f:
-                    self.data = json.load(f)
-            except:
-                self.data = self.create_default_analytics()
-        else:
-            self.data = self.create_default_analytics()
-    
+        self.events = 0
+        self.successful = 0
+        # crop -> [predictions, confidence_sum, accuracy_drift]
+        self.crops = {}
+        # (minute bucket, crop) -> [predictions, successful, confidence_sum]
+        self.minutes = {}
+        self.last_updated = None
+
+    def merge(self, other):
+        self.events += other.events
+        self.successful += other.successful
+        for crop, values in other.crops.items():
+            mine = self.crops.setdefault(crop, [0, 0.0, 0.0])
+            for i, value in enumerate(values):
+                mine[i] += value
+        for key, values in other.minutes.items():
+            mine = self.minutes.setdefault(key, [0, 0, 0.0])
+            for i, value in enumerate(values):
+                mine[i] += value
+        self.last_updated = max(filter(None, [self.last_updated, other.last_updated]), default=None)
+
+
+class AnalyticsManager:
+    def __init__(self, path=DEFAULT_ANALYTICS_PATH, flush_interval=1.0, legacy_path=LEGACY_ANALYTICS_PATH):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._pending = _Delta()
+        self._flusher_pid = None
+        self._counters = {'events_flushed': 0, 'flushes': 0, 'write_errors': 0}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._init_db(legacy_path)
+        atexit.register(self.flush)
+
+    def _connect(self):
+        # One connection per thread and per process; connections must not cross a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_db(self, legacy_path):
+        conn = self._connect()
+        conn.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+        conn.execute('CREATE TABLE IF NOT EXISTS crops (crop TEXT PRIMARY KEY, predictions INTEGER NOT NULL DEFAULT 0, '
+                     'confidence_sum REAL NOT NULL DEFAULT 0, accuracy REAL)')
+        conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        conn.execute('CREATE TABLE IF NOT EXISTS rollups (resolution TEXT NOT NULL, slot INTEGER NOT NULL, '
+                     'crop TEXT NOT NULL, bucket INTEGER NOT NULL, predictions INTEGER NOT NULL, '
+                     'successful INTEGER NOT NULL, confidence_sum REAL NOT NULL, PRIMARY KEY (resolution, slot, crop))')
+        conn.execute('CREATE INDEX IF NOT EXISTS rollups_window ON rollups (resolution, crop, bucket)')
+        # Workers start together; the write lock makes exactly one of them seed
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'baseline'").fetchone() is None:
+                data = _legacy_analytics(legacy_path) if legacy_path else None
+                if data is not None:
+                    logger.info(f"Importing legacy analytics from {legacy_path}")
+                self._seed(conn, data or self.create_default_analytics())
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _seed(self, conn, data):
+        conn.executemany('INSERT OR REPLACE INTO counters (name, value) VALUES (?, ?)', [
+            ('total_predictions', data['total_predictions']),
+            ('successful_predictions', data['successful_predictions']),
+        ])
+        conn.executemany('INSERT OR REPLACE INTO crops (crop, accuracy) VALUES (?, ?)', data['crop_accuracy'].items())
+        baseline = {k: data[k] for k in ('farmers_helped', 'crop_varieties_predicted', 'monthly_growth', 'regional_data')}
+        conn.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', [
+            ('baseline', json.dumps(baseline)),
+            ('last_updated', data['last_updated']),
+        ])
+
     def create_default_analytics(self):
         """Create realistic demo analytics data"""
         return {
@@ -43,64 +192,242 @@ class AnalyticsManager:
             },
             "last_updated": datetime.now().isoformat()
         }
-    
-    def save_analytics(self):
-        """Save analytics data to file"""
-        self.data["last_updated"] = datetime.now().isoformat()
-        with open(self.analytics_file, 'w') as f:
-            json.dump(self.data, f, indent=2)
-    
+
     def record_prediction(self, crop, confidence, success=True):
-        """Record a new prediction"""
-        self.data["total_predictions"] += 1
-        if success:
-            self.data["successful_predictions"] += 1
-        
-        # Update accuracy rate
-        self.data["accuracy_rate"] = (self.data["successful_predictions"] / self.data["total_predictions"]) * 100
-        
-        # Update crop-specific accuracy (simulate)
-        if crop in self.data["crop_accuracy"]:
-            current_acc = self.data["crop_accuracy"][crop]
-            # Slight random variation to make it realistic
-            new_acc = current_acc + random.uniform(-0.5, 0.5)
-            self.data["crop_accuracy"][crop] = max(85, min(98, new_acc))
-        
-        self.save_analytics()
-    
+        """Record a new prediction; it reaches the shared store on the next flush"""
+        self._ensure_flusher()
+        minute = int(time.time() // 60)
+        with self._lock:
+            delta = self._pending
+            delta.events += 1
+            if success:
+                delta.successful += 1
+            crop_delta = delta.crops.setdefault(crop, [0, 0.0, 0.0])
+            crop_delta[0] += 1
+            crop_delta[1] += float(confidence)
+            # Update crop-specific accuracy (simulate); only crops that have an
+            # accuracy figure drift, clamped to 85..98 in the update
+            crop_delta[2] += random.uniform(-0.5, 0.5)
+            bucket = delta.minutes.setdefault((minute, crop), [0, 0, 0.0])
+            bucket[0] += 1
+            bucket[1] += 1 if success else 0
+            bucket[2] += float(confidence)
+            delta.last_updated = datetime.now().isoformat()
+
+    def _ensure_flusher(self):
+        # Threads do not survive fork, so each gunicorn worker starts its own
+        if self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            if self._flusher_pid is not None:
+                # Inherited from the parent, which flushes it itself
+                self._pending = _Delta()
+            self._flusher_pid = os.getpid()
+            threading.Thread(target=self._flush_loop, name='analytics-flush', daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Analytics flush error: {e}")
+
+    def flush(self):
+        """Apply this worker's accumulated increments in one transaction"""
+        with self._io_lock:
+            with self._lock:
+                delta, self._pending = self._pending, _Delta()
+            if not delta.events:
+                return 0
+            try:
+                self._apply(delta)
+            except sqlite3.Error as e:
+                with self._lock:
+                    self._pending.merge(delta)
+                    self._counters['write_errors'] += 1
+                logger.error(f"Analytics flush failed, will retry: {e}")
+                return 0
+            with self._lock:
+                self._counters['events_flushed'] += delta.events
+                self._counters['flushes'] += 1
+            return delta.events
+
+    def _apply(self, delta):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany('UPDATE counters SET value = value + ? WHERE name = ?', [
+                (delta.events, 'total_predictions'),
+                (delta.successful, 'successful_predictions'),
+            ])
+            conn.executemany('INSERT OR IGNORE INTO crops (crop) VALUES (?)', [(c,) for c in delta.crops])
+            conn.executemany(
+                'UPDATE crops SET predictions = predictions + ?, confidence_sum = confidence_sum + ?, '
+                'accuracy = MAX(85, MIN(98, accuracy + ?)) WHERE crop = ?',
+                [(n, conf, drift, crop) for crop, (n, conf, drift) in delta.crops.items()],
+            )
+            conn.execute("UPDATE meta SET value = MAX(value, ?) WHERE key = 'last_updated'", (delta.last_updated,))
+            conn.executemany(
+                'INSERT INTO rollups (resolution, slot, crop, bucket, predictions, successful, confidence_sum) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (resolution, slot, crop) DO UPDATE SET '
+                'predictions = CASE WHEN bucket = excluded.bucket THEN predictions + excluded.predictions ELSE excluded.predictions END, '
+                'successful = CASE WHEN bucket = excluded.bucket THEN successful + excluded.successful ELSE excluded.successful END, '
+                'confidence_sum = CASE WHEN bucket = excluded.bucket THEN confidence_sum + excluded.confidence_sum ELSE excluded.confidence_sum END, '
+                'bucket = excluded.bucket '
+                # A slot only moves forward; increments for an aged-out bucket are dropped
+                'WHERE excluded.bucket >= bucket',
+                self._rollup_rows(delta),
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    @staticmethod
+    def _rollup_rows(delta):
+        rows = {}
+        for (minute, crop), values in delta.minutes.items():
+            for resolution, (seconds, _capacity) in ROLLUPS.items():
+                bucket = minute * 60 // seconds
+                for key in (crop, ALL_CROPS):
+                    row = rows.setdefault((resolution, bucket, key), [0, 0, 0.0])
+                    for i, value in enumerate(values):
+                        row[i] += value
+        return [(resolution, bucket % ROLLUPS[resolution][1], crop, bucket, *values)
+                for (resolution, bucket, crop), values in rows.items()]
+
+    def _window_bounds(self, resolution, count, offset, now):
+        if resolution not in ROLLUPS:
+            raise ValueError(f"Unknown resolution {resolution}; use one of {', '.join(ROLLUPS)}")
+        seconds, capacity = ROLLUPS[resolution]
+        if count < 1 or offset < 0 or count + offset > capacity:
+            raise ValueError(f"A {resolution} window can reach back at most {capacity} buckets")
+        last = int((time.time() if now is None else now) // seconds) - offset
+        return last - count + 1, last, seconds
+
+    def window(self, resolution='hour', count=24, offset=0, now=None):
+        """Totals over the last ``count`` buckets (the current one included), ``offset`` buckets back"""
+        first, last, seconds = self._window_bounds(resolution, count, offset, now)
+        rows = self._connect().execute(
+            'SELECT crop, SUM(predictions), SUM(successful), SUM(confidence_sum) FROM rollups '
+            'WHERE resolution = ? AND bucket BETWEEN ? AND ? GROUP BY crop',
+            (resolution, first, last),
+        ).fetchall()
+        totals = {crop: (n, ok, conf) for crop, n, ok, conf in rows}
+        predictions, successful, confidence = totals.pop(ALL_CROPS, (0, 0, 0.0))
+        return {
+            'resolution': resolution,
+            'buckets': count,
+            'start': datetime.fromtimestamp(first * seconds, timezone.utc).isoformat(),
+            'end': datetime.fromtimestamp((last + 1) * seconds, timezone.utc).isoformat(),
+            'predictions': predictions,
+            'successful': successful,
+            'success_rate': round(successful / predictions * 100, 1) if predictions else None,
+            'avg_confidence': round(confidence / predictions, 4) if predictions else None,
+            'crops': {crop: n for crop, (n, _ok, _conf) in sorted(totals.items(), key=lambda kv: -kv[1][0])},
+        }
+
+    def compare(self, resolution='day', count=30, now=None):
+        """The last ``count`` buckets against the ``count`` before them"""
+        current = self.window(resolution, count, now=now)
+        previous = self.window(resolution, count, offset=count, now=now)
+        rates = (current['success_rate'], previous['success_rate'])
+        return {
+            'current': current,
+            'previous': previous,
+            'growth': {
+                'predictions': _growth(current['predictions'], previous['predictions']),
+                'successful': _growth(current['successful'], previous['successful']),
+                'crops': _growth(len(current['crops']), len(previous['crops'])),
+                # Percentage points rather than percent
+                'success_rate': round(rates[0] - rates[1], 1) if None not in rates else None,
+            },
+        }
+
+    def series(self, resolution='hour', count=24, now=None):
+        """Per-bucket totals, oldest first, with empty buckets filled in"""
+        first, last, seconds = self._window_bounds(resolution, count, 0, now)
+        rows = dict((bucket, (n, ok)) for bucket, n, ok in self._connect().execute(
+            'SELECT bucket, predictions, successful FROM rollups WHERE resolution = ? AND crop = ? AND bucket BETWEEN ? AND ?',
+            (resolution, ALL_CROPS, first, last),
+        ))
+        return [
+            {'start': datetime.fromtimestamp(b * seconds, timezone.utc).isoformat(),
+             'predictions': rows.get(b, (0, 0))[0], 'successful': rows.get(b, (0, 0))[1]}
+            for b in range(first, last + 1)
+        ]
+
+    def snapshot(self):
+        """Current shared totals, read in one transaction"""
+        conn = self._connect()
+        conn.execute('BEGIN')
+        try:
+            counters = dict(conn.execute('SELECT name, value FROM counters'))
+            crops = conn.execute('SELECT crop, predictions, confidence_sum, accuracy FROM crops').fetchall()
+            meta = dict(conn.execute('SELECT key, value FROM meta'))
+        finally:
+            conn.execute('COMMIT')
+        total = counters.get('total_predictions', 0)
+        successful = counters.get('successful_predictions', 0)
+        return {
+            **json.loads(meta['baseline']),
+            'total_predictions': total,
+            'successful_predictions': successful,
+            'accuracy_rate': successful / total * 100 if total else 0.0,
+            'crop_accuracy': {crop: round(acc, 1) for crop, _n, _c, acc in crops if acc is not None},
+            'crop_predictions': {crop: n for crop, n, _c, _acc in crops if n},
+            'crop_confidence': {crop: round(c / n, 4) for crop, n, c, _acc in crops if n},
+            'last_updated': meta['last_updated'],
+        }
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            counters['pending'] = self._pending.events
+        counters['path'] = self.path
+        return counters
+
     def get_analytics_summary(self):
         """Get formatted analytics for API response"""
+        data = self.snapshot()
+        growth = self.compare('day', 30)['growth']
+        if growth['predictions'] is not None:
+            data['monthly_growth'] = growth['predictions']
         return {
             "success": True,
             "analytics": {
                 "overview": {
                     "total_predictions": {
-                        "value": f"{self.data['total_predictions']:,}",
-                        "growth": f"+{self.data['monthly_growth']:.1f}%"
+                        "value": f"{data['total_predictions']:,}",
+                        "growth": growth_label(growth['predictions'])
                     },
                     "accuracy_rate": {
-                        "value": f"{self.data['accuracy_rate']:.1f}%",
-                        "growth": "+2.3%"
+                        "value": f"{data['accuracy_rate']:.1f}%",
+                        "growth": growth_label(growth['success_rate'], 'pp')
                     },
+                    # Farmers are not tracked individually (see /api/dashboard-stats)
                     "farmers_helped": {
-                        "value": f"{self.data['farmers_helped']:,}",
-                        "growth": "+18.2%"
+                        "value": f"{data['farmers_helped']:,}",
+                        "growth": growth_label(growth['successful'])
                     },
                     "crop_varieties": {
-                        "value": str(self.data['crop_varieties_predicted']),
-                        "growth": "+12.0%"
+                        "value": str(data['crop_varieties_predicted']),
+                        "growth": growth_label(growth['crops'])
                     }
                 },
-                "regional_performance": self.data["regional_data"],
-                "crop_accuracy": self.data["crop_accuracy"],
+                "regional_performance": data["regional_data"],
+                "crop_accuracy": data["crop_accuracy"],
                 "success_metrics": {
-                    "prediction_accuracy": self.data["accuracy_rate"],
+                    "prediction_accuracy": data["accuracy_rate"],
                     "farmer_satisfaction": 96.8,
                     "yield_improvement": 23.4,
                     "cost_reduction": 15.7
                 }
             },
-            "last_updated": self.data["last_updated"]
+            "last_updated": data["last_updated"]
         }
 
 # Global analytics instance
@@ -0,0 +1,116 @@
+"""
+Cache primitives shared by the upstream caches: an in-process TTL/LRU map and
+an SQLite tier shared by every worker on the host.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe LRU-bounded mapping that remembers when each entry was stored.
+
+    Expired entries are not dropped on read: callers decide whether a stale
+    value is still useful (stale-while-revalidate, last-known fallback) via
+    ``lookup``. ``get`` is the plain "fresh or nothing" accessor.
+    """
+
+    def __init__(self, max_entries=1024, ttl=300, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, key):
+        """Return (value, age_seconds) for ``key`` regardless of expiry, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            value, stored_at = entry
+        return value, self._clock() - stored_at
+
+    def get(self, key, default=None):
+        found = self.lookup(key)
+        if found is None or found[1] >= self.ttl:
+            return default
+        return found[0]
+
+    def set(self, key, value, age=0.0):
+        """Store ``value``; ``age`` backdates it when it was fetched from another tier"""
+        with self._lock:
+            self._entries[key] = (value, self._clock() - age)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskTier:
+    """SQLite-backed text key/value store with expiry, safe to share between processes"""
+
+    def __init__(self, path, ttl, max_entries=50000, table='responses'):
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(f'CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL)')
+            conn.execute(f'CREATE INDEX IF NOT EXISTS {table}_created ON {table} (created)')
+
+    def _connect(self):
+        # One connection per thread and per process; connections must not cross a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        """Return (response, age_seconds) if present and unexpired"""
+        row = self._connect().execute(f'SELECT response, created FROM {self.table} WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        age = time.time() - row[1]
+        return (row[0], age) if age < self.ttl else None
+
+    def set(self, key, response):
+        conn = self._connect()
+        with conn:
+            conn.execute(f'INSERT OR REPLACE INTO {self.table} (key, response, created) VALUES (?, ?, ?)', (key, response, time.time()))
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self.prune()
+
+    def prune(self):
+        conn = self._connect()
+        with conn:
+            conn.execute(f'DELETE FROM {self.table} WHERE created < ?', (time.time() - self.ttl,))
+            conn.execute(
+                f'DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} ORDER BY created DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,),
+            )
@@ -0,0 +1,100 @@
+"""
+Response cache for the farming assistant (/api/chatbot).
+
+Answers are keyed on the normalized question (case, whitespace and
+punctuation folded), the requested locale and the concise flag. An in-memory
+LRU tier serves each worker; an optional SQLite tier survives restarts and is
+shared by every gunicorn worker on the host.
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import unicodedata
+
+from backend.cache import DiskTier, TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_question(message):
+    """Fold case, Unicode forms, punctuation and whitespace so equivalent questions share a key"""
+    text = unicodedata.normalize('NFKC', message).casefold()
+    text = ''.join(' ' if unicodedata.category(ch).startswith('P') else ch for ch in text)
+    return ' '.join(text.split())
+
+
+def cache_key(message, lang, concise):
+    raw = f"{(lang or '').strip().lower()}|{int(bool(concise))}|{normalize_question(message)}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ChatResponseCache:
+    """Two-tier (memory, optional SQLite) cache of chatbot answers"""
+
+    def __init__(self, max_entries=2048, ttl=86400, disk_path=None, disk_max_entries=50000):
+        self._memory = TTLCache(max_entries=max_entries, ttl=ttl)
+        self.disk = None
+        if disk_path:
+            try:
+                self.disk = DiskTier(disk_path, ttl, max_entries=disk_max_entries)
+            except sqlite3.Error as e:
+                logger.error(f"Chat cache disk tier disabled ({disk_path}): {e}")
+        self._lock = threading.Lock()
+        self._counters = {'lookups': 0, 'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0, 'disk_errors': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def get(self, message, lang, concise, record=True):
+        """Cached answer or None; ``record=False`` re-checks without touching the hit ratio"""
+        key = cache_key(message, lang, concise)
+        if record:
+            self._count('lookups')
+        response = self._memory.get(key)
+        if response is not None:
+            if record:
+                self._count('memory_hits')
+            return response
+        if self.disk is not None:
+            try:
+                found = self.disk.get(key)
+            except sqlite3.Error as e:
+                logger.error(f"Chat cache disk read error: {e}")
+                self._count('disk_errors')
+                found = None
+            if found is not None:
+                if record:
+                    self._count('disk_hits')
+                self._memory.set(key, found[0], age=found[1])
+                return found[0]
+        if record:
+            self._count('misses')
+        return None
+
+    def set(self, message, lang, concise, response):
+        key = cache_key(message, lang, concise)
+        self._memory.set(key, response)
+        self._count('stores')
+        if self.disk is not None:
+            try:
+                self.disk.set(key, response)
+            except sqlite3.Error as e:
+                logger.error(f"Chat cache disk write error: {e}")
+                self._count('disk_errors')
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        hits = counters['memory_hits'] + counters['disk_hits']
+        counters.update({
+            'hit_ratio': round(hits / counters['lookups'], 4) if counters['lookups'] else None,
+            'gemini_calls_saved': hits,
+            'entries': len(self._memory),
+            'evictions': self._memory.evictions,
+            'ttl_seconds': self._memory.ttl,
+            'disk_path': self.disk.path if self.disk is not None else None,
+        })
+        return counters
@@ -0,0 +1,290 @@
+"""
+Crop recommendation model: training data, training and the persisted artifact.
+
+The server used to fit the scaler and forest at import time in every worker.
+The model is now trained once by ``python -m backend.train_model`` and written
+to a single versioned artifact file. Next to it, ``<name>.engine.npz`` holds
+the flattened forest the server scores with, so workers start from NumPy
+arrays alone and never import sklearn (or the scipy/pandas it pulls in)
+unless that file is missing or was built from a different artifact.
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+import math
+import os
+import time
+
+import numpy as np
+
+from backend.inference import ForestEngine
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_FORMAT = 'ai-crop-advisor/crop-model'
+ARTIFACT_FORMAT_VERSION = 1
+
+# Column order the scaler and forest were fitted on
+FEATURES = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+# Matching JSON field names accepted by /api/predict
+REQUEST_FIELDS = ['nitrogen', 'phosphorus', 'potassium', 'temperature', 'humidity', 'ph', 'rainfall']
+
+# Rows train_accuracy is computed on
+ACCURACY_ROWS = 100_000
+
+DEFAULT_ARTIFACT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'crop_model.joblib')
+
+# Combined training data (corrected - all arrays have 30 elements)
+TRAINING_DATA = {
+    'N': [90, 80, 60, 55, 85, 74, 78, 50, 20, 40, 45, 55, 80, 70, 30, 25, 120, 110, 90, 100, 60, 80, 80, 60, 280, 50, 25, 150, 100, 500],
+    'P': [40, 45, 35, 30, 58, 35, 42, 25, 30, 35, 25, 40, 50, 45, 60, 70, 80, 75, 65, 70, 30, 35, 40, 40, 90, 75, 50, 100, 50, 250],
+    'K': [43, 40, 38, 35, 41, 40, 42, 20, 25, 30, 35, 25, 40, 35, 50, 60, 70, 65, 55, 60, 25, 30, 40, 40, 90, 30, 25, 100, 150, 500],
+    'temperature': [25, 26, 27, 23, 21.7, 26.4, 20.1, 15.5, 18.2, 22.1, 19.8, 24.3, 25.2, 28.5, 30.1, 32.5, 27.8, 29.2, 24.5, 26.8, 18.5, 22.3, 28, 30, 26, 27, 28, 24, 25, 23],
+    'humidity': [80, 75, 70, 68, 80, 80, 81, 75, 70, 85, 78, 83, 88, 85, 60, 55, 65, 62, 70, 68, 75, 78, 55, 50, 70, 65, 60, 70, 60, 60],
+    'ph': [6.5, 6.8, 7.0, 6.7, 7.0, 6.9, 7.6, 6.2, 6.8, 7.2, 6.4, 7.1, 7.5, 6.8, 8.2, 8.5, 7.8, 8.0, 7.2, 7.5, 6.0, 6.5, 7.0, 7.5, 6.8, 6.5, 6.3, 6.5, 6.8, 6.0],
+    'rainfall': [200, 210, 220, 190, 226, 242, 262, 180, 150, 200, 175, 210, 250, 280, 120, 90, 80, 100, 140, 160, 220, 240, 60, 50, 150, 80, 60, 80, 75, 100],
+    'label': [
+        'rice', 'wheat', 'maize', 'cotton', 'rice', 'rice', 'rice', 'wheat', 'wheat', 'wheat',
+        'wheat', 'wheat', 'maize', 'maize', 'cotton', 'cotton', 'sugarcane', 'sugarcane',
+        'potato', 'potato', 'tomato', 'tomato', 'jowar', 'bajra', 'sugarcane', 'soybean',
+        'groundnut', 'tomato', 'grapes', 'orange'
+    ]
+}
+
+
+class ArtifactError(ValueError):
+    """Raised when a model artifact is missing, malformed or fails its checksum"""
+
+
+class ModelArtifact:
+    """Fitted scaler and forest plus the metadata stored alongside them"""
+
+    def __init__(self, scaler, model, version, features=None, checksum=None, metadata=None, source='artifact'):
+        self.scaler = scaler
+        self.model = model
+        self.version = version
+        self.features = list(features or FEATURES)
+        self.checksum = checksum or compute_checksum(scaler, model, self.features)
+        self.metadata = metadata or {}
+        self.source = source
+
+    @property
+    def classes(self):
+        return [str(c) for c in self.model.classes_]
+
+
+def default_training_set():
+    """Return the bundled training rows as (X, y) NumPy arrays"""
+    X = np.column_stack([np.asarray(TRAINING_DATA[f], dtype=np.float64) for f in FEATURES])
+    y = np.asarray(TRAINING_DATA['label'])
+    return X, y
+
+
+def features_from_sample(sample):
+    """Validate one /api/predict payload and return its feature row in FEATURES order"""
+    if not isinstance(sample, dict):
+        raise ValueError('Sample must be a JSON object')
+    row = []
+    for field in REQUEST_FIELDS:
+        if field not in sample:
+            raise ValueError(f'Missing {field}')
+        try:
+            value = float(sample[field])
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid {field}') from None
+        if not math.isfinite(value):
+            raise ValueError(f'Invalid {field}')
+        row.append(value)
+    return row
+
+
+def compute_checksum(scaler, model, features):
+    """SHA-256 over the fitted parameters, independent of pickle layout"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps(list(features)).encode('utf-8'))
+    digest.update('\n'.join(str(c) for c in model.classes_).encode('utf-8'))
+    for arr in (scaler.mean_, scaler.scale_):
+        digest.update(np.ascontiguousarray(arr, dtype=np.float64).tobytes())
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        for arr in (tree.feature, tree.threshold, tree.children_left, tree.children_right, tree.value):
+            digest.update(np.ascontiguousarray(arr).tobytes())
+    return 'sha256:' + digest.hexdigest()
+
+
+def train_artifact(X=None, y=None, version=None, n_estimators=100, n_jobs=None, random_state=42,
+                   scaler=None, min_samples_leaf=1, metadata=None):
+    """Fit the scaler and forest and wrap them in a ModelArtifact
+
+    A ``scaler`` already fitted (e.g. incrementally over a whole dataset) is
+    used as is and only the forest is fitted on ``X``.
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    if X is None or y is None:
+        X, y = default_training_set()
+
+    started = time.perf_counter()
+    if scaler is None:
+        scaler = StandardScaler()
+        X_scaled = scaler.fit_transform(X)
+    else:
+        X_scaled = scaler.transform(X)
+    model = RandomForestClassifier(
+        n_estimators=n_estimators, random_state=random_state, n_jobs=n_jobs, min_samples_leaf=min_samples_leaf,
+    )
+    model.fit(X_scaled, y)
+    train_seconds = time.perf_counter() - started
+
+    created_at = datetime.datetime.now(datetime.timezone.utc)
+    metadata = {
+        'created_at': created_at.isoformat(),
+        'training_rows': int(len(y)),
+        'train_seconds': round(train_seconds, 4),
+        # Scored on at most ACCURACY_ROWS rows; scoring a large sample costs as much as fitting it
+        'train_accuracy': float(model.score(X_scaled[:ACCURACY_ROWS], y[:ACCURACY_ROWS])),
+        'n_estimators': n_estimators,
+        'min_samples_leaf': min_samples_leaf,
+        **(metadata or {}),
+    }
+    version = version or created_at.strftime('%Y%m%d%H%M%S')
+    return ModelArtifact(scaler, model, version, metadata=metadata, source='trained')
+
+
+def save_artifact(artifact, path):
+    """Write the artifact to ``path`` atomically and return the path"""
+    import joblib
+    import sklearn
+
+    payload = {
+        'format': ARTIFACT_FORMAT,
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'model_version': artifact.version,
+        'features': artifact.features,
+        'classes': artifact.classes,
+        'checksum': artifact.checksum,
+        'sklearn_version': sklearn.__version__,
+        'metadata': artifact.metadata,
+        'scaler': artifact.scaler,
+        'model': artifact.model,
+    }
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    # Uncompressed so that NumPy arrays can be memory-mapped on load
+    joblib.dump(payload, tmp_path, compress=0)
+    os.replace(tmp_path, path)
+    save_engine(artifact, path)
+    return path
+
+
+def engine_path(path):
+    """Serving sidecar stored next to the artifact at ``path``"""
+    return f"{os.path.splitext(path)[0]}.engine.npz"
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return 'sha256:' + digest.hexdigest()
+
+
+def model_info(artifact):
+    return {
+        'version': artifact.version,
+        'checksum': artifact.checksum,
+        'features': artifact.features,
+        'classes': artifact.classes,
+        'source': artifact.source,
+    }
+
+
+def save_engine(artifact, path, engine=None):
+    """Write the serving sidecar for the artifact file at ``path``"""
+    engine = engine or ForestEngine.from_artifact(artifact)
+    info = {**model_info(artifact), 'artifact_digest': file_digest(path)}
+    return engine.save(engine_path(path), metadata=info)
+
+
+def load_artifact(path, mmap=True):
+    """Load and verify an artifact written by save_artifact"""
+    import joblib
+
+    if not os.path.exists(path):
+        raise ArtifactError(f"Model artifact not found: {path}")
+    try:
+        payload = joblib.load(path, mmap_mode='r' if mmap else None)
+    except Exception as e:
+        raise ArtifactError(f"Could not read model artifact {path}: {e}") from e
+
+    if not isinstance(payload, dict) or payload.get('format') != ARTIFACT_FORMAT:
+        raise ArtifactError(f"{path} is not a crop model artifact")
+    if payload.get('format_version') != ARTIFACT_FORMAT_VERSION:
+        raise ArtifactError(f"Unsupported artifact format version {payload.get('format_version')} in {path}")
+    if list(payload.get('features', [])) != FEATURES:
+        raise ArtifactError(f"Artifact feature order {payload.get('features')} does not match {FEATURES}")
+
+    scaler, model = payload['scaler'], payload['model']
+    checksum = compute_checksum(scaler, model, payload['features'])
+    if checksum != payload.get('checksum'):
+        raise ArtifactError(f"Checksum mismatch for {path}: expected {payload.get('checksum')}, got {checksum}")
+
+    return ModelArtifact(
+        scaler, model, payload['model_version'],
+        features=payload['features'],
+        checksum=checksum,
+        metadata=payload.get('metadata', {}),
+    )
+
+
+def load_or_train(path=DEFAULT_ARTIFACT_PATH):
+    """Load the artifact at ``path``, training in-process only if it is unavailable"""
+    started = time.perf_counter()
+    try:
+        artifact = load_artifact(path)
+        logger.info(f"Loaded crop model {artifact.version} from {path} in {(time.perf_counter() - started) * 1000:.1f} ms")
+        return artifact
+    except ArtifactError as e:
+        logger.warning(f"{e}; training crop model in-process (run `python -m backend.train_model` to avoid this)")
+
+    artifact = train_artifact()
+    logger.info(
+        f"Model trained in-process in {(time.perf_counter() - started) * 1000:.1f} ms "
+        f"with accuracy: {artifact.metadata['train_accuracy']:.2%}"
+    )
+    return artifact
+
+
+def load_serving_engine(path=DEFAULT_ARTIFACT_PATH, allow_training=True):
+    """Return (ForestEngine, model info) for the request path
+
+    Uses the ``.engine.npz`` sidecar when it matches the artifact file byte for
+    byte; otherwise loads the artifact (training in-process if it is unusable
+    and ``allow_training``, else raising ArtifactError) and rewrites the sidecar.
+    """
+    started = time.perf_counter()
+    sidecar = engine_path(path)
+    try:
+        engine, info = ForestEngine.load(sidecar)
+        if info.get('features') == FEATURES and os.path.exists(path) and info.get('artifact_digest') == file_digest(path):
+            logger.info(f"Loaded crop model {info['version']} from {sidecar} in {(time.perf_counter() - started) * 1000:.1f} ms")
+            return engine, {**info, 'source': 'engine'}
+        logger.info(f"{sidecar} does not match {path}; rebuilding it")
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Could not read {sidecar}: {e}")
+
+    artifact = load_or_train(path) if allow_training else load_artifact(path)
+    engine = ForestEngine.from_artifact(artifact)
+    if artifact.source == 'artifact':
+        try:
+            save_engine(artifact, path, engine)
+        except OSError as e:
+            logger.warning(f"Could not write {sidecar}: {e}")
+    return engine, model_info(artifact)
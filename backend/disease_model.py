@@ -0,0 +1,209 @@
+"""
+CPU-only plant disease classifier for /api/disease-detection.
+
+An image is decoded and downscaled with Pillow, reduced to a compact feature
+vector with NumPy (HSV colour histograms, lesion colour fractions and
+gradient/texture statistics of the leaf area) and scored by a small
+multinomial logistic regression over the ``disease_database`` classes.
+Scoring is a single matrix product, so the trained parameters are stored as
+plain arrays and sklearn is only needed for training.
+"""
+
+import io
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DISEASE_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'disease_model.npz')
+
+# Images are analysed with their longest side resized to this, so features do
+# not depend on the camera resolution; JPEG draft mode decodes close to it
+ANALYSIS_SIDE = 192
+HUE_BINS = 12
+SAT_BINS = 4
+VAL_BINS = 4
+# Decoded size limit after draft mode (which only shrinks JPEGs): a small PNG
+# or WebP can declare dimensions that need hundreds of MB to decode
+MAX_IMAGE_PIXELS = 24_000_000
+
+
+class ImageDecodeError(ValueError):
+    """The upload could not be decoded as an image"""
+
+
+def decode_image(source):
+    """Decode bytes or a path into a PIL RGB image at the analysis resolution"""
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        img = Image.open(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
+        img.draft('RGB', (ANALYSIS_SIDE, ANALYSIS_SIDE))
+        if img.width * img.height > MAX_IMAGE_PIXELS:
+            raise ImageDecodeError(f"Image is too large ({img.width}x{img.height}); at most {MAX_IMAGE_PIXELS // 1_000_000} megapixels")
+        img = img.convert('RGB')
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        logger.info(f"Image decode failed: {e}")
+        raise ImageDecodeError('Could not decode image') from e
+    scale = ANALYSIS_SIDE / max(img.size)
+    if scale != 1:
+        img = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.BILINEAR)
+    return img
+
+
+def extract_features(img):
+    """Compact colour, lesion and texture descriptor of a decoded leaf image"""
+    hsv = np.asarray(img.convert('HSV'), dtype=np.float32)
+    h, s, v = hsv[..., 0], hsv[..., 1], hsv[..., 2]
+
+    # Saturated pixels are leaf or lesion; the background is washed out
+    plant = (s > 70) & (v > 25)
+    n_plant = max(int(plant.sum()), 1)
+    hp, sp, vp = h[plant], s[plant], v[plant]
+
+    hue_hist = np.histogram(hp, bins=HUE_BINS, range=(0, 256))[0] / n_plant
+    sat_hist = np.histogram(sp, bins=SAT_BINS, range=(0, 256))[0] / n_plant
+    val_hist = np.histogram(vp, bins=VAL_BINS, range=(0, 256))[0] / n_plant
+
+    # PIL hue is 0..255 for 0..360 degrees
+    green = plant & (h >= 45) & (h < 120)
+    yellow = plant & (h >= 28) & (h < 45)
+    brown = plant & ((h < 28) | (h >= 240))
+    dark = plant & (v < 90)
+    fractions = np.array([green.sum(), yellow.sum(), brown.sum(), dark.sum()], dtype=np.float64) / n_plant
+
+    # Boundary-to-area ratio of lesion pixels: many small spots score high,
+    # a few large lesions low
+    lesion = brown | dark
+    interior = lesion.copy()
+    interior[1:, :] &= lesion[:-1, :]
+    interior[:-1, :] &= lesion[1:, :]
+    interior[:, 1:] &= lesion[:, :-1]
+    interior[:, :-1] &= lesion[:, 1:]
+    n_lesion = int(lesion.sum())
+    edge_ratio = (n_lesion - int(interior.sum())) / n_lesion if n_lesion else 0.0
+
+    gy, gx = np.gradient(v)
+    magnitude = np.hypot(gx, gy)[plant]
+    texture = np.array([
+        magnitude.mean() / 255 if magnitude.size else 0.0,
+        magnitude.std() / 255 if magnitude.size else 0.0,
+        float((magnitude > 40).mean()) if magnitude.size else 0.0,
+        vp.std() / 255 if vp.size else 0.0,
+        sp.mean() / 255 if sp.size else 0.0,
+        vp.mean() / 255 if vp.size else 0.0,
+        edge_ratio,
+        n_plant / plant.size,
+    ])
+    return np.concatenate([hue_hist, sat_hist, val_hist, fractions, texture]).astype(np.float64)
+
+
+class DiseaseClassifier:
+    """Standardize-then-softmax linear model over image features"""
+
+    def __init__(self, classes, mean, scale, coef, intercept, metadata=None):
+        self.classes = [str(c) for c in classes]
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.intercept = np.asarray(intercept, dtype=np.float64)
+        self.metadata = metadata or {}
+
+    @classmethod
+    def train(cls, features, labels, classes=None, C=1.0):
+        from sklearn.linear_model import LogisticRegression
+
+        X = np.asarray(features, dtype=np.float64)
+        mean = X.mean(axis=0)
+        scale = X.std(axis=0)
+        scale[scale == 0] = 1.0
+        model = LogisticRegression(C=C, max_iter=2000)
+        model.fit((X - mean) / scale, labels)
+        coef, intercept = model.coef_, model.intercept_
+        if len(model.classes_) == 2:
+            # Binary sklearn models keep one row; expand to one per class
+            coef = np.vstack([-coef[0] / 2, coef[0] / 2])
+            intercept = np.array([-intercept[0] / 2, intercept[0] / 2])
+        classifier = cls(model.classes_, mean, scale, coef, intercept)
+        if classes is not None:
+            missing = sorted(set(classes) - set(classifier.classes))
+            if missing:
+                logger.warning(f"Disease classifier has no training samples for: {', '.join(missing)}")
+        return classifier
+
+    def predict_proba(self, features):
+        X = np.atleast_2d(np.asarray(features, dtype=np.float64))
+        logits = ((X - self.mean) / self.scale) @ self.coef.T + self.intercept
+        logits -= logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def classify(self, source):
+        """Decode, featurize and score one image; returns (label, confidence, probabilities, timings_ms)"""
+        started = time.perf_counter()
+        img = decode_image(source)
+        decoded = time.perf_counter()
+        features = extract_features(img)
+        featurized = time.perf_counter()
+        proba = self.predict_proba(features)[0]
+        classified = time.perf_counter()
+
+        best = int(proba.argmax())
+        timings = {
+            'decode_ms': round((decoded - started) * 1000, 2),
+            'features_ms': round((featurized - decoded) * 1000, 2),
+            'classify_ms': round((classified - featurized) * 1000, 2),
+        }
+        return self.classes[best], float(proba[best]), dict(zip(self.classes, proba.tolist())), timings
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp-{os.getpid()}.npz"
+        np.savez(
+            tmp_path,
+            classes=np.asarray(self.classes),
+            mean=self.mean, scale=self.scale, coef=self.coef, intercept=self.intercept,
+            metadata=np.asarray(json.dumps(self.metadata)),
+        )
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data['classes'].tolist(), data['mean'], data['scale'], data['coef'], data['intercept'],
+                metadata=json.loads(str(data['metadata'])),
+            )
+
+
+def train_on_samples(per_class=60, seed=0, classes=None, size=(128, 480)):
+    """Train on the procedurally generated sample set (see backend.disease_samples)"""
+    from backend.disease_samples import generate_samples
+
+    features, labels = [], []
+    for label, data in generate_samples(per_class=per_class, seed=seed, size=size):
+        features.append(extract_features(decode_image(data)))
+        labels.append(label)
+    classifier = DiseaseClassifier.train(features, labels, classes=classes)
+    classifier.metadata = {'training_set': 'synthetic', 'per_class': per_class, 'seed': seed}
+    return classifier
+
+
+def load_or_train_classifier(path=DEFAULT_DISEASE_MODEL_PATH, classes=None):
+    """Load the trained classifier, training on the synthetic sample set if it is missing"""
+    try:
+        classifier = DiseaseClassifier.load(path)
+        logger.info(f"Loaded disease classifier from {path}")
+        return classifier
+    except (OSError, KeyError, ValueError) as e:
+        logger.warning(f"Disease classifier unavailable ({e}); training on synthetic samples "
+                       f"(run `python -m backend.train_disease_model` to avoid this)")
+    started = time.perf_counter()
+    classifier = train_on_samples(classes=classes)
+    logger.info(f"Disease classifier trained in-process in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return classifier
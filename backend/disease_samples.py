@@ -0,0 +1,121 @@
+"""
+Procedurally generated leaf images for the disease classifier.
+
+There is no labelled field-photo set in the repository, so the bundled
+classifier is trained, and the throughput benchmark run, on synthetic leaves
+drawn with the visual cues listed in ``disease_database``: clean green leaves,
+small dark spots with yellow halos (bacterial spot) and larger brown lesions
+with concentric rings (early blight). Generation is deterministic for a seed.
+"""
+
+import io
+import os
+
+import numpy as np
+
+SAMPLE_CLASSES = ['healthy', 'bacterial_spot', 'early_blight']
+
+
+def _hsv_to_rgb(h, s, v):
+    """Vectorized HSV (all 0..1) to RGB (0..1)"""
+    i = np.floor(h * 6).astype(int) % 6
+    f = h * 6 - np.floor(h * 6)
+    p, q, t = v * (1 - s), v * (1 - f * s), v * (1 - (1 - f) * s)
+    choices = [(v, t, p), (q, v, p), (p, v, t), (p, q, v), (t, p, v), (v, p, q)]
+    r = np.select([i == k for k in range(6)], [c[0] for c in choices])
+    g = np.select([i == k for k in range(6)], [c[1] for c in choices])
+    b = np.select([i == k for k in range(6)], [c[2] for c in choices])
+    return np.stack([r, g, b], axis=-1)
+
+
+def _paint(img, mask, color, alpha=1.0):
+    img[mask] = img[mask] * (1 - alpha) + np.asarray(color, dtype=np.float64) * alpha
+
+
+def generate_leaf(kind, rng, size=160):
+    """Return an RGB uint8 array of one synthetic leaf of class ``kind``"""
+    yy, xx = np.mgrid[0:size, 0:size].astype(np.float64)
+    # Lesion and vein sizes were tuned at 160 px and scale with the image
+    k = size / 160
+    background = rng.uniform(0.55, 0.85, size=3)
+    img = np.ones((size, size, 3)) * background
+    img += rng.normal(0, 0.02, size=img.shape)
+
+    # Rotated elliptical leaf blade
+    cx, cy = size / 2 + rng.normal(0, size * 0.04, size=2)
+    angle = rng.uniform(0, np.pi)
+    a, b = size * rng.uniform(0.36, 0.45), size * rng.uniform(0.2, 0.28)
+    u = (xx - cx) * np.cos(angle) + (yy - cy) * np.sin(angle)
+    w = -(xx - cx) * np.sin(angle) + (yy - cy) * np.cos(angle)
+    leaf = (u / a) ** 2 + (w / b) ** 2 <= 1.0
+
+    hue = rng.uniform(0.24, 0.36)
+    shade = rng.normal(0, 0.03, size=(size, size))
+    green = _hsv_to_rgb(
+        np.full((size, size), hue) + shade * 0.3,
+        np.clip(rng.uniform(0.55, 0.8) + shade, 0, 1),
+        np.clip(rng.uniform(0.45, 0.7) + shade, 0, 1),
+    )
+    img[leaf] = green[leaf]
+
+    # Midrib and a few lateral veins
+    _paint(img, leaf & (np.abs(w) < 1.2 * k), (0.75, 0.85, 0.55), 0.5)
+    for offset in rng.uniform(-0.7, 0.7, size=rng.integers(3, 7)) * a:
+        vein = leaf & (np.abs(w - (u - offset) * rng.choice([-0.8, 0.8])) < 0.8 * k)
+        _paint(img, vein, (0.7, 0.82, 0.5), 0.3)
+
+    leaf_points = np.argwhere(leaf)
+
+    if kind == 'bacterial_spot':
+        for _ in range(rng.integers(18, 45)):
+            y0, x0 = leaf_points[rng.integers(len(leaf_points))]
+            r = rng.uniform(1.5, 3.5) * k
+            d = np.hypot(xx - x0, yy - y0)
+            _paint(img, leaf & (d < r * 2.0) & (d >= r), (0.85, 0.8, 0.25), 0.7)
+            _paint(img, leaf & (d < r), rng.uniform(0.08, 0.2) * np.array([1.0, 0.75, 0.45]), 1.0)
+    elif kind == 'early_blight':
+        for _ in range(rng.integers(3, 8)):
+            y0, x0 = leaf_points[rng.integers(len(leaf_points))]
+            r = rng.uniform(6, 14) * k
+            d = np.hypot(xx - x0, yy - y0)
+            _paint(img, leaf & (d < r * 1.3) & (d >= r), (0.75, 0.7, 0.3), 0.5)
+            lesion = leaf & (d < r)
+            rings = 0.5 + 0.5 * np.cos(d / k * rng.uniform(1.2, 1.8))
+            brown = np.stack([0.45 - 0.15 * rings, 0.3 - 0.12 * rings, 0.15 - 0.06 * rings], axis=-1)
+            img[lesion] = brown[lesion]
+    elif kind != 'healthy':
+        raise ValueError(f'Unknown sample class {kind}')
+
+    img *= rng.uniform(0.85, 1.15)
+    img += rng.normal(0, 0.015, size=img.shape)
+    return (np.clip(img, 0, 1) * 255).astype(np.uint8)
+
+
+def generate_samples(per_class=40, seed=0, size=160, quality=85):
+    """Yield (label, jpeg_bytes) for ``per_class`` leaves of every sample class.
+
+    ``size`` is a side length in pixels or a (min, max) range to draw from.
+    """
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    for i in range(per_class):
+        for kind in SAMPLE_CLASSES:
+            side = int(rng.integers(size[0], size[1] + 1)) if isinstance(size, tuple) else size
+            buffer = io.BytesIO()
+            Image.fromarray(generate_leaf(kind, rng, side)).save(buffer, format='JPEG', quality=quality)
+            yield kind, buffer.getvalue()
+
+
+def write_samples(directory, per_class=40, seed=0, size=160):
+    """Write a labelled sample set as ``directory/<class>/<n>.jpg``; returns the paths"""
+    paths = []
+    counts = {}
+    for kind, data in generate_samples(per_class, seed, size):
+        counts[kind] = counts.get(kind, 0) + 1
+        path = os.path.join(directory, kind, f'{counts[kind]:04d}.jpg')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        paths.append((kind, path))
+    return paths
@@ -0,0 +1,402 @@
+"""
+Shared outbound client layer for external APIs.
+
+Each upstream (OpenWeatherMap, Gemini) gets an ``UpstreamClient`` with its own
+pooled keep-alive ``requests.Session``, connect/read timeouts, a bound on
+concurrent calls, bounded retries with jittered exponential backoff and a
+circuit breaker that fails fast while the upstream is down. Latency and error
+statistics are kept per upstream and returned by ``upstream_stats()``.
+``requests`` itself is imported when a client first opens its session, so
+creating clients at startup costs nothing.
+
+``AsyncUpstreamClient`` is the asyncio counterpart used by async_app.py: the
+same retries, breaker and statistics over an aiohttp session, so waiting on
+an upstream holds a coroutine rather than a thread.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from backend.latency import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying: throttling and server-side failures
+RETRYABLE_STATUS = frozenset([429, 500, 502, 503, 504])
+
+
+class UpstreamError(Exception):
+    """Base class for failures raised by the client layer itself"""
+
+
+class CircuitOpenError(UpstreamError):
+    """The upstream's circuit breaker is open; the call was not attempted"""
+
+
+class UpstreamBusyError(UpstreamError):
+    """Every concurrent-call slot for the upstream stayed busy past the wait timeout"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open probe"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, name='upstream', clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.opened_count = 0
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def abandon_probe(self):
+        """An admitted call ended without an outcome (busy, cancelled): let the next call probe instead"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            self.state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.opened_count += 1
+                    logger.warning(f"{self.name} circuit opened after {self._failures} consecutive failures")
+                self.state = self.OPEN
+                self._opened_at = self._clock()
+
+
+class UpstreamClient:
+    """Pooled, bounded and instrumented access to one external API"""
+
+    def __init__(self, name, base_url='', connect_timeout=3.05, read_timeout=10.0, retries=2,
+                 backoff=0.25, max_backoff=2.0, pool_size=20, max_in_flight=32,
+                 failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pool_size = pool_size
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout, name=name)
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._session = None
+        self._session_pid = None
+        self._lock = threading.Lock()
+        self.latency = LatencyTracker()
+        self._counters = {'calls': 0, 'attempts': 0, 'retries': 0, 'errors': 0, 'short_circuited': 0, 'busy': 0}
+
+    @property
+    def session(self):
+        # Sessions (and their sockets) must not be shared across a fork
+        if self._session is None or self._session_pid != os.getpid():
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size, max_retries=0)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            self._session = session
+            self._session_pid = os.getpid()
+        return self._session
+
+    def reset(self):
+        """Drop pooled connections, e.g. after fork"""
+        if self._session is not None and self._session_pid == os.getpid():
+            self._session.close()
+        self._session = None
+        self._session_pid = None
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def _sleep_before_retry(self, attempt):
+        # Full jitter keeps retrying workers from synchronizing on a recovering upstream
+        time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt))))
+
+    def _run(self, attempt_fn, is_failure):
+        """Shared retry/breaker/stats loop; ``is_failure(result, error)`` marks transient failures"""
+        self._count('calls')
+        if not self.breaker.allow():
+            self._count('short_circuited')
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        try:
+            if not self._slots.acquire(timeout=self.timeout[0]):
+                self._count('busy')
+                raise UpstreamBusyError(f"{self.name} has too many calls in flight")
+
+            started = time.perf_counter()
+            try:
+                attempt = 0
+                while True:
+                    self._count('attempts')
+                    result, error = None, None
+                    try:
+                        result = attempt_fn()
+                    except Exception as e:
+                        error = e
+                    transient = is_failure(result, error)
+                    if not transient or attempt >= self.retries:
+                        break
+                    attempt += 1
+                    self._count('retries')
+                    self._sleep_before_retry(attempt)
+            finally:
+                self._slots.release()
+                self.latency.observe(time.perf_counter() - started)
+        except BaseException:
+            # No outcome to record; a half-open probe must not stay claimed
+            self.breaker.abandon_probe()
+            raise
+
+        if transient:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        if error is not None or transient:
+            self._count('errors')
+        if error is not None:
+            raise error
+        return result
+
+    def request(self, method, url, **kwargs):
+        """HTTP request with pooling, timeouts, retries and the breaker; returns the last response"""
+        if not url.startswith(('http://', 'https://')):
+            url = f"{self.base_url}/{url.lstrip('/')}"
+        kwargs.setdefault('timeout', self.timeout)
+
+        def is_failure(response, error):
+            if error is not None:
+                from requests import RequestException
+                return isinstance(error, RequestException)
+            return response.status_code in RETRYABLE_STATUS
+
+        return self._run(lambda: self.session.request(method, url, **kwargs), is_failure)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def call(self, fn, *args, retryable=None, **kwargs):
+        """Run an SDK call (e.g. Gemini) under the same retries, breaker and stats"""
+        retryable = retryable or (lambda e: isinstance(e, (ConnectionError, TimeoutError)))
+        return self._run(lambda: fn(*args, **kwargs), lambda result, error: error is not None and retryable(error))
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        counters.update({
+            'error_rate': round(counters['errors'] / counters['calls'], 4) if counters['calls'] else None,
+            'circuit': self.breaker.state,
+            'circuit_opened': self.breaker.opened_count,
+            'latency_ms': self.latency.snapshot(),
+        })
+        return counters
+
+
+class AsyncResponse:
+    """Status, headers and fully read body of an aiohttp response"""
+
+    __slots__ = ('status_code', 'headers', 'content')
+
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class AsyncUpstreamClient(UpstreamClient):
+    """UpstreamClient for coroutines: aiohttp session, asyncio slots and backoff"""
+
+    def __init__(self, name, max_in_flight=1000, **config):
+        super().__init__(name, max_in_flight=max_in_flight, **config)
+        self.max_in_flight = max_in_flight
+        self._loop = None
+
+    @property
+    def session(self):
+        # aiohttp sessions belong to one event loop (and, like sockets, one process)
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session_pid != os.getpid() or self._loop is not loop:
+            import aiohttp
+
+            connector = aiohttp.TCPConnector(limit=self.max_in_flight, limit_per_host=self.max_in_flight)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(sock_connect=self.timeout[0], sock_read=self.timeout[1]),
+            )
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+            self._session_pid = os.getpid()
+            self._loop = loop
+        return self._session
+
+    def reset(self):
+        # Closing needs the session's loop; after fork it is simply abandoned
+        self._session = None
+        self._session_pid = None
+        self._loop = None
+
+    async def close(self):
+        if self._session is not None and self._session_pid == os.getpid():
+            await self._session.close()
+        self.reset()
+
+    async def _sleep_before_retry(self, attempt):
+        await asyncio.sleep(random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt))))
+
+    async def _run(self, attempt_fn, is_failure):
+        self._count('calls')
+        if not self.breaker.allow():
+            self._count('short_circuited')
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        slots = self._slots
+        try:
+            try:
+                await asyncio.wait_for(slots.acquire(), timeout=self.timeout[0])
+            except asyncio.TimeoutError:
+                self._count('busy')
+                raise UpstreamBusyError(f"{self.name} has too many calls in flight") from None
+
+            started = time.perf_counter()
+            try:
+                attempt = 0
+                while True:
+                    self._count('attempts')
+                    result, error = None, None
+                    try:
+                        result = await attempt_fn()
+                    except Exception as e:
+                        error = e
+                    transient = is_failure(result, error)
+                    if not transient or attempt >= self.retries:
+                        break
+                    attempt += 1
+                    self._count('retries')
+                    await self._sleep_before_retry(attempt)
+            finally:
+                slots.release()
+                self.latency.observe(time.perf_counter() - started)
+        except BaseException:
+            # Busy or cancelled: a half-open probe must not stay claimed
+            self.breaker.abandon_probe()
+            raise
+
+        if transient:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        if error is not None or transient:
+            self._count('errors')
+        if error is not None:
+            raise error
+        return result
+
+    async def request(self, method, url, **kwargs):
+        """Like UpstreamClient.request; returns an AsyncResponse with the body read"""
+        import aiohttp
+
+        if not url.startswith(('http://', 'https://')):
+            url = f"{self.base_url}/{url.lstrip('/')}"
+        session = self.session
+
+        async def attempt():
+            async with session.request(method, url, **kwargs) as response:
+                return AsyncResponse(response.status, response.headers, await response.read())
+
+        def is_failure(response, error):
+            if error is not None:
+                return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError))
+            return response.status_code in RETRYABLE_STATUS
+
+        return await self._run(attempt, is_failure)
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def stream(self, method, url, **kwargs):
+        """Open a streamed response (connect and status retried); the caller must release it"""
+        import aiohttp
+
+        if not url.startswith(('http://', 'https://')):
+            url = f"{self.base_url}/{url.lstrip('/')}"
+        session = self.session
+
+        async def attempt():
+            response = await session.request(method, url, **kwargs)
+            if response.status in RETRYABLE_STATUS:
+                await response.read()
+                response.release()
+            return response
+
+        def is_failure(response, error):
+            if error is not None:
+                return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError))
+            return response.status in RETRYABLE_STATUS
+
+        return await self._run(attempt, is_failure)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(name, client_class=UpstreamClient, **config):
+    """Return the shared client for ``name``, creating it with ``config`` on first use"""
+    with _clients_lock:
+        client = _clients.get(name)
+        if client is None:
+            client = _clients[name] = client_class(name, **config)
+        return client
+
+
+def upstream_stats():
+    with _clients_lock:
+        clients = list(_clients.values())
+    return {client.name: client.stats() for client in clients}
+
+
+def reset_clients():
+    """Re-create pooled sessions on next use; call in each worker after fork"""
+    with _clients_lock:
+        clients = list(_clients.values())
+    for client in clients:
+        client.reset()
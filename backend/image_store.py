@@ -0,0 +1,144 @@
+"""
+Content-addressed store for uploaded plant images.
+
+Uploads are streamed to disk in chunks while their SHA-256 is computed; the
+hex digest is the image ID. Identical uploads are stored once, files expire
+after a TTL, and an upload larger than the size limit is rejected without
+buffering it in memory.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+_IMAGE_ID = re.compile(r'^[0-9a-f]{64}$')
+
+
+class ImageTooLargeError(ValueError):
+    """The upload exceeded the store's per-image size limit"""
+
+
+class ImageStore:
+    """SHA-256 keyed image files under ``root`` with a size limit and expiry"""
+
+    def __init__(self, root=None, max_bytes=10 * 1024 * 1024, ttl=3600, sweep_interval=300):
+        self.root = root or os.path.join(tempfile.gettempdir(), 'ai-crop-advisor-images')
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._tmp_dir = os.path.join(self.root, 'tmp')
+        os.makedirs(self._tmp_dir, exist_ok=True)
+        self._last_sweep = time.monotonic()
+        self._lock = threading.Lock()
+        self._counters = {'stored': 0, 'deduplicated': 0, 'rejected': 0, 'expired': 0}
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def _path_for(self, image_id):
+        return os.path.join(self.root, image_id[:2], image_id)
+
+    def put_stream(self, stream, chunk_size=CHUNK_SIZE):
+        """Copy a file-like object into the store; returns (image_id, size_bytes)"""
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        self._count('rejected')
+                        raise ImageTooLargeError(f'Image exceeds {self.max_bytes // (1024 * 1024)} MB limit')
+                    digest.update(chunk)
+                    out.write(chunk)
+            if size == 0:
+                raise ValueError('Empty image')
+
+            image_id = digest.hexdigest()
+            final_path = self._path_for(image_id)
+            if os.path.exists(final_path):
+                # Same bytes already stored; just extend its lifetime
+                os.utime(final_path)
+                self._count('deduplicated')
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(tmp_path, final_path)
+                tmp_path = None
+                self._count('stored')
+        finally:
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+        self._maybe_sweep()
+        return image_id, size
+
+    def put_bytes(self, data):
+        import io
+        return self.put_stream(io.BytesIO(data))
+
+    def path(self, image_id):
+        """Filesystem path of a stored, unexpired image, or None"""
+        if not isinstance(image_id, str) or not _IMAGE_ID.match(image_id):
+            return None
+        path = self._path_for(image_id)
+        try:
+            if time.time() - os.path.getmtime(path) >= self.ttl:
+                return None
+        except OSError:
+            return None
+        return path
+
+    def read(self, image_id):
+        path = self.path(image_id)
+        if path is None:
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def _maybe_sweep(self):
+        with self._lock:
+            if time.monotonic() - self._last_sweep < self.sweep_interval:
+                return
+            self._last_sweep = time.monotonic()
+        threading.Thread(target=self.sweep, name='image-store-sweep', daemon=True).start()
+
+    def sweep(self):
+        """Delete expired images and abandoned temp files"""
+        cutoff = time.time() - self.ttl
+        removed = 0
+        for dirpath, _dirnames, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.unlink(path)
+                        removed += 1
+                except OSError:
+                    continue
+        if removed:
+            self._count('expired', removed)
+            logger.info(f"Image store sweep removed {removed} expired files")
+        return removed
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+        os.makedirs(self._tmp_dir, exist_ok=True)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        counters.update({'root': self.root, 'max_bytes': self.max_bytes, 'ttl_seconds': self.ttl})
+        return counters
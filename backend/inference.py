@@ -0,0 +1,159 @@
+"""
+Low-overhead inference for the crop recommendation forest.
+
+``ForestEngine`` flattens every tree of the fitted RandomForestClassifier into
+shared contiguous NumPy arrays (feature, threshold, left/right child and
+normalized leaf class distribution) and folds the StandardScaler into the
+same object. Scoring a row is then a fixed number of vectorized gather steps
+across all trees at once, computing class probabilities a single time and
+deriving the label from them, without sklearn's per-call validation and
+job dispatch.
+
+The flattened arrays can be saved to an ``.npz`` file and loaded back with
+NumPy alone, which lets the server start without importing sklearn.
+"""
+
+import json
+import os
+
+import numpy as np
+
+# Rows traversed together; bounds the (trees x rows x classes) leaf gather
+DEFAULT_CHUNK_ROWS = 1024
+
+
+class ForestEngine:
+    """Scaler plus flattened forest, equivalent to ``model.predict_proba(scaler.transform(X))``"""
+
+    def __init__(self, mean, scale, classes, feature, threshold, left, right, leaf_values, roots, depth):
+        self.mean = np.ascontiguousarray(mean, dtype=np.float64)
+        self.scale = np.ascontiguousarray(scale, dtype=np.float64)
+        self.classes = np.asarray(classes)
+        self.feature = np.ascontiguousarray(feature, dtype=np.intp)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.left = np.ascontiguousarray(left, dtype=np.intp)
+        self.right = np.ascontiguousarray(right, dtype=np.intp)
+        self.leaf_values = np.ascontiguousarray(leaf_values, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.intp)
+        self.depth = int(depth)
+        self.n_features = self.mean.shape[0]
+
+    @classmethod
+    def from_artifact(cls, artifact):
+        return cls.from_sklearn(artifact.scaler, artifact.model)
+
+    @classmethod
+    def from_sklearn(cls, scaler, model):
+        """Flatten a fitted StandardScaler and RandomForestClassifier"""
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        depth = 0
+        offset = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            left = np.asarray(tree.children_left, dtype=np.intp)
+            right = np.asarray(tree.children_right, dtype=np.intp)
+            is_leaf = left == -1
+            own = np.arange(n_nodes, dtype=np.intp)
+            # Leaves point at themselves so every row can take exactly `depth` steps
+            lefts.append(np.where(is_leaf, own, left) + offset)
+            rights.append(np.where(is_leaf, own, right) + offset)
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+
+            # Same normalization DecisionTreeClassifier.predict_proba applies per leaf
+            value = np.asarray(tree.value[:, 0, :len(model.classes_)], dtype=np.float64)
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+
+            roots.append(offset)
+            depth = max(depth, tree.max_depth)
+            offset += n_nodes
+
+        if getattr(scaler, 'with_mean', True):
+            mean = scaler.mean_
+        else:
+            mean = np.zeros(scaler.n_features_in_)
+        if getattr(scaler, 'with_std', True):
+            scale = scaler.scale_
+        else:
+            scale = np.ones(scaler.n_features_in_)
+
+        return cls(
+            mean, scale, model.classes_,
+            np.concatenate(features), np.concatenate(thresholds),
+            np.concatenate(lefts), np.concatenate(rights),
+            np.concatenate(values), np.asarray(roots), depth,
+        )
+
+    _ARRAYS = ('mean', 'scale', 'classes', 'feature', 'threshold', 'left', 'right', 'leaf_values', 'roots')
+
+    def save(self, path, metadata=None):
+        """Write the flattened arrays (and a JSON ``metadata`` dict) to ``path`` atomically"""
+        arrays = {name: getattr(self, name) for name in self._ARRAYS}
+        arrays['classes'] = np.asarray([str(c) for c in self.classes])
+        arrays['depth'] = np.asarray(self.depth)
+        arrays['metadata'] = np.asarray(json.dumps(metadata or {}))
+        tmp_path = f"{path}.tmp-{os.getpid()}.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """Return (engine, metadata) from a file written by ``save``"""
+        with np.load(path, allow_pickle=False) as data:
+            engine = cls(*(data[name] for name in cls._ARRAYS), depth=int(data['depth']))
+            metadata = json.loads(str(data['metadata']))
+        return engine, metadata
+
+    @property
+    def n_trees(self):
+        return self.roots.shape[0]
+
+    @property
+    def n_nodes(self):
+        return self.feature.shape[0]
+
+    def transform(self, X):
+        """StandardScaler.transform, cast to the float32 the trees split on"""
+        return ((X - self.mean) / self.scale).astype(np.float32)
+
+    def _proba_chunk(self, Xs):
+        n_rows = Xs.shape[0]
+        nodes = np.repeat(self.roots[:, np.newaxis], n_rows, axis=1)
+        rows = np.arange(n_rows)[np.newaxis, :]
+        for _ in range(self.depth):
+            go_left = Xs[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        # (trees, rows, classes) summed tree by tree, matching sklearn's accumulation order
+        proba = self.leaf_values[nodes].sum(axis=0)
+        proba /= self.n_trees
+        return proba
+
+    def predict_proba(self, X, chunk_rows=DEFAULT_CHUNK_ROWS):
+        """Class probabilities for raw (unscaled) feature rows"""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {X.shape[1]}")
+        Xs = self.transform(X)
+        if Xs.shape[0] <= chunk_rows:
+            return self._proba_chunk(Xs)
+        return np.concatenate([
+            self._proba_chunk(Xs[start:start + chunk_rows])
+            for start in range(0, Xs.shape[0], chunk_rows)
+        ])
+
+    def predict(self, X, chunk_rows=DEFAULT_CHUNK_ROWS):
+        """Return (labels, confidences, probabilities) from a single probability pass"""
+        proba = self.predict_proba(X, chunk_rows=chunk_rows)
+        best = proba.argmax(axis=1)
+        return self.classes[best], proba[np.arange(best.shape[0]), best], proba
+
+    def predict_one(self, row):
+        """Label and confidence for a single feature row"""
+        labels, confidences, _ = self.predict([row])
+        return str(labels[0]), float(confidences[0])
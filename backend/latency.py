@@ -0,0 +1,30 @@
+"""
+Rolling latency percentiles for stats endpoints.
+"""
+
+import threading
+from collections import deque
+
+
+class LatencyTracker:
+    """Keeps the most recent ``maxlen`` observations (seconds) and summarizes them in ms"""
+
+    def __init__(self, maxlen=1024):
+        self.count = 0
+        self._samples = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.count += 1
+            self._samples.append(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            samples = sorted(self._samples)
+            count = self.count
+
+        def pct(p):
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 1) if samples else None
+
+        return {'count': count, 'p50': pct(0.50), 'p95': pct(0.95), 'p99': pct(0.99), 'max': pct(1.0), 'samples': len(samples)}
@@ -0,0 +1,466 @@
+"""
+Quantized feature-space lookup table for the crop model.
+
+Soil-test kits and weather readings have limited precision, so most
+/api/predict requests fall on a small set of feature combinations. A lookup
+table cuts each of the seven features into configured bins and keeps, for
+every cell, a class code and confidence in two flat uint8 arrays. A row inside
+the grid is then answered with one bin index per feature and one flat index
+into those arrays; rows outside the grid, and rows in cells the table does
+not answer, are scored by the live engine.
+
+A cell only answers when the model's label is certain to be the same
+everywhere in it. Building walks every tree over the grid: a cell that
+straddles a split reaches both children, so summing each tree's smallest and
+largest leaf probability per class bounds the forest's probabilities over the
+whole cell. Cells whose best class's lower bound beats every other class's
+upper bound, and whose best-class confidence varies by at most
+``max_spread``, store that class and the middle of its confidence bounds;
+every other cell is marked uncertain and falls through to the engine. A served
+answer therefore never disagrees with the model's label, and its confidence
+is within ``max_spread / 2`` (plus percent rounding) of the model's.
+
+Bins are configured per feature as ``[low, high, step]`` (uniform, indexed
+by arithmetic) or ``{"edges": [...]}`` (indexed by bisection); a cell covers
+``[edge, next edge)``. By default the edges sit at ``DEFAULT_MODEL_EDGES``
+quantiles of the forest's own split thresholds within the ``DEFAULT_BINS``
+ranges, which keeps more cells on one side of every split for the same cell
+count. ``report`` measures how much of the input space the table answers and
+how its answers compare with the model; the measured disagreement is recorded
+at build time and ``load_for_model`` refuses a table above
+``max_disagreement``. Confidences are stored as whole percents.
+
+The table is written next to the artifact as ``<name>.lookup.npz`` and is only
+used with the model checksum it was built from.
+
+    python -m backend.lookup_table build [--artifact PATH] [--bins bins.json | --model-edges 8] [--max-spread 0.5]
+    python -m backend.lookup_table report [--artifact PATH] [--data surveys.csv]
+"""
+
+import argparse
+import bisect
+import itertools
+import json
+import logging
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+from backend.crop_model import DEFAULT_ARTIFACT_PATH, FEATURES, default_training_set, load_serving_engine
+
+logger = logging.getLogger(__name__)
+
+# Per-feature [low, high, step]; the ranges model-aligned edges are placed in
+DEFAULT_BINS = {
+    'N': [0, 140, 20],
+    'P': [5, 145, 20],
+    'K': [5, 205, 25],
+    'temperature': [8, 44, 4.5],
+    'humidity': [14, 100, 10.75],
+    'ph': [3.5, 9.9, 0.8],
+    'rainfall': [20, 300, 35],
+}
+# Refuse grids that would take too long to score or too much memory to serve
+MAX_CELLS = 50_000_000
+CONFIDENCE_SCALE = 100
+# Bins per feature at split-threshold quantiles: 1.8M cells, about 3.5 MiB
+DEFAULT_MODEL_EDGES = 8
+# Widest best-class confidence range (over a cell) a served cell may have
+DEFAULT_MAX_SPREAD = 0.5
+# Highest recorded label disagreement load_for_model accepts
+DEFAULT_MAX_DISAGREEMENT = 0.001
+# Cells bounded per pass while building; bounds memory to a few arrays of this size per class
+BUILD_SLAB_CELLS = 65_536
+# Rows per sample set compared with the model when building
+BUILD_CHECK_ROWS = 20_000
+
+
+def lookup_path(path):
+    """Lookup table stored next to the artifact at ``path``"""
+    return f"{os.path.splitext(path)[0]}.lookup.npz"
+
+
+def _axis(feature, spec):
+    """(low, step, n_bins, edges) for one feature; ``step`` is None for explicit edges"""
+    if isinstance(spec, dict):
+        edges = [float(e) for e in spec.get('edges', [])]
+        if len(edges) < 2 or any(b <= a for a, b in zip(edges, edges[1:])):
+            raise ValueError(f"Bin edges for {feature} must be at least two increasing numbers")
+        return edges[0], None, len(edges) - 1, edges
+    try:
+        low, high, step = (float(v) for v in spec)
+    except (TypeError, ValueError):
+        raise ValueError(f"Bins for {feature} must be [low, high, step] or {{\"edges\": [...]}}") from None
+    if not step > 0 or not high > low:
+        raise ValueError(f"Bins for {feature} need high > low and a positive step")
+    n_bins = math.ceil((high - low) / step - 1e-9)
+    return low, step, n_bins, [low + step * i for i in range(n_bins + 1)]
+
+
+def bins_from_model(engine, bins_per_feature, ranges=None):
+    """Explicit edges at quantiles of each feature's split thresholds, within the ranges of ``ranges``"""
+    ranges = ranges or DEFAULT_BINS
+    is_split = engine.left != np.arange(engine.left.shape[0])
+    bins = {}
+    for j, feature in enumerate(FEATURES):
+        edges = _axis(feature, ranges[feature])[3]
+        low, high = edges[0], edges[-1]
+        # Trees split on scaled float32 values; map the thresholds back to raw units
+        thresholds = engine.threshold[is_split & (engine.feature == j)] * engine.scale[j] + engine.mean[j]
+        thresholds = thresholds[(thresholds > low) & (thresholds < high)]
+        inner = np.quantile(thresholds, np.linspace(0, 1, bins_per_feature + 1)[1:-1]) if len(thresholds) else []
+        bins[feature] = {'edges': [low, *np.unique(inner).tolist(), high]}
+    return bins
+
+
+def _scaled_bounds(engine, j, low, step, edges):
+    """Smallest and largest scaled float32 value the engine can see in each bin of feature ``j``"""
+    edges = np.asarray(edges, dtype=np.float64)
+    if step is None:
+        # Bisection is exact: a bin holds [edge, next edge)
+        lower, upper = edges[:-1], np.nextafter(edges[1:], -np.inf)
+    else:
+        # Arithmetic indexing can round a value into the neighbouring bin
+        slack = 1e-9 * np.maximum(1.0, np.abs(edges))
+        lower, upper = edges[:-1] - slack[:-1], edges[1:] + slack[1:]
+    # Same arithmetic as ForestEngine.transform, which is monotonic in the raw value
+    scale = lambda x: ((x - engine.mean[j]) / engine.scale[j]).astype(np.float32)
+    return scale(lower), scale(upper)
+
+
+def _certify_slab(engine, bounds, box, is_leaf):
+    """Summed per-tree (min, max) leaf probabilities per class over each cell of ``box``, shaped (classes, *box)"""
+    n_classes = engine.leaf_values.shape[1]
+    slab = tuple(b - a for a, b in box)
+    low_sum = np.zeros((n_classes,) + slab)
+    high_sum = np.zeros((n_classes,) + slab)
+    tree_low = np.empty_like(low_sum)
+    tree_high = np.empty_like(high_sum)
+    offsets = [a for a, _ in box]
+    for root in engine.roots.tolist():
+        tree_low.fill(np.inf)
+        tree_high.fill(-np.inf)
+        stack = [(root, list(box))]
+        while stack:
+            node, cells = stack.pop()
+            if is_leaf[node]:
+                view = (slice(None),) + tuple(slice(a - o, b - o) for (a, b), o in zip(cells, offsets))
+                values = engine.leaf_values[node].reshape((n_classes,) + (1,) * len(slab))
+                np.minimum(tree_low[view], values, out=tree_low[view])
+                np.maximum(tree_high[view], values, out=tree_high[view])
+                continue
+            j, threshold = engine.feature[node], engine.threshold[node]
+            lower, upper = bounds[j]
+            a, b = cells[j]
+            # Bins whose smallest value goes left, and bins whose largest value goes right
+            left_end = min(b, int(np.searchsorted(lower, threshold, side='right')))
+            right_start = max(a, int(np.searchsorted(upper, threshold, side='right')))
+            if a < left_end:
+                stack.append((engine.left[node], cells[:j] + [(a, left_end)] + cells[j + 1:]))
+            if right_start < b:
+                stack.append((engine.right[node], cells[:j] + [(right_start, b)] + cells[j + 1:]))
+        low_sum += tree_low
+        high_sum += tree_high
+    return low_sum, high_sum
+
+
+class LookupTable:
+    """Class code and confidence per grid cell, in C order over the FEATURES axes"""
+
+    def __init__(self, bins, classes, codes, confidence, metadata=None):
+        missing = [f for f in FEATURES if f not in bins]
+        if missing:
+            raise ValueError(f"No bins configured for {', '.join(missing)}")
+        self.bins = {f: bins[f] for f in FEATURES}
+        axes = [_axis(f, self.bins[f]) for f in FEATURES]
+        self.shape = tuple(n_bins for _, _, n_bins, _ in axes)
+        strides = np.cumprod((1,) + self.shape[:0:-1])[::-1]
+        # (low, step, n_bins, edges, stride) per feature; edges only kept for bisection
+        self._axes = [
+            (low, step, n_bins, None if step is not None else edges, int(stride))
+            for (low, step, n_bins, edges), stride in zip(axes, strides)
+        ]
+        self.edges = [np.asarray(edges) for _, _, _, edges in axes]
+        self.classes = np.asarray(classes)
+        self._labels = [str(c) for c in self.classes]
+        self.codes = np.ascontiguousarray(codes)
+        # Code of cells the table does not answer
+        self.uncertain = np.iinfo(self.codes.dtype).max
+        self.confidence = np.ascontiguousarray(confidence, dtype=np.uint8)
+        self.metadata = metadata or {}
+        if self.codes.shape != (self.cells,) or self.confidence.shape != (self.cells,):
+            raise ValueError(f"Table arrays do not match the {self.cells}-cell grid")
+
+    @property
+    def cells(self):
+        return math.prod(self.shape)
+
+    @property
+    def coverage(self):
+        """Share of cells the table answers"""
+        return float((self.codes != self.uncertain).mean())
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.confidence.nbytes + sum(e.nbytes for e in self.edges)
+
+    @staticmethod
+    def grid_size(bins):
+        return math.prod(_axis(f, bins[f])[2] for f in FEATURES)
+
+    @classmethod
+    def build(cls, engine, bins=None, metadata=None, max_spread=DEFAULT_MAX_SPREAD):
+        """Bound ``engine`` over every cell of ``bins`` (default: model-aligned edges) and keep the certain ones"""
+        bins = bins or bins_from_model(engine, DEFAULT_MODEL_EDGES)
+        cells = cls.grid_size(bins)
+        if cells > MAX_CELLS:
+            raise ValueError(f"Grid has {cells:,} cells, more than {MAX_CELLS:,}; use coarser bins")
+        axes = [_axis(f, bins[f]) for f in FEATURES]
+        shape = tuple(n_bins for _, _, n_bins, _ in axes)
+        bounds = [_scaled_bounds(engine, j, low, step, edges) for j, (low, step, _, edges) in enumerate(axes)]
+        is_leaf = engine.left == np.arange(engine.left.shape[0])
+        dtype = np.uint8 if len(engine.classes) < 255 else np.uint16
+        codes = np.full(shape, np.iinfo(dtype).max, dtype=dtype)
+        confidence = np.zeros(shape, dtype=np.uint8)
+        # Leading axes are walked one bin at a time, the rest as one slab
+        split = next(k for k in range(len(shape) + 1) if math.prod(shape[k:]) <= BUILD_SLAB_CELLS)
+        n_trees = engine.n_trees
+        started = time.perf_counter()
+        for lead in itertools.product(*(range(n) for n in shape[:split])):
+            box = [(i, i + 1) for i in lead] + [(0, n) for n in shape[split:]]
+            low_sum, high_sum = _certify_slab(engine, bounds, box, is_leaf)
+            best = low_sum.argmax(axis=0)[np.newaxis]
+            low_best = np.take_along_axis(low_sum, best, axis=0)[0]
+            high_best = np.take_along_axis(high_sum, best, axis=0)[0]
+            np.put_along_axis(high_sum, best, -np.inf, axis=0)
+            # Margins allow for summing the trees in a different order than the engine
+            certain = (low_best > high_sum.max(axis=0) + 1e-9 * n_trees) & (high_best - low_best <= max_spread * n_trees)
+            # The slab's leading axes are single bins
+            certain, best = certain.reshape(shape[split:]), best.reshape(shape[split:])
+            middle = ((low_best + high_best) / (2 * n_trees)).reshape(shape[split:])
+            codes[lead][certain] = best[certain]
+            confidence[lead][certain] = np.rint(middle[certain] * CONFIDENCE_SCALE)
+        metadata = {
+            **(metadata or {}),
+            'build_seconds': round(time.perf_counter() - started, 3),
+            'max_spread': max_spread,
+            'coverage': float((codes != np.iinfo(dtype).max).mean()),
+        }
+        return cls(bins, engine.classes, codes.ravel(), confidence.ravel(), metadata)
+
+    def index(self, row):
+        """Flat cell index of a feature row, or -1 outside the grid"""
+        flat = 0
+        for value, (low, step, n_bins, edges, stride) in zip(row, self._axes):
+            if step is not None:
+                position = (value - low) / step
+                # NaN fails the comparison too
+                if not 0 <= position < n_bins:
+                    return -1
+                flat += int(position) * stride
+            else:
+                i = bisect.bisect_right(edges, value) - 1
+                if value != value or not 0 <= i < n_bins:
+                    return -1
+                flat += i * stride
+        return flat
+
+    def get(self, row):
+        """(label, confidence) for a row in an answered cell, None elsewhere"""
+        i = self.index(row)
+        if i < 0:
+            return None
+        code = self.codes[i]
+        if code == self.uncertain:
+            return None
+        return self._labels[code], int(self.confidence[i]) / CONFIDENCE_SCALE
+
+    def indices(self, X):
+        """Vectorized ``index`` over the rows of ``X``"""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        flat = np.zeros(X.shape[0], dtype=np.int64)
+        inside = np.ones(X.shape[0], dtype=bool)
+        for j, (low, step, n_bins, edges, stride) in enumerate(self._axes):
+            if step is not None:
+                position = (X[:, j] - low) / step
+                within = (position >= 0) & (position < n_bins)
+                bins = np.where(within, position, 0).astype(np.int64)
+            else:
+                bins = np.searchsorted(self.edges[j], X[:, j], side='right') - 1
+                within = (bins >= 0) & (bins < n_bins)
+            inside &= within
+            flat += np.where(within, bins, 0) * stride
+        flat[~inside] = -1
+        return flat
+
+    def lookup(self, X):
+        """(labels, confidences, hit mask); entries the table does not answer are left unset"""
+        flat = self.indices(X)
+        hit = flat >= 0
+        hit[hit] = self.codes[flat[hit]] != self.uncertain
+        labels = np.empty(flat.shape[0], dtype=self.classes.dtype)
+        confidences = np.empty(flat.shape[0], dtype=np.float64)
+        labels[hit] = self.classes[self.codes[flat[hit]]]
+        confidences[hit] = self.confidence[flat[hit]] / CONFIDENCE_SCALE
+        return labels, confidences, hit
+
+    def save(self, path, metadata=None):
+        tmp_path = f"{path}.tmp-{os.getpid()}.npz"
+        metadata = {**self.metadata, **(metadata or {}), 'bins': self.bins}
+        np.savez(tmp_path, codes=self.codes, confidence=self.confidence, classes=self.classes.astype(str),
+                 metadata=np.array(json.dumps(metadata)))
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            metadata = json.loads(str(data['metadata']))
+            return cls(metadata['bins'], data['classes'], data['codes'], data['confidence'], metadata)
+
+
+def load_for_model(path, info, max_disagreement=DEFAULT_MAX_DISAGREEMENT):
+    """The table next to artifact ``path`` if it was built from the model in ``info``
+    and disagreed with it on at most ``max_disagreement`` of the rows it answered, else None"""
+    table_path = lookup_path(path)
+    try:
+        table = LookupTable.load(table_path)
+    except FileNotFoundError:
+        logger.info(f"No lookup table at {table_path}; every prediction uses the model")
+        return None
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Could not read lookup table {table_path}: {e}")
+        return None
+    if table.metadata.get('checksum') != info.get('checksum') or list(table.classes) != list(info.get('classes', [])):
+        logger.warning(f"Lookup table {table_path} was built for model {table.metadata.get('version')}, "
+                       f"not {info.get('version')}; ignoring it (rebuild with `python -m backend.lookup_table build`)")
+        return None
+    disagreement = table.metadata.get('disagreement')
+    if disagreement is None or disagreement > max_disagreement:
+        measured = 'was not measured' if disagreement is None else f"is {disagreement:.2%}, above {max_disagreement:.2%}"
+        logger.warning(f"Disagreement of lookup table {table_path} with the model {measured}; "
+                       f"ignoring it (rebuild with `python -m backend.lookup_table build`)")
+        return None
+    logger.info(f"Loaded lookup table for crop model {info['version']}: {table.cells:,} cells ({table.coverage:.1%} answered), {table.nbytes / 2**20:.1f} MiB")
+    return table
+
+
+def build_for_artifact(path, bins=None, engine=None, info=None, max_spread=DEFAULT_MAX_SPREAD):
+    """Build the table for the artifact at ``path``, measure it against the model and save it; returns the table"""
+    if engine is None:
+        engine, info = load_serving_engine(path, allow_training=False)
+    table = LookupTable.build(engine, bins, {'version': info['version'], 'checksum': info['checksum']}, max_spread)
+    # Recorded for load_for_model; certified cells should never disagree
+    results = [compare(table, engine, X) for X in report_samples(table, rows=BUILD_CHECK_ROWS).values()]
+    answered = sum(r['answered'] for r in results)
+    table.metadata['disagreement'] = sum(r['disagree'] for r in results) / answered if answered else 0.0
+    table.metadata['max_confidence_error'] = max(r['max_confidence_error'] for r in results)
+    table.save(lookup_path(path))
+    return table
+
+
+def compare(table, engine, X):
+    """How ``table`` differs from ``engine`` on the rows of ``X``"""
+    labels, confidences, _ = engine.predict(X)
+    table_labels, table_confidences, hit = table.lookup(X)
+    answered = int(hit.sum())
+    disagree = int((table_labels[hit] != labels[hit]).sum())
+    confidence_error = np.abs(table_confidences[hit] - confidences[hit])
+    return {
+        'rows': len(X),
+        'in_grid': int((table.indices(X) >= 0).sum()),
+        'answered': answered,
+        'disagree': disagree,
+        'disagreement': disagree / answered if answered else 0.0,
+        'mean_confidence_error': float(confidence_error.mean()) if answered else 0.0,
+        'max_confidence_error': float(confidence_error.max()) if answered else 0.0,
+    }
+
+
+def report_samples(table, data=None, rows=100_000, seed=0):
+    """Named sample sets to compare on: bundled rows, fields near them, uniform grid rows, and optional survey files"""
+    rng = np.random.default_rng(seed)
+    low = np.array([e[0] for e in table.edges])
+    high = np.array([e[-1] for e in table.edges])
+    bundled = default_training_set()[0]
+    samples = {
+        'bundled rows': bundled,
+        # Each feature within 10% of a bundled row, as neighbouring fields read
+        'near bundled': bundled[rng.integers(0, len(bundled), size=rows)] * rng.uniform(0.9, 1.1, size=(rows, len(FEATURES))),
+        'uniform in grid': low + rng.random((rows, len(FEATURES))) * (high - low),
+    }
+    if data:
+        from backend.training_data import iter_chunks
+
+        survey = []
+        for path in data:
+            for X, _, _ in iter_chunks(path):
+                survey.append(X)
+                if sum(len(x) for x in survey) >= rows:
+                    break
+        samples['survey data'] = np.concatenate(survey)[:rows]
+    return samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build or evaluate the crop model lookup table')
+    parser.add_argument('command', choices=['build', 'report'])
+    parser.add_argument('--artifact', default=os.environ.get('CROP_MODEL_PATH', DEFAULT_ARTIFACT_PATH),
+                        help='crop model artifact (default: $CROP_MODEL_PATH or backend/data/crop_model.joblib)')
+    parser.add_argument('--bins', default=None,
+                        help=f"JSON file of per-feature bins (default: {DEFAULT_MODEL_EDGES} model-aligned bins over DEFAULT_BINS' ranges)")
+    parser.add_argument('--model-edges', type=int, default=None, metavar='N',
+                        help="N bins per feature with edges at the model's split thresholds, over --bins' ranges")
+    parser.add_argument('--max-spread', type=float, default=DEFAULT_MAX_SPREAD,
+                        help='widest confidence range over a cell the table still answers for')
+    parser.add_argument('--data', action='append', default=[], metavar='PATH', help='survey CSV/Parquet rows to report on')
+    parser.add_argument('--samples', type=int, default=100_000, help='rows per report sample set')
+    parser.add_argument('--json', default=None, help='also write the report as JSON to this path')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    engine, info = load_serving_engine(args.artifact, allow_training=False)
+    if args.command == 'build':
+        bins = None
+        if args.bins:
+            with open(args.bins) as f:
+                bins = json.load(f)
+        if args.model_edges or bins is None:
+            bins = bins_from_model(engine, args.model_edges or DEFAULT_MODEL_EDGES, bins)
+        try:
+            table = build_for_artifact(args.artifact, bins, engine, info, args.max_spread)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 1
+        print(f"Wrote {lookup_path(args.artifact)}: {table.cells:,} cells {table.shape}, "
+              f"{table.nbytes / 2**20:.1f} MiB, {table.coverage:.1%} of cells answered, "
+              f"built in {table.metadata['build_seconds']:.1f} s")
+
+    # Reports on any table built for this model, including one serving would refuse
+    table = load_for_model(args.artifact, info, max_disagreement=1.0)
+    if table is None:
+        print(f"No usable lookup table for {args.artifact}; run `python -m backend.lookup_table build`", file=sys.stderr)
+        return 1
+    results = {name: compare(table, engine, X) for name, X in report_samples(table, args.data, args.samples).items()}
+    engine_bytes = sum(a.nbytes for a in (engine.feature, engine.threshold, engine.left, engine.right, engine.leaf_values))
+    print(f"Model {info['version']}: table {table.cells:,} cells ({table.coverage:.1%} answered), "
+          f"{table.nbytes / 2**20:.2f} MiB (engine arrays {engine_bytes / 2**20:.2f} MiB); "
+          f"recorded disagreement {table.metadata.get('disagreement', float('nan')):.2%}")
+    print(f"{'sample':<18} {'rows':>9} {'in grid':>8} {'answered':>9} {'disagree':>9} {'mean |dconf|':>13} {'max |dconf|':>12}")
+    for name, r in results.items():
+        print(f"{name:<18} {r['rows']:>9,} {r['in_grid'] / r['rows']:>8.1%} {r['answered'] / r['rows']:>9.1%} "
+              f"{r['disagreement']:>9.2%} {r['mean_confidence_error']:>13.3f} {r['max_confidence_error']:>12.3f}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'version': info['version'], 'cells': table.cells, 'coverage': table.coverage, 'table_bytes': table.nbytes,
+                       'engine_bytes': engine_bytes, 'samples': results}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,299 @@
+"""
+Prometheus-style request and dependency metrics.
+
+Counters, gauges and histograms are plain in-process structures updated
+under a per-metric lock. Each process periodically writes a snapshot to
+``<directory>/metrics-<pid>.json``; ``/metrics`` merges its own live values
+with the snapshots of its sibling worker processes (same parent, still
+running) and renders the Prometheus text format. Values from other workers
+are therefore up to one flush interval old, and a worker's counts leave the
+totals when it exits, which Prometheus treats as a counter reset.
+"""
+
+import bisect
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_METRICS_DIR = os.path.join(tempfile.gettempdir(), 'ai-crop-advisor-metrics')
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}")
+        return _Child(self, tuple(str(v) for v in values))
+
+    def samples(self):
+        with self._lock:
+            return [[list(k), self._copy(v)] for k, v in self._values.items()]
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+    def describe(self):
+        return {'type': self.type, 'help': self.documentation, 'labelnames': list(self.labelnames)}
+
+
+class _Child:
+    """A metric bound to one set of label values"""
+
+    __slots__ = ('metric', 'key')
+
+    def __init__(self, metric, key):
+        self.metric = metric
+        self.key = key
+
+    def inc(self, amount=1):
+        self.metric.inc(amount, self.key)
+
+    def dec(self, amount=1):
+        self.metric.dec(amount, self.key)
+
+    def set(self, value):
+        self.metric.set(value, self.key)
+
+    def observe(self, value):
+        self.metric.observe(value, self.key)
+
+    def time(self):
+        return self.metric.time(self.key)
+
+    def track_inprogress(self):
+        return self.metric.track_inprogress(self.key)
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, key=()):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = 'gauge'
+
+    def inc(self, amount=1, key=()):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, key=()):
+        self.inc(-amount, key)
+
+    def set(self, value, key=()):
+        with self._lock:
+            self._values[key] = value
+
+    @contextmanager
+    def track_inprogress(self, key=()):
+        self.inc(1, key)
+        try:
+            yield
+        finally:
+            self.inc(-1, key)
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, key=()):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, then +Inf, sum
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, key=()):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, key)
+
+    @staticmethod
+    def _copy(value):
+        return list(value)
+
+    def describe(self):
+        return {**super().describe(), 'buckets': list(self.buckets)}
+
+
+def _merge(families, snapshot):
+    for name, family in snapshot.items():
+        target = families.setdefault(name, {**family, 'samples': {}})
+        for labels, value in family['samples']:
+            key = tuple(labels)
+            current = target['samples'].get(key)
+            if current is None:
+                target['samples'][key] = list(value) if isinstance(value, list) else value
+            elif isinstance(value, list):
+                target['samples'][key] = [a + b for a, b in zip(current, value)]
+            else:
+                target['samples'][key] = current + value
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MetricsRegistry:
+    """Metric families of this process plus the snapshot files shared with its sibling workers"""
+
+    def __init__(self, directory=None, flush_interval=5.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._writer_pid = None
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {m.name: {**m.describe(), 'samples': m.samples()} for m in metrics}
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f"metrics-{pid}.json")
+
+    def start_writer(self):
+        """Start this process's snapshot writer (idempotent, restarted after fork)"""
+        if self.directory is None or self._writer_pid == os.getpid():
+            return
+        with self._lock:
+            if self._writer_pid == os.getpid():
+                return
+            self._writer_pid = os.getpid()
+        os.makedirs(self.directory, exist_ok=True)
+        threading.Thread(target=self._write_loop, name='metrics-writer', daemon=True).start()
+
+    def _write_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.write_snapshot()
+            except Exception as e:
+                logger.error(f"Metrics snapshot write error: {e}")
+
+    def write_snapshot(self):
+        data = {'pid': os.getpid(), 'ppid': os.getppid(), 'written': time.time(), 'families': self.snapshot()}
+        path = self._path(os.getpid())
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def _sibling_snapshots(self):
+        if self.directory is None:
+            return []
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            pid = data.get('pid')
+            if pid == os.getpid():
+                continue
+            if not _pid_alive(pid):
+                # Gone for good; keep the directory from growing with restarts
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+                continue
+            if data.get('ppid') == os.getppid():
+                snapshots.append(data['families'])
+        return snapshots
+
+    def collect(self):
+        """Merged families: {name: {type, help, labelnames, [buckets], samples: {labels: value}}}"""
+        families = {}
+        _merge(families, self.snapshot())
+        for snapshot in self._sibling_snapshots():
+            _merge(families, snapshot)
+        return families
+
+    def render(self):
+        """Prometheus text exposition format (0.0.4)"""
+        lines = []
+        for name, family in sorted(self.collect().items()):
+            lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['type']}")
+            labelnames = family['labelnames']
+            for labels, value in sorted(family['samples'].items()):
+                if family['type'] != 'histogram':
+                    lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(family['buckets'] + [float('inf')], value[:-1]):
+                    cumulative += count
+                    le = (('le', _format_value(float(bound))),)
+                    lines.append(f"{name}_bucket{_format_labels(labelnames, labels, le)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labelnames, labels)} {_format_value(float(value[-1]))}")
+                lines.append(f"{name}_count{_format_labels(labelnames, labels)} {cumulative}")
+        return '\n'.join(lines) + '\n'
+
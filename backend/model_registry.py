@@ -0,0 +1,318 @@
+"""
+Versioned crop model registry and the hot-swappable serving model.
+
+A registry is a directory of published versions plus a pointer to the active
+one::
+
+    <root>/<version>/crop_model.joblib       artifact (backend/crop_model.py)
+    <root>/<version>/crop_model.engine.npz   serving sidecar
+    <root>/CURRENT                           name of the active version
+
+``python -m backend.train_model --registry DIR`` publishes a version and
+makes it current. ``python -m backend.model_registry --registry DIR activate
+VERSION`` switches (or rolls back) without retraining.
+
+``ModelHolder`` owns the model a worker serves. A reload loads and warms the
+new engine off the request path and then replaces ``holder.current`` in one
+assignment; a request reads ``current`` once, so requests already in flight
+finish on the model they started with. Without a registry the holder serves a
+single artifact path and reloads it when the file is replaced.
+
+With ``lookup=True`` a model also carries the quantized lookup table stored
+next to its artifact (backend/lookup_table.py), if one was built for it; the
+table is swapped together with its model, and writing a new table is itself a
+change a reload picks up.
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+
+import numpy as np
+
+from backend.crop_model import default_training_set, load_serving_engine, save_artifact
+from backend.lookup_table import DEFAULT_MAX_DISAGREEMENT, load_for_model, lookup_path
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_NAME = 'crop_model.joblib'
+CURRENT_FILE = 'CURRENT'
+
+
+class RegistryError(ValueError):
+    """Raised for unknown versions, duplicate publishes or an empty registry"""
+
+
+class ModelRegistry:
+    """Published model versions under ``root`` and the pointer to the active one"""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def versions(self):
+        """Published versions, oldest first (versions default to UTC timestamps)"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if not name.startswith('.') and os.path.isfile(os.path.join(self.root, name, ARTIFACT_NAME))
+        )
+
+    def path(self, version):
+        path = os.path.join(self.root, version, ARTIFACT_NAME)
+        if os.sep in version or version.startswith('.') or not os.path.isfile(path):
+            raise RegistryError(f"Unknown model version {version!r} in {self.root}")
+        return path
+
+    def current(self):
+        """The active version, or None when nothing was activated yet"""
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def activate(self, version):
+        self.path(version)
+        pointer = os.path.join(self.root, CURRENT_FILE)
+        tmp_path = f"{pointer}.tmp-{os.getpid()}"
+        with open(tmp_path, 'w') as f:
+            f.write(version + '\n')
+        # Watchers see either the old or the new name, never a partial one
+        os.replace(tmp_path, pointer)
+        logger.info(f"Activated crop model {version} in {self.root}")
+
+    def publish(self, artifact, activate=True):
+        """Write ``artifact`` as version ``artifact.version``; returns its artifact path"""
+        version = artifact.version
+        destination = os.path.join(self.root, version)
+        if os.sep in version or version.startswith('.') or version == CURRENT_FILE:
+            raise RegistryError(f"Invalid model version {version!r}")
+        if os.path.exists(destination):
+            raise RegistryError(f"Model version {version} is already published in {self.root}")
+        staging = os.path.join(self.root, f".staging-{version}-{os.getpid()}")
+        try:
+            save_artifact(artifact, os.path.join(staging, ARTIFACT_NAME))
+            # The version directory appears complete or not at all
+            os.rename(staging, destination)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        if activate:
+            self.activate(version)
+        return self.path(version)
+
+
+class ServingModel:
+    """An engine, its lookup table and model info; replaced as a whole, never mutated"""
+
+    __slots__ = ('engine', 'lookup', 'info', 'version', 'source_key', 'loaded_at')
+
+    def __init__(self, engine, info, source_key, lookup=None):
+        self.engine = engine
+        self.lookup = lookup
+        self.info = info
+        self.version = info['version']
+        self.source_key = source_key
+        self.loaded_at = time.time()
+
+    def predict_one(self, row):
+        """(label, confidence, mode): mode 'lookup' when the table's grid covers ``row``, else 'single'"""
+        if self.lookup is not None:
+            hit = self.lookup.get(row)
+            if hit is not None:
+                return hit[0], hit[1], 'lookup'
+        label, confidence = self.engine.predict_one(row)
+        return label, confidence, 'single'
+
+    def predict(self, rows):
+        """(labels, confidences, table hits) for many rows; the engine only scores rows outside the grid"""
+        if self.lookup is None:
+            labels, confidences, _ = self.engine.predict(rows)
+            return labels, confidences, 0
+        labels, confidences, hit = self.lookup.lookup(rows)
+        if not hit.all():
+            miss = ~hit
+            labels[miss], confidences[miss], _ = self.engine.predict(np.asarray(rows, dtype=np.float64)[miss])
+        return labels, confidences, int(hit.sum())
+
+
+class ModelHolder:
+    """The crop model a worker serves, reloaded in the background and swapped atomically"""
+
+    def __init__(self, registry=None, path=None, on_swap=None, on_failure=None, lookup=False,
+                 lookup_max_disagreement=DEFAULT_MAX_DISAGREEMENT):
+        if registry is None and path is None:
+            raise ValueError('ModelHolder needs a registry or an artifact path')
+        self.registry = registry
+        self.path = path
+        self.lookup = lookup
+        self.lookup_max_disagreement = lookup_max_disagreement
+        self.on_swap = on_swap
+        self.on_failure = on_failure
+        self.current = None
+        self._reload_lock = threading.Lock()
+        self._watcher_lock = threading.Lock()
+        self._watcher_pid = None
+        # A version that failed to load is not retried until it changes (or a forced reload)
+        self._failed_key = None
+        self._counters = {'reloads': 0, 'swaps': 0, 'failures': 0}
+        self.last_error = None
+
+    def _source(self):
+        """(artifact path, key that changes whenever a reload would load something else)"""
+        path, key = self._artifact_source()
+        if self.lookup:
+            key = (key, self._file_key(lookup_path(path)))
+        return path, key
+
+    def _artifact_source(self):
+        if self.registry is not None:
+            version = self.registry.current()
+            if version is None:
+                if self.path is None:
+                    raise RegistryError(f"No active model version in {self.registry.root}")
+                # Empty registry: serve the bundled artifact until a version is published
+                return self.path, self._file_key(self.path)
+            return self.registry.path(version), ('version', version)
+        return self.path, self._file_key(self.path)
+
+    @staticmethod
+    def _file_key(path):
+        try:
+            stat = os.stat(path)
+            return ('file', path, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            return ('file', path, None, None)
+
+    def load(self):
+        """Initial synchronous load; returns the ServingModel"""
+        self.reload(force=True)
+        return self.current
+
+    @staticmethod
+    def warm_up(engine):
+        """Score the bundled rows once: pages the arrays in and rejects an engine that cannot predict"""
+        X, _ = default_training_set()
+        _, confidences, _ = engine.predict(X)
+        engine.predict_one(X[0])
+        if not np.all(np.isfinite(confidences)):
+            raise ValueError('Engine produced non-finite confidences during warm-up')
+
+    def reload(self, force=False):
+        """Load the registry's current version (or the replaced file) and swap it in
+
+        Returns {'changed', 'version', 'previous'}; on failure the old model
+        keeps serving and the error is raised.
+        """
+        with self._reload_lock:
+            previous = self.current
+            key = None
+            try:
+                path, key = self._source()
+                if not force and previous is not None and key in (previous.source_key, self._failed_key):
+                    return {'changed': False, 'version': previous.version, 'previous': previous.version}
+                self._counters['reloads'] += 1
+                started = time.perf_counter()
+                # Only the first load may train in-process; a broken new version must not replace a working one
+                engine, info = load_serving_engine(path, allow_training=previous is None)
+                self.warm_up(engine)
+                lookup = load_for_model(path, info, self.lookup_max_disagreement) if self.lookup else None
+            except Exception as e:
+                self._counters['failures'] += 1
+                self._failed_key = key
+                self.last_error = str(e)
+                logger.error(f"Crop model reload failed, still serving {previous.version if previous else 'nothing'}: {e}")
+                if self.on_failure is not None:
+                    self.on_failure(e)
+                raise
+            model = ServingModel(engine, info, key, lookup)
+            # Single reference assignment: requests read .current once
+            self.current = model
+            self._counters['swaps'] += 1
+            self._failed_key = None
+            self.last_error = None
+        logger.info(f"Serving crop model {model.version} from {path} "
+                    f"(loaded and warmed in {(time.perf_counter() - started) * 1000:.1f} ms, pid {os.getpid()})")
+        if self.on_swap is not None:
+            self.on_swap(previous, model)
+        return {'changed': True, 'version': model.version, 'previous': previous.version if previous else None}
+
+    def reload_async(self):
+        """Reload on a background thread (signal handlers and watchers must not block)"""
+        def run():
+            try:
+                self.reload()
+            except Exception:
+                pass  # Logged and counted by reload
+        thread = threading.Thread(target=run, name='model-reload', daemon=True)
+        thread.start()
+        return thread
+
+    def start_watcher(self, interval):
+        """Poll for a new current version every ``interval`` seconds (idempotent, restarted after fork)"""
+        if interval <= 0 or self._watcher_pid == os.getpid():
+            return
+        with self._watcher_lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+        threading.Thread(target=self._watch_loop, args=(interval,), name='model-watcher', daemon=True).start()
+
+    def _watch_loop(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.reload()
+            except Exception:
+                pass  # Logged and counted by reload; retried next interval
+
+    def stats(self):
+        model = self.current
+        return {
+            'version': model.version if model else None,
+            'source': model.info.get('source') if model else None,
+            'loaded_at': model.loaded_at if model else None,
+            'registry': self.registry.root if self.registry else None,
+            'registry_current': self.registry.current() if self.registry else None,
+            'watching': self._watcher_pid == os.getpid(),
+            'last_error': self.last_error,
+            'lookup_table': {
+                'cells': model.lookup.cells,
+                'bytes': model.lookup.nbytes,
+                'shape': model.lookup.shape,
+            } if model and model.lookup is not None else None,
+            **self._counters,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='List or activate crop model versions')
+    parser.add_argument('--registry', default=os.environ.get('MODEL_REGISTRY_DIR'), required='MODEL_REGISTRY_DIR' not in os.environ,
+                        help='registry directory (default: $MODEL_REGISTRY_DIR)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='published versions, the active one marked with *')
+    activate = commands.add_parser('activate', help='make VERSION current; serving workers pick it up')
+    activate.add_argument('version')
+    args = parser.parse_args(argv)
+
+    registry = ModelRegistry(args.registry)
+    if args.command == 'activate':
+        try:
+            registry.activate(args.version)
+        except RegistryError as e:
+            print(e, file=sys.stderr)
+            return 1
+        print(f"Activated {args.version}")
+        return 0
+    current = registry.current()
+    for version in registry.versions():
+        print(f"{'*' if version == current else ' '} {version}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
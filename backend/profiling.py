@@ -0,0 +1,178 @@
+"""
+Opt-in cProfile capture of individual requests.
+
+A request is profiled when it is picked by the sampling rate or carries a
+valid ``X-Profile-Signature`` header: ``<unix_ts>.<hex HMAC-SHA256 of
+"<unix_ts>.<METHOD>.<path>">`` under the shared secret, accepted for five
+minutes. Each capture is written as a pstats file next to a JSONL index of
+route, status, duration and the top frames by cumulative time.
+
+Generate a header value with::
+
+    PROFILE_SECRET=... python -m backend.profiling sign GET /api/predict
+"""
+
+import cProfile
+import hashlib
+import hmac
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_DIR = os.path.join(tempfile.gettempdir(), 'ai-crop-advisor-profiles')
+SIGNATURE_HEADER = 'X-Profile-Signature'
+SIGNATURE_MAX_AGE = 300
+
+
+def sign_request(secret, method, path, timestamp=None):
+    """Header value that makes the server profile ``method path``"""
+    timestamp = int(time.time() if timestamp is None else timestamp)
+    message = f"{timestamp}.{method.upper()}.{path}".encode('utf-8')
+    return f"{timestamp}.{hmac.new(secret.encode('utf-8'), message, hashlib.sha256).hexdigest()}"
+
+
+def verify_signature(secret, method, path, value, now=None):
+    if not secret or not value or '.' not in value:
+        return False
+    timestamp, _, _digest = value.partition('.')
+    try:
+        age = (time.time() if now is None else now) - int(timestamp)
+    except ValueError:
+        return False
+    if not -SIGNATURE_MAX_AGE <= age <= SIGNATURE_MAX_AGE:
+        return False
+    return hmac.compare_digest(sign_request(secret, method, path, int(timestamp)), value)
+
+
+def top_frames(profile, limit=15):
+    """The ``limit`` functions with the highest cumulative time"""
+    stats = pstats.Stats(profile, stream=io.StringIO()).stats
+    ranked = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)
+    frames = []
+    for (filename, line, name), (_cc, calls, tottime, cumtime, _callers) in ranked:
+        if name == "<method 'disable' of '_lsprof.Profiler' objects>":
+            continue
+        frames.append({
+            'function': f"{os.sep.join(filename.split(os.sep)[-2:])}:{line}({name})" if line else name,
+            'calls': calls,
+            'tottime_ms': round(tottime * 1000, 3),
+            'cumtime_ms': round(cumtime * 1000, 3),
+        })
+        if len(frames) == limit:
+            break
+    return frames
+
+
+class RequestProfiler:
+    """Decides which requests to profile and stores their captures"""
+
+    def __init__(self, directory=None, sample_rate=0.0, secret=None, max_profiles=200, top=15):
+        self.directory = directory or DEFAULT_PROFILE_DIR
+        self.sample_rate = sample_rate
+        self.secret = secret
+        self.max_profiles = max_profiles
+        self.top = top
+        self.index_path = os.path.join(self.directory, 'index.jsonl')
+        os.makedirs(self.directory, exist_ok=True)
+        # cProfile cannot run two captures at once (3.12+ profiles all threads)
+        self._active = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def wants(self, method, path, signature=None):
+        if signature is not None and verify_signature(self.secret, method, path, signature):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self):
+        """An enabled profiler, or None if another capture is in progress"""
+        if not self._active.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiling tool (a debugger, coverage) owns the hook
+            self._active.release()
+            return None
+        return profile
+
+    def finish(self, profile, route, method, path, status, duration):
+        profile.disable()
+        self._active.release()
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        entry = {
+            'id': profile_id,
+            'time': time.time(),
+            'route': route,
+            'method': method,
+            'path': path,
+            'status': status,
+            'duration_ms': round(duration * 1000, 2),
+            'pid': os.getpid(),
+            'top': top_frames(profile, self.top),
+        }
+        profile.dump_stats(os.path.join(self.directory, f"{profile_id}.prof"))
+        with self._write_lock:
+            with open(self.index_path, 'a') as f:
+                f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        self._prune()
+        return entry
+
+    def profile_path(self, profile_id):
+        path = os.path.join(self.directory, f"{os.path.basename(profile_id)}.prof")
+        return path if os.path.exists(path) else None
+
+    def _entries(self):
+        try:
+            with open(self.index_path, 'r') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return []
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+        return entries
+
+    def recent(self, limit=20, min_ms=0.0, route=None):
+        """Newest captures first, optionally only those slower than ``min_ms`` or for one route"""
+        entries = [e for e in reversed(self._entries())
+                   if e['duration_ms'] >= min_ms and (route is None or e['route'] == route)]
+        return entries[:limit]
+
+    def _prune(self):
+        with self._write_lock:
+            entries = self._entries()
+            if len(entries) <= self.max_profiles:
+                return
+            keep = entries[-self.max_profiles:]
+            for entry in entries[:-self.max_profiles]:
+                try:
+                    os.unlink(os.path.join(self.directory, f"{entry['id']}.prof"))
+                except OSError:
+                    pass
+            tmp_path = f"{self.index_path}.tmp-{os.getpid()}"
+            with open(tmp_path, 'w') as f:
+                f.writelines(json.dumps(e, separators=(',', ':')) + '\n' for e in keep)
+            os.replace(tmp_path, self.index_path)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 4 or sys.argv[1] != 'sign':
+        sys.exit('usage: python -m backend.profiling sign METHOD PATH')
+    secret = os.environ.get('PROFILE_SECRET')
+    if not secret:
+        sys.exit('PROFILE_SECRET is not set')
+    print(f"{SIGNATURE_HEADER}: {sign_request(secret, sys.argv[2], sys.argv[3])}")
@@ -0,0 +1,107 @@
+"""
+Pre-serialized responses for invariant GET routes and a faster JSON encoder.
+
+``StaticJSON`` serializes a payload once, keeps a gzip variant when it is
+smaller, and answers with the variant the client accepts. A strong ETag per
+variant lets clients that poll revalidate with ``If-None-Match`` and get a
+bodyless 304. ``FastJSONProvider`` serializes the dynamic routes with orjson
+when it is installed and with the standard library otherwise.
+"""
+
+import functools
+import gzip
+import hashlib
+import json
+
+from flask import Response, current_app
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import parse_accept_header, parse_etags, quote_etag
+
+try:
+    import orjson
+except ImportError:  # Optional: the standard library encoder is used instead
+    orjson = None
+
+# Flask's fallback for dates, decimals, UUIDs and dataclasses
+_default = DefaultJSONProvider.default
+
+if orjson is not None:
+    # Datetimes go through Flask's default so they keep the HTTP date format
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def dumps_bytes(obj, sort_keys=False):
+    """Compact UTF-8 JSON, with orjson when available"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS | (orjson.OPT_SORT_KEYS if sort_keys else 0))
+        except orjson.JSONEncodeError:
+            pass  # e.g. integers wider than 64 bits, which the standard library handles
+    return json.dumps(obj, default=_default, sort_keys=sort_keys, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that writes compact bytes straight into the response"""
+
+    def encode(self, obj, **kwargs):
+        """JSON bytes; every dumps and response goes through here"""
+        if orjson is None or kwargs.keys() - {'separators'}:
+            # indent and other formatting options only exist in the standard library
+            return super().dumps(obj, **kwargs).encode('utf-8')
+        return dumps_bytes(obj, sort_keys=self.sort_keys)
+
+    def dumps(self, obj, **kwargs):
+        return self.encode(obj, **kwargs).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        """Same arguments as ``jsonify``: one value, several (a list) or keywords (an object)"""
+        if args and kwargs:
+            raise TypeError('response() takes either args or kwargs, not both')
+        obj = args[0] if len(args) == 1 else (args or kwargs or None)
+        app = current_app
+        pretty = (self.compact is None and app.debug) or self.compact is False
+        body = self.encode(obj, indent=2) if pretty else self.encode(obj, separators=(',', ':'))
+        return app.response_class(body + b'\n', mimetype=self.mimetype)
+
+
+@functools.lru_cache(maxsize=256)
+def accepts_gzip(accept_encoding):
+    """Whether an Accept-Encoding value allows gzip; clients send few distinct values"""
+    return parse_accept_header(accept_encoding)['gzip'] > 0
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_etags(if_none_match):
+    return parse_etags(if_none_match)
+
+
+class StaticJSON:
+    """A JSON payload serialized and compressed once, served with ETag revalidation"""
+
+    def __init__(self, payload, max_age=0):
+        self.body = dumps_bytes(payload) + b'\n'
+        digest = hashlib.blake2b(self.body, digest_size=12).hexdigest()
+        self.etag = digest
+        # Each encoding is its own representation, so it gets its own strong tag
+        self.gzip_etag = f"{digest}-gzip"
+        compressed = gzip.compress(self.body, compresslevel=9, mtime=0)
+        self.gzip_body = compressed if len(compressed) < len(self.body) else None
+        # max-age=0 still lets clients reuse the body after a 304
+        cache_control = f"public, max-age={max_age}" if max_age > 0 else 'no-cache'
+        common = [('Cache-Control', cache_control), ('Vary', 'Accept-Encoding')]
+        self._headers = common + [('ETag', quote_etag(self.etag))]
+        self._gzip_headers = common + [('ETag', quote_etag(self.gzip_etag))]
+
+    def response(self, request):
+        use_gzip = self.gzip_body is not None and accepts_gzip(request.headers.get('Accept-Encoding', ''))
+        headers = self._gzip_headers if use_gzip else self._headers
+        if_none_match = request.headers.get('If-None-Match')
+        # Only the tag of the encoding being served: a 304 tells the client its cached body is this one
+        if if_none_match and _parse_etags(if_none_match).contains_weak(self.gzip_etag if use_gzip else self.etag):
+            return Response(status=304, headers=headers)
+        if use_gzip:
+            return Response(self.gzip_body, headers=[('Content-Type', 'application/json'), ('Content-Encoding', 'gzip'), *headers])
+        return Response(self.body, headers=[('Content-Type', 'application/json'), *headers])
+
+    def stats(self):
+        return {'bytes': len(self.body), 'gzip_bytes': len(self.gzip_body) if self.gzip_body is not None else None}
@@ -0,0 +1,171 @@
+"""
+Request coalescing ("single flight") for upstream calls.
+
+Concurrent callers asking for the same key wait on one in-flight call and
+share its result or error. With a lock directory configured, the leader in
+each worker also takes an advisory file lock for the key, so workers queue
+behind the one already calling upstream and can pick its result up from a
+shared tier (``recheck``) instead of repeating the call. Keys share a fixed
+set of ``LOCK_STRIPES`` lock files, so the directory does not grow with the
+number of distinct keys; two keys on one stripe only wait for each other.
+
+``AsyncSingleFlight`` does the same for coroutines within one event loop.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: cross-worker coalescing is unavailable
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LOCK_STRIPES = 256
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls by key within a process and, optionally, across processes"""
+
+    def __init__(self, name, lock_dir=None, lock_timeout=30.0):
+        self.name = name
+        self.lock_timeout = lock_timeout
+        self.lock_dir = None
+        if lock_dir:
+            if fcntl is None:
+                logger.warning(f"{name}: file locks unavailable on this platform; coalescing within the process only")
+            else:
+                os.makedirs(lock_dir, exist_ok=True)
+                self.lock_dir = lock_dir
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._counters = {'calls': 0, 'executions': 0, 'coalesced': 0, 'cross_worker_coalesced': 0, 'lock_timeouts': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def do(self, key, fn, recheck=None):
+        """Return ``fn()``, sharing one execution among concurrent callers with the same key.
+
+        ``recheck()`` is consulted when another worker held the key's file lock;
+        a non-None result is returned without calling ``fn``.
+        """
+        with self._lock:
+            self._counters['calls'] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self._counters['coalesced'] += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._lead(key, fn, recheck)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def _lead(self, key, fn, recheck):
+        if self.lock_dir is None:
+            self._count('executions')
+            return fn()
+
+        digest = hashlib.sha1(str(key).encode('utf-8')).hexdigest()
+        path = os.path.join(self.lock_dir, f"{self.name}-{int(digest, 16) % LOCK_STRIPES:03d}.lock")
+        with open(path, 'a') as handle:
+            contended, locked = self._acquire(handle)
+            try:
+                if contended and recheck is not None:
+                    shared = recheck()
+                    if shared is not None:
+                        self._count('cross_worker_coalesced')
+                        return shared
+                self._count('executions')
+                return fn()
+            finally:
+                if locked:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _acquire(self, handle):
+        """Take the file lock; returns (contended, locked). Gives up after lock_timeout."""
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return False, True
+        except BlockingIOError:
+            pass
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.02)
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True, True
+            except BlockingIOError:
+                continue
+        self._count('lock_timeouts')
+        return True, False
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            counters['in_flight'] = len(self._calls)
+        counters['cross_worker'] = self.lock_dir is not None
+        return counters
+
+
+class AsyncSingleFlight:
+    """Deduplicates concurrent coroutine calls by key within one event loop"""
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._counters = {'calls': 0, 'executions': 0, 'coalesced': 0}
+
+    async def do(self, key, fn):
+        """Return ``await fn()``, sharing one execution among concurrent callers with the same key"""
+        self._counters['calls'] += 1
+        future = self._calls.get(key)
+        if future is not None:
+            self._counters['coalesced'] += 1
+            # shield: one waiter going away must not cancel the others' call
+            return await asyncio.shield(future)
+
+        future = self._calls[key] = asyncio.ensure_future(fn())
+        self._counters['executions'] += 1
+
+        def done(finished):
+            self._calls.pop(key, None)
+            if not finished.cancelled():
+                # Retrieved here so a failure nobody waited for is not logged as unhandled
+                finished.exception()
+
+        future.add_done_callback(done)
+        return await asyncio.shield(future)
+
+    def stats(self):
+        return {**self._counters, 'in_flight': len(self._calls)}
@@ -0,0 +1,72 @@
+"""
+Startup timing: where the time goes while ``app.py`` is imported.
+
+``ImportTimer`` wraps ``builtins.__import__`` while it is active and records,
+for every top-level package imported for the first time, the wall time spent
+inside that import, excluding nested first imports of *other* packages
+(flask importing werkzeug is charged to werkzeug), so the rows add up to
+the total. ``python -X importtime -c "import app"`` gives the full
+per-module tree when this summary is not enough.
+"""
+
+import builtins
+import sys
+import threading
+import time
+
+
+class ImportTimer:
+    """Per top-level package import times, collected between ``start`` and ``stop``"""
+
+    def __init__(self):
+        self.packages = {}  # top-level package -> seconds
+        self._stack = []
+        self._original = None
+        self._thread = None
+        self.started = None
+        self.stopped = None
+
+    def start(self):
+        self._original = builtins.__import__
+        self._thread = threading.get_ident()
+        self.started = time.perf_counter()
+        builtins.__import__ = self._import
+        return self
+
+    def stop(self):
+        if self._original is not None and builtins.__import__ == self._import:
+            builtins.__import__ = self._original
+        self.stopped = time.perf_counter()
+        return self
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        package = name.partition('.')[0]
+        # Relative, repeated and other-thread imports are charged to whoever is importing
+        if (level or name in sys.modules or threading.get_ident() != self._thread
+                or (self._stack and self._stack[-1][0] == package)):
+            return self._original(name, globals, locals, fromlist, level)
+        frame = [package, 0.0]
+        self._stack.append(frame)
+        started = time.perf_counter()
+        try:
+            return self._original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1][1] += elapsed
+            self.packages[package] = self.packages.get(package, 0.0) + elapsed - frame[1]
+
+    def report(self, top=15):
+        """Slowest packages by self time, plus the total time the timer was running"""
+        rows = sorted(self.packages.items(), key=lambda item: item[1], reverse=True)
+        end = self.stopped or time.perf_counter()
+        return {
+            'total_ms': round((end - self.started) * 1000, 1) if self.started else None,
+            'imports_ms': round(sum(self.packages.values()) * 1000, 1),
+            'packages': [{'package': name, 'ms': round(seconds * 1000, 1)} for name, seconds in rows[:top]],
+        }
+
+
+def format_report(report):
+    return ', '.join(f"{row['package']} {row['ms']:.0f}" for row in report['packages'] if row['ms'] >= 1)
@@ -0,0 +1,161 @@
+"""
+What-if sweeps of the crop model over one or two features.
+
+``/api/predict/sweep`` holds a base sample fixed and varies one feature (a
+probability curve per crop) or two (a heatmap per crop) over evenly spaced
+values. The grid is built as one feature matrix and scored with a single
+transform and probability pass per ``chunk_rows`` grid points, so memory is
+bounded by the chunk plus the (points x classes) float32 result whatever the
+grid size.
+
+Request::
+
+    {"sample": {"nitrogen": 90, ...},
+     "vary": [{"feature": "rainfall", "min": 50, "max": 300, "steps": 26},
+              {"feature": "ph", "min": 5, "max": 8, "steps": 13}],
+     "min_probability": 0.05}
+
+Swept features may be left out of ``sample``. Only crops whose probability
+reaches ``min_probability`` somewhere on the grid, or that are the best crop
+somewhere, are returned.
+"""
+
+import math
+
+import numpy as np
+
+from backend.crop_model import FEATURES, REQUEST_FIELDS, features_from_sample
+
+DEFAULT_MAX_STEPS = 200
+DEFAULT_MAX_POINTS = 10_000
+DEFAULT_MIN_PROBABILITY = 0.05
+# Probabilities are averages of 100-ish trees; more digits only add bytes
+DECIMALS = 4
+
+
+class SweepAxis:
+    """One varied feature and its grid values"""
+
+    __slots__ = ('feature', 'field', 'index', 'values')
+
+    def __init__(self, index, low, high, steps):
+        self.index = index
+        self.feature = FEATURES[index]
+        self.field = REQUEST_FIELDS[index]
+        self.values = np.linspace(low, high, steps)
+
+
+def _feature_index(name):
+    if isinstance(name, str):
+        key = name.strip().lower()
+        for i, (feature, field) in enumerate(zip(FEATURES, REQUEST_FIELDS)):
+            if key in (feature.lower(), field):
+                return i
+    raise ValueError(f"Unknown feature {name!r}; use one of {', '.join(REQUEST_FIELDS)}")
+
+
+def _number(spec, key, position):
+    try:
+        value = float(spec[key])
+    except KeyError:
+        raise ValueError(f"vary[{position}] needs {key}") from None
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {key} in vary[{position}]") from None
+    if not math.isfinite(value):
+        raise ValueError(f"Invalid {key} in vary[{position}]")
+    return value
+
+
+class Sweep:
+    """A validated sweep request: the base row, its one or two axes and the output threshold"""
+
+    def __init__(self, base, axes, min_probability=DEFAULT_MIN_PROBABILITY):
+        self.base = np.asarray(base, dtype=np.float64)
+        self.axes = axes
+        self.min_probability = min_probability
+        self.shape = tuple(len(axis.values) for axis in axes)
+        self.points = math.prod(self.shape)
+
+    @classmethod
+    def from_request(cls, data, max_steps=DEFAULT_MAX_STEPS, max_points=DEFAULT_MAX_POINTS):
+        """Validate a request body; raises ValueError with a client-facing message"""
+        if not isinstance(data, dict):
+            raise ValueError('Expected a JSON object with sample and vary')
+        vary = data.get('vary')
+        if isinstance(vary, dict):
+            vary = [vary]
+        if not isinstance(vary, list) or not 1 <= len(vary) <= 2:
+            raise ValueError('vary must list one or two features')
+
+        axes = []
+        for position, spec in enumerate(vary):
+            if not isinstance(spec, dict):
+                raise ValueError(f"vary[{position}] must be an object with feature, min, max and steps")
+            index = _feature_index(spec.get('feature'))
+            if any(axis.index == index for axis in axes):
+                raise ValueError(f"{REQUEST_FIELDS[index]} is varied twice")
+            low, high = _number(spec, 'min', position), _number(spec, 'max', position)
+            steps = spec.get('steps')
+            if isinstance(steps, bool) or not isinstance(steps, int) or not 2 <= steps <= max_steps:
+                raise ValueError(f"steps in vary[{position}] must be an integer from 2 to {max_steps}")
+            if not high > low:
+                raise ValueError(f"max must be greater than min in vary[{position}]")
+            axes.append(SweepAxis(index, low, high, steps))
+
+        points = math.prod(len(axis.values) for axis in axes)
+        if points > max_points:
+            raise ValueError(f"Grid has {points:,} points; at most {max_points:,} are allowed")
+
+        sample = data.get('sample')
+        if not isinstance(sample, dict):
+            raise ValueError('sample must be a JSON object')
+        # Swept features need no base value
+        sample = {**{axis.field: axis.values[0] for axis in axes}, **sample}
+        base = features_from_sample(sample)
+
+        min_probability = data.get('min_probability', DEFAULT_MIN_PROBABILITY)
+        if isinstance(min_probability, bool) or not isinstance(min_probability, (int, float)) or not 0 <= min_probability <= 1:
+            raise ValueError('min_probability must be a number from 0 to 1')
+        return cls(base, axes, float(min_probability))
+
+    def rows(self, start, stop):
+        """Feature rows of grid points [start, stop) in C order over the axes"""
+        X = np.tile(self.base, (stop - start, 1))
+        for axis, bins in zip(self.axes, np.unravel_index(np.arange(start, stop), self.shape)):
+            X[:, axis.index] = axis.values[bins]
+        return X
+
+    def proba(self, engine, chunk_rows):
+        """Class probabilities shaped (*grid, classes), scored ``chunk_rows`` points at a time"""
+        out = np.empty((self.points, len(engine.classes)), dtype=np.float32)
+        for start in range(0, self.points, chunk_rows):
+            stop = min(start + chunk_rows, self.points)
+            out[start:stop] = engine.predict_proba(self.rows(start, stop))
+        return out.reshape(*self.shape, len(engine.classes))
+
+    def payload(self, classes, proba):
+        """Axes, the crops worth plotting (highest peak first), their curves or heatmaps and the best crop per point"""
+        flat = proba.reshape(-1, proba.shape[-1])
+        best = flat.argmax(axis=1)
+        peak = flat.max(axis=0)
+        keep = (peak >= self.min_probability) | (np.bincount(best, minlength=flat.shape[1]) > 0)
+        order = [int(k) for k in np.argsort(-peak, kind='stable') if keep[k]]
+        position = np.empty(flat.shape[1], dtype=np.int64)
+        position[order] = np.arange(len(order))
+        return {
+            'axes': [
+                {'feature': axis.field, 'values': np.round(axis.values, DECIMALS).tolist()}
+                for axis in self.axes
+            ],
+            'base': {
+                field: value for i, (field, value) in enumerate(zip(REQUEST_FIELDS, self.base.tolist()))
+                if all(axis.index != i for axis in self.axes)
+            },
+            'classes': [str(classes[k]) for k in order],
+            'peak': {str(classes[k]): round(float(peak[k]), DECIMALS) for k in order},
+            'probabilities': {
+                str(classes[k]): np.round(proba[..., k].astype(np.float64), DECIMALS).tolist() for k in order
+            },
+            # Index into classes, same shape as each probability curve or heatmap
+            'best': position[best].reshape(self.shape).tolist(),
+        }
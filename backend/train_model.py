@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Train the crop recommendation model and write the versioned artifact.
+
+Without ``--data`` the bundled rows in backend/crop_model.py are used. With
+one or more ``--data`` files (CSV or Parquet survey data) the files are
+streamed in chunks: the scaler sees every row and the forest is fitted on a
+uniform sample of at most ``--max-rows`` rows, so memory is bounded by the
+sample and chunk sizes rather than the dataset (see backend/training_data.py).
+
+With ``--registry`` (default $MODEL_REGISTRY_DIR) the model is published as a
+new version in that registry and made current, so running servers swap to it
+without a restart (see backend/model_registry.py); ``--no-activate`` only
+stages it.
+
+``--lookup-table`` also builds the quantized lookup table served with
+CROP_LOOKUP_TABLE=1 (see backend/lookup_table.py) before the version is
+activated.
+
+Usage:
+    python -m backend.train_model [--output PATH] [--version VERSION]
+    python -m backend.train_model --data surveys-2023.csv --data surveys-2024.parquet [--report report.json]
+    python -m backend.train_model --registry models/ --data surveys.csv
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if os.path.dirname(current_dir) not in sys.path:
+    sys.path.insert(0, os.path.dirname(current_dir))
+
+from backend.crop_model import (
+    DEFAULT_ARTIFACT_PATH, engine_path, load_artifact, load_serving_engine, save_artifact, train_artifact,
+)
+from backend.lookup_table import bins_from_model, build_for_artifact, lookup_path
+from backend.model_registry import ModelRegistry, RegistryError
+from backend.training_data import DEFAULT_CHUNK_ROWS, DEFAULT_MAX_ROWS, peak_rss_bytes, stream_training_set
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Train the crop model and write the artifact loaded by app.py')
+    parser.add_argument('--output', default=os.environ.get('CROP_MODEL_PATH', DEFAULT_ARTIFACT_PATH),
+                        help='artifact path (default: $CROP_MODEL_PATH or backend/data/crop_model.joblib)')
+    parser.add_argument('--version', default=None, help='model version string (default: UTC timestamp)')
+    parser.add_argument('--n-estimators', type=int, default=100)
+    parser.add_argument('--n-jobs', type=int, default=-1, help='parallel jobs for forest training (default: -1, all cores)')
+    parser.add_argument('--min-samples-leaf', type=int, default=1,
+                        help='minimum rows per leaf; raise it for large datasets to bound the size of the trees')
+    parser.add_argument('--data', action='append', default=[], metavar='PATH',
+                        help='CSV or Parquet training file with the seven feature columns and a label (repeatable)')
+    parser.add_argument('--label-column', default='label')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help='rows read per chunk')
+    parser.add_argument('--max-rows', type=int, default=DEFAULT_MAX_ROWS, help='rows sampled for forest training')
+    parser.add_argument('--registry', default=os.environ.get('MODEL_REGISTRY_DIR') or None,
+                        help='publish into this model registry instead of writing --output (default: $MODEL_REGISTRY_DIR)')
+    parser.add_argument('--no-activate', action='store_true', help='publish to the registry without making it current')
+    parser.add_argument('--lookup-table', action='store_true', help='also build the lookup table next to the artifact')
+    parser.add_argument('--lookup-bins', default=None, help='JSON file of per-feature bins (implies --lookup-table)')
+    parser.add_argument('--lookup-model-edges', type=int, default=None, metavar='N',
+                        help="N lookup bins per feature placed at the model's split thresholds (implies --lookup-table)")
+    parser.add_argument('--report', default=None, help='also write the timings and peak RSS as JSON to this path')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    args.lookup_table = args.lookup_table or bool(args.lookup_bins or args.lookup_model_edges)
+
+    started = time.perf_counter()
+    scaler = X = y = dataset = None
+    read_ms = 0.0
+    if args.data:
+        scaler, X, y, dataset = stream_training_set(args.data, args.chunk_rows, args.max_rows, args.label_column)
+        read_ms = (time.perf_counter() - started) * 1000
+    artifact = train_artifact(
+        X, y, version=args.version, n_estimators=args.n_estimators, n_jobs=args.n_jobs, scaler=scaler,
+        min_samples_leaf=args.min_samples_leaf, metadata={'dataset': dataset} if dataset else None,
+    )
+    train_ms = (time.perf_counter() - started) * 1000 - read_ms
+    registry = ModelRegistry(args.registry) if args.registry else None
+    if registry:
+        try:
+            # Activated only once the lookup table sits next to it
+            args.output = registry.publish(artifact, activate=not args.no_activate and not args.lookup_table)
+        except RegistryError as e:
+            print(e, file=sys.stderr)
+            return 1
+    else:
+        save_artifact(artifact, args.output)
+    total_ms = (time.perf_counter() - started) * 1000
+
+    table = None
+    if args.lookup_table:
+        bins = None
+        if args.lookup_bins:
+            with open(args.lookup_bins) as f:
+                bins = json.load(f)
+        engine, info = load_serving_engine(args.output, allow_training=False)
+        if args.lookup_model_edges:
+            bins = bins_from_model(engine, args.lookup_model_edges, bins)
+        table = build_for_artifact(args.output, bins, engine, info)
+        if registry and not args.no_activate:
+            registry.activate(artifact.version)
+
+    # Measure what a worker now pays at startup instead of training
+    started = time.perf_counter()
+    loaded = load_artifact(args.output)
+    load_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    load_serving_engine(args.output)
+    engine_ms = (time.perf_counter() - started) * 1000
+
+    print(f"Wrote crop model {loaded.version} to {args.output}")
+    if args.registry:
+        print(f"  registry: {args.registry} ({'current' if not args.no_activate else 'staged, not activated'})")
+    print(f"  features: {', '.join(loaded.features)}")
+    print(f"  classes:  {', '.join(loaded.classes)}")
+    print(f"  checksum: {loaded.checksum}")
+    print(f"  size:     {os.path.getsize(args.output) / 1024:.1f} KiB")
+    print(f"  engine:   {engine_path(args.output)} ({os.path.getsize(engine_path(args.output)) / 1024:.1f} KiB)")
+    if table is not None:
+        print(f"  lookup:   {lookup_path(args.output)} ({table.cells:,} cells, {table.coverage:.1%} answered, "
+              f"{table.nbytes / 2**20:.1f} MiB, built in {table.metadata['build_seconds']:.1f} s)")
+    if dataset:
+        print(f"  dataset:  {dataset['rows']:,} rows from {len(dataset['files'])} file(s), "
+              f"{dataset['skipped_rows']:,} skipped, forest fitted on {dataset['sampled_rows']:,}")
+        print(f"  reading and scaler: {read_ms / 1000:.1f} s, forest: {train_ms / 1000:.1f} s")
+    print(f"  in-process training: {train_ms:.1f} ms, artifact load: {load_ms:.1f} ms, engine load: {engine_ms:.1f} ms")
+    print(f"  wall time: {total_ms / 1000:.1f} s, peak RSS: {peak_rss_bytes() / 2**20:.0f} MiB")
+
+    if args.report:
+        report = {
+            'model_version': loaded.version,
+            'dataset': dataset,
+            'read_seconds': round(read_ms / 1000, 3),
+            'train_seconds': round(train_ms / 1000, 3),
+            'wall_seconds': round(total_ms / 1000, 3),
+            'peak_rss_bytes': peak_rss_bytes(),
+            'artifact_bytes': os.path.getsize(args.output),
+            'engine_bytes': os.path.getsize(engine_path(args.output)),
+        }
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+Streaming reader for large crop survey datasets.
+
+Survey files (CSV, optionally compressed, or Parquet) are read in chunks of
+``chunk_rows`` so memory stays bounded whatever the file size. Every valid
+row updates the scaler (``StandardScaler.partial_fit``); the forest, which
+needs its training set in memory, is fitted on a uniform reservoir sample of
+at most ``max_rows`` rows drawn in the same pass.
+
+Columns are matched to the seven model features by either their feature name
+(``N``, ``P``, ``K``, ...) or the /api/predict field name (``nitrogen``,
+``phosphorus``, ...), case-insensitively. Rows with a missing or non-numeric
+feature or an empty label are skipped and counted.
+"""
+
+import logging
+import os
+import sys
+
+import numpy as np
+
+from backend.crop_model import FEATURES, REQUEST_FIELDS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_ROWS = 100_000
+DEFAULT_MAX_ROWS = 1_000_000
+PARQUET_SUFFIXES = ('.parquet', '.pq')
+
+
+class SchemaError(ValueError):
+    """Raised when a dataset does not provide the model's feature and label columns"""
+
+
+def resolve_columns(columns, label_column='label'):
+    """Map the file's column names to FEATURES order; returns (feature columns, label column)"""
+    by_name = {str(c).strip().lower(): c for c in columns}
+    resolved, missing = [], []
+    for feature, field in zip(FEATURES, REQUEST_FIELDS):
+        match = by_name.get(feature.lower()) or by_name.get(field)
+        if match is None:
+            missing.append(feature if feature == field else f"{feature}/{field}")
+        resolved.append(match)
+    label = by_name.get(label_column.lower())
+    if label is None:
+        missing.append(label_column)
+    if missing:
+        raise SchemaError(f"Missing column(s) {', '.join(missing)}; found {', '.join(map(str, columns))}")
+    return resolved, label
+
+
+def _frames(path, chunk_rows, label_column):
+    """DataFrame chunks holding only the feature and label columns, in FEATURES order"""
+    import pandas as pd
+
+    if path.lower().endswith(PARQUET_SUFFIXES):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError('Parquet input needs pyarrow: pip install pyarrow') from e
+        parquet = pq.ParquetFile(path)
+        feature_columns, label = resolve_columns(parquet.schema_arrow.names, label_column)
+        for batch in parquet.iter_batches(batch_size=chunk_rows, columns=[*feature_columns, label]):
+            yield batch.to_pandas(), feature_columns, label
+        return
+
+    header = pd.read_csv(path, nrows=0).columns
+    feature_columns, label = resolve_columns(header, label_column)
+    # Everything as text first: one malformed value must not fail a whole chunk's dtype
+    reader = pd.read_csv(path, usecols=[*feature_columns, label], chunksize=chunk_rows, dtype=str, keep_default_na=True)
+    for frame in reader:
+        yield frame, feature_columns, label
+
+
+def iter_chunks(path, chunk_rows=DEFAULT_CHUNK_ROWS, label_column='label'):
+    """Yield (X float64 of shape (n, 7), y lowercase labels, skipped row count) per chunk"""
+    import pandas as pd
+
+    for frame, feature_columns, label in _frames(path, chunk_rows, label_column):
+        X = np.column_stack([pd.to_numeric(frame[c], errors='coerce').to_numpy(dtype=np.float64) for c in feature_columns])
+        y = frame[label].astype('string').str.strip().str.lower()
+        valid = np.isfinite(X).all(axis=1) & y.notna().to_numpy() & (y != '').fillna(False).to_numpy()
+        yield X[valid], y[valid].to_numpy(dtype=object), int(len(frame) - valid.sum())
+
+
+class Reservoir:
+    """Uniform sample of at most ``capacity`` rows from a stream (algorithm R, vectorized per chunk)"""
+
+    def __init__(self, capacity, n_features, seed=42):
+        self.capacity = capacity
+        self.X = np.empty((capacity, n_features), dtype=np.float32)
+        self.codes = np.empty(capacity, dtype=np.int32)
+        self.classes = []
+        self.class_counts = np.zeros(0, dtype=np.int64)
+        self._class_codes = {}
+        self.seen = 0
+        self.size = 0
+        self._rng = np.random.default_rng(seed)
+
+    def _encode(self, labels):
+        uniques, inverse = np.unique(labels, return_inverse=True)
+        mapping = np.array([self._class_codes.setdefault(str(u), len(self._class_codes)) for u in uniques], dtype=np.int32)
+        self.classes = list(self._class_codes)
+        codes = mapping[inverse]
+        counts = np.bincount(codes, minlength=len(self.classes))
+        counts[:len(self.class_counts)] += self.class_counts
+        self.class_counts = counts
+        return codes
+
+    def add(self, X, labels):
+        if len(X) == 0:
+            return
+        codes = self._encode(labels)
+        fill = min(self.capacity - self.size, len(X))
+        if fill:
+            self.X[self.size:self.size + fill] = X[:fill]
+            self.codes[self.size:self.size + fill] = codes[:fill]
+            self.size += fill
+        rest = len(X) - fill
+        if rest:
+            # Row t of the stream (1-based) replaces a random slot with probability capacity / t
+            t = self.seen + fill + np.arange(1, rest + 1)
+            keep = self._rng.random(rest) < self.capacity / t
+            slots = self._rng.integers(0, self.capacity, size=int(keep.sum()))
+            # Repeated slots keep the later row, as the sequential algorithm would
+            self.X[slots] = X[fill:][keep]
+            self.codes[slots] = codes[fill:][keep]
+        self.seen += len(X)
+
+    def sample(self):
+        """(X, y) of the rows kept, labels as strings"""
+        return self.X[:self.size], np.asarray(self.classes, dtype=object)[self.codes[:self.size]]
+
+
+def stream_training_set(paths, chunk_rows=DEFAULT_CHUNK_ROWS, max_rows=DEFAULT_MAX_ROWS, label_column='label', seed=42):
+    """One pass over ``paths``: returns (fitted scaler, X sample, y sample, dataset stats)"""
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler()
+    reservoir = Reservoir(max_rows, len(FEATURES), seed=seed)
+    skipped = 0
+    for path in paths:
+        logger.info(f"Reading {path} in chunks of {chunk_rows} rows")
+        for X, y, dropped in iter_chunks(path, chunk_rows, label_column):
+            skipped += dropped
+            if len(X) == 0:
+                continue
+            scaler.partial_fit(X)
+            reservoir.add(X, y)
+    if reservoir.seen == 0:
+        raise SchemaError(f"No valid rows in {', '.join(paths)}")
+    if len(reservoir.classes) < 2:
+        raise SchemaError(f"Need at least two crop labels, found {', '.join(reservoir.classes)}")
+
+    X, y = reservoir.sample()
+    stats = {
+        'files': [os.path.basename(p) for p in paths],
+        'rows': reservoir.seen,
+        'sampled_rows': reservoir.size,
+        'skipped_rows': skipped,
+        'class_counts': dict(sorted(zip(reservoir.classes, reservoir.class_counts.tolist()))),
+    }
+    return scaler, X, y, stats
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process so far"""
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KiB on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
@@ -0,0 +1,243 @@
+"""
+Geo-bucketed cache in front of the OpenWeatherMap lookup.
+
+Requests are bucketed into geohash cells, so every farmer in the same cell
+shares one upstream call per TTL. Expired entries are served immediately
+while a single background refresh runs (stale-while-revalidate), and the
+last-known value is served when the upstream call fails. Misses for the same
+cell are coalesced into one upstream call, and an optional SQLite tier lets
+workers share fetched cells. ``get_async`` serves the same cache from a
+coroutine, fetching with ``fetch_async`` (see ``use_async``).
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+
+from backend.cache import DiskTier, TTLCache
+
+logger = logging.getLogger(__name__)
+
+_GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash(lat, lon, precision=5):
+    """Standard geohash of (lat, lon); precision 5 is a ~4.9 km x 4.9 km cell"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+class WeatherCache:
+    """TTL + LRU cache of weather lookups keyed on geohash cell"""
+
+    def __init__(self, fetch, precision=5, ttl=600, max_stale=3600, max_entries=5000, flight=None, disk_path=None):
+        self.fetch = fetch
+        self.precision = precision
+        self.max_stale = max_stale
+        self.flight = flight
+        self._cache = TTLCache(max_entries=max_entries, ttl=ttl)
+        self.disk = None
+        if disk_path:
+            try:
+                self.disk = DiskTier(disk_path, ttl, max_entries=max_entries, table='weather')
+            except sqlite3.Error as e:
+                logger.error(f"Weather cache disk tier disabled ({disk_path}): {e}")
+        self.fetch_async = None
+        self.async_flight = None
+        self._refreshing = set()
+        self._tasks = set()
+        self._lock = threading.Lock()
+        self._counters = {
+            'hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'stale_hits': 0,
+            'fallbacks': 0,
+            'refreshes': 0,
+            'refresh_failures': 0,
+            'upstream_failures': 0,
+        }
+
+    @property
+    def ttl(self):
+        return self._cache.ttl
+
+    def cell(self, lat, lon):
+        return geohash(float(lat), float(lon), self.precision)
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def use_async(self, fetch_async, flight=None):
+        """Coroutine fetch (and AsyncSingleFlight) for get_async"""
+        self.fetch_async = fetch_async
+        self.async_flight = flight
+
+    def get(self, lat, lon):
+        """Weather for (lat, lon), served from the cell cache where possible"""
+        key = self.cell(lat, lon)
+        value, found = self._lookup(key, lat, lon, self._refresh_in_background)
+        if value is not None:
+            return value
+        self._count('misses')
+        return self._settle(self._load(key, lat, lon), found)
+
+    async def get_async(self, lat, lon):
+        """``get`` for coroutines; misses and refreshes await ``fetch_async``"""
+        key = self.cell(lat, lon)
+        value, found = self._lookup(key, lat, lon, self._refresh_async)
+        if value is not None:
+            return value
+        self._count('misses')
+        return self._settle(await self._load_async(key, lat, lon), found)
+
+    def _lookup(self, key, lat, lon, refresh):
+        """(value to serve now or None, memory entry found regardless of age)"""
+        found = self._cache.lookup(key)
+        if found is not None:
+            value, age = found
+            if age < self.ttl:
+                self._count('hits')
+                return value, found
+            if age < self.ttl + self.max_stale:
+                self._count('stale_hits')
+                refresh(key, lat, lon)
+                return value, found
+
+        shared = self._disk_lookup(key)
+        if shared is not None:
+            self._count('disk_hits')
+        return shared, found
+
+    def _settle(self, value, found):
+        if value is not None:
+            return value
+        self._count('upstream_failures')
+        if found is not None:
+            # Too old to serve as a matter of course, but better than nothing
+            self._count('fallbacks')
+            return found[0]
+        return None
+
+    def _disk_lookup(self, key):
+        """Fresh value another worker stored in the shared tier, promoted into memory"""
+        if self.disk is None:
+            return None
+        try:
+            found = self.disk.get(key)
+        except sqlite3.Error as e:
+            logger.error(f"Weather cache disk read error: {e}")
+            return None
+        if found is None:
+            return None
+        value = json.loads(found[0])
+        self._cache.set(key, value, age=found[1])
+        return value
+
+    def _store(self, key, value):
+        if value is not None:
+            self._cache.set(key, value)
+            if self.disk is not None:
+                try:
+                    self.disk.set(key, json.dumps(value))
+                except sqlite3.Error as e:
+                    logger.error(f"Weather cache disk write error: {e}")
+        return value
+
+    def _fetch_and_store(self, key, lat, lon):
+        return self._store(key, self.fetch(lat, lon))
+
+    async def _load_async(self, key, lat, lon):
+        async def fetch_and_store():
+            return self._store(key, await self.fetch_async(lat, lon))
+
+        if self.async_flight is None:
+            return await fetch_and_store()
+        return await self.async_flight.do(key, fetch_and_store)
+
+    def _load(self, key, lat, lon):
+        """Fetch one cell, coalescing concurrent misses and refreshes for it"""
+        if self.flight is None:
+            return self._fetch_and_store(key, lat, lon)
+        return self.flight.do(key, lambda: self._fetch_and_store(key, lat, lon), recheck=lambda: self._disk_lookup(key))
+
+    def _refresh_in_background(self, key, lat, lon):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        threading.Thread(target=self._refresh, args=(key, lat, lon), name=f'weather-refresh-{key}', daemon=True).start()
+
+    def _refresh(self, key, lat, lon):
+        try:
+            self._refreshed(self._load(key, lat, lon))
+        except Exception as e:
+            logger.error(f"Weather cache refresh error for {key}: {e}")
+            self._count('refresh_failures')
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _refresh_async(self, key, lat, lon):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        # Tasks are only weakly referenced by the loop; keep them alive until done
+        task = asyncio.get_running_loop().create_task(self._refresh_task(key, lat, lon))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh_task(self, key, lat, lon):
+        try:
+            self._refreshed(await self._load_async(key, lat, lon))
+        except Exception as e:
+            logger.error(f"Weather cache refresh error for {key}: {e}")
+            self._count('refresh_failures')
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _refreshed(self, value):
+        self._count('refreshes' if value is not None else 'refresh_failures')
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            refreshing = len(self._refreshing)
+        served = counters['hits'] + counters['disk_hits'] + counters['stale_hits']
+        lookups = served + counters['misses']
+        counters.update({
+            'hit_ratio': round(served / lookups, 4) if lookups else None,
+            'entries': len(self._cache),
+            'evictions': self._cache.evictions,
+            'refreshing': refreshing,
+            'precision': self.precision,
+            'ttl_seconds': self.ttl,
+            'max_stale_seconds': self.max_stale,
+            'disk_path': self.disk.path if self.disk is not None else None,
+        })
+        return counters
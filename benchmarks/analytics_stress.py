@@ -0,0 +1,104 @@
+"""
+Multi-process stress test for the shared analytics counters.
+
+Forks several workers from one parent-created AnalyticsManager (as gunicorn
+does with --preload), has each hammer record_prediction from a few threads,
+and checks that the shared totals grew by exactly the number of recorded
+predictions, overall and per crop, and that the rollup buckets agree.
+Exits non-zero if any increment was lost.
+
+    python benchmarks/analytics_stress.py --processes 8 --threads 4 --events 5000
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.analytics import AnalyticsManager  # noqa: E402
+
+CROPS = ['Rice', 'Maize', 'Chickpea', 'Cotton', 'Coffee']
+
+
+def worker(manager, index, threads, events, failures, ready):
+    def hammer(offset):
+        for i in range(events):
+            manager.record_prediction(CROPS[(offset + i) % len(CROPS)], 0.9, success=(i % 10 != 0))
+
+    ready.wait()
+    pool = [threading.Thread(target=hammer, args=(index + t,)) for t in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    # Forked children skip atexit handlers; flush the tail explicitly
+    manager.flush()
+    if manager.stats()['pending']:
+        failures.value += 1
+
+
+def expected_counts(processes, threads, events):
+    total = processes * threads * events
+    successful = processes * threads * sum(1 for i in range(events) if i % 10 != 0)
+    crops = dict.fromkeys(CROPS, 0)
+    for p in range(processes):
+        for t in range(threads):
+            for i in range(events):
+                crops[CROPS[(p + t + i) % len(CROPS)]] += 1
+    return total, successful, crops
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--events', type=int, default=5000, help='record_prediction calls per thread')
+    parser.add_argument('--flush-interval', type=float, default=0.05)
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context('fork')
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = AnalyticsManager(os.path.join(tmp, 'analytics.sqlite3'), flush_interval=args.flush_interval, legacy_path=None)
+        before = manager.snapshot()
+        failures = ctx.Value('i', 0)
+        ready = ctx.Event()
+        procs = [ctx.Process(target=worker, args=(manager, p, args.threads, args.events, failures, ready))
+                 for p in range(args.processes)]
+        for p in procs:
+            p.start()
+        started = time.perf_counter()
+        ready.set()
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - started
+        after = manager.snapshot()
+        rollups = {resolution: manager.window(resolution, 2)['predictions'] for resolution in ('minute', 'hour', 'day')}
+
+    total, successful, crops = expected_counts(args.processes, args.threads, args.events)
+    got_total = after['total_predictions'] - before['total_predictions']
+    got_successful = after['successful_predictions'] - before['successful_predictions']
+    got_crops = {c: after['crop_predictions'].get(c, 0) - before['crop_predictions'].get(c, 0) for c in CROPS}
+
+    print(f"{args.processes} processes x {args.threads} threads x {args.events} events in {elapsed:.2f}s "
+          f"({total / elapsed:,.0f} events/s)")
+    print(f"  total:         expected {total:,}, got {got_total:,}")
+    print(f"  successful:    expected {successful:,}, got {got_successful:,}")
+    for crop in CROPS:
+        print(f"  {crop:<14} expected {crops[crop]:,}, got {got_crops[crop]:,}")
+    for resolution, got in rollups.items():
+        print(f"  {resolution + ' rollup':<14} expected {total:,}, got {got:,}")
+
+    ok = (got_total == total and got_successful == successful and got_crops == crops
+          and all(got == total for got in rollups.values())
+          and failures.value == 0 and all(p.exitcode == 0 for p in procs))
+    print('OK: no increments lost' if ok else 'FAIL: increments lost')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""
+/api/advisory against the frontend's three sequential calls.
+
+Runs the Flask app in-process against the OpenWeatherMap and Gemini stand-ins
+(benchmarks/standins.py) with ``--weather-latency`` and ``--gemini-latency``
+and adds ``--rtt`` of client round-trip time to every HTTP call, as a phone on
+a cellular network would see. Each scenario uses fresh coordinates and soil
+inputs so neither the weather nor the chat cache answers:
+
+- weather needed: /api/weather, then /api/predict, then /api/chatbot, against
+  one /api/advisory call whose stages must run in that order;
+- temperature and humidity known: the same, but the advisory overlaps weather
+  with prediction and explanation;
+- Gemini slower than its deadline, and weather slower than its deadline: the
+  advisory must answer by the deadline with the stages that finished.
+
+Exits 1 if the overlapped advisory is not faster than the slowest stage plus
+``--slack``, if a deadline is overshot by more than ``--slack`` or if a
+timed-out response does not carry the stages that finished.
+
+    python benchmarks/bench_advisory.py --weather-latency 0.4 --gemini-latency 1.2 --rtt 0.15
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from standins import start_gemini_standin, start_weather_standin  # noqa: E402
+
+_fields = itertools.count()
+
+
+def fresh_request():
+    """Coordinates and soil inputs no earlier request used"""
+    n = next(_fields)
+    return {
+        'latitude': 10 + n * 0.5, 'longitude': 70 + n * 0.5,
+        'nitrogen': 40 + n * 3, 'phosphorus': 40, 'potassium': 40, 'ph': 6.5, 'rainfall': 150,
+    }
+
+
+def call(client, rtt, path, body):
+    time.sleep(rtt)
+    response = client.post(path, json=body)
+    return response.status_code, response.get_json()
+
+
+def sequential(client, rtt, body):
+    """What the frontend does today; returns elapsed seconds"""
+    started = time.perf_counter()
+    weather = body.get('temperature') is None and call(client, rtt, '/api/weather', body)[1]['weather']
+    sample = {**body, **({k: weather[k] for k in ('temperature', 'humidity')} if weather else {})}
+    crop = call(client, rtt, '/api/predict', sample)[1]['prediction']['crop']
+    call(client, rtt, '/api/chatbot', {'message': f"Why grow {crop} here? ({body['nitrogen']})"})
+    if body.get('temperature') is not None:
+        call(client, rtt, '/api/weather', body)
+    return time.perf_counter() - started
+
+
+def advisory(client, rtt, body):
+    started = time.perf_counter()
+    status, result = call(client, rtt, '/api/advisory', body)
+    return time.perf_counter() - started, status, result
+
+
+def describe(result):
+    return ', '.join(
+        f"{name} {stage['status']}" + (f" @{stage['start_ms']:.0f}+{stage['duration_ms']:.0f} ms" if 'duration_ms' in stage else '')
+        for name, stage in result['stages'].items()
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare /api/advisory with sequential weather, predict and chatbot calls')
+    parser.add_argument('--weather-latency', type=float, default=0.4)
+    parser.add_argument('--gemini-latency', type=float, default=1.2)
+    parser.add_argument('--rtt', type=float, default=0.15, help='client round-trip time added per HTTP call')
+    parser.add_argument('--slack', type=float, default=0.3, help='allowed overshoot in seconds')
+    args = parser.parse_args()
+
+    weather_standin = start_weather_standin(latency=args.weather_latency)
+    gemini_standin = start_gemini_standin(latency=args.gemini_latency)
+    workdir = tempfile.mkdtemp()
+    os.environ.update({
+        'WEATHER_API_URL': weather_standin.url, 'WEATHER_API_KEY': 'test',
+        'GEMINI_API_ENDPOINT': gemini_standin.url, 'GEMINI_API_KEY': 'test',
+        'ANALYTICS_DB_PATH': os.path.join(workdir, 'analytics.sqlite3'),
+        'METRICS_DIR': os.path.join(workdir, 'metrics'),
+    })
+    import app as app_module
+
+    client = app_module.app.test_client()
+    # Imports the Gemini SDK and opens connections outside the timed runs
+    advisory(client, 0, fresh_request())
+    failed = []
+
+    body = fresh_request()
+    seq_s = sequential(client, args.rtt, body)
+    adv_s, _, result = advisory(client, args.rtt, fresh_request())
+    print(f"weather needed:        sequential {seq_s * 1000:.0f} ms, advisory {adv_s * 1000:.0f} ms ({describe(result)})")
+
+    known = {'temperature': 27, 'humidity': 70}
+    seq_s = sequential(client, args.rtt, {**fresh_request(), **known})
+    adv_s, _, result = advisory(client, args.rtt, {**fresh_request(), **known})
+    slowest = max(args.weather_latency, args.gemini_latency) * 1.2 + args.rtt
+    print(f"temperature known:     sequential {seq_s * 1000:.0f} ms, advisory {adv_s * 1000:.0f} ms ({describe(result)})")
+    if result['partial'] or adv_s > slowest + args.slack:
+        failed.append('overlapped advisory is not bounded by its slowest stage')
+
+    deadlines = app_module.ADVISORY_DEADLINES
+    deadlines['explanation'] = args.gemini_latency / 2
+    adv_s, status, result = advisory(client, args.rtt, fresh_request())
+    bound = args.weather_latency * 1.2 + deadlines['explanation'] + args.rtt
+    print(f"Gemini past deadline:  advisory {adv_s * 1000:.0f} ms, partial={result['partial']} ({describe(result)})")
+    if status != 200 or result['prediction'] is None or result['weather'] is None or result['stages']['explanation']['status'] != 'timeout':
+        failed.append('a Gemini timeout did not return weather and prediction')
+    if adv_s > bound + args.slack:
+        failed.append(f"Gemini timeout answered after {adv_s:.2f}s, over {bound:.2f}s")
+
+    deadlines['explanation'] = args.gemini_latency * 3
+    deadlines['weather'] = args.weather_latency / 2
+    adv_s, status, result = advisory(client, args.rtt, fresh_request())
+    print(f"weather past deadline: advisory {adv_s * 1000:.0f} ms, partial={result['partial']} ({describe(result)})")
+    if status != 200 or result['stages']['weather']['status'] != 'timeout' or result['stages']['prediction']['status'] != 'skipped':
+        failed.append('a weather timeout did not skip the prediction')
+    if adv_s > deadlines['weather'] + args.rtt + args.slack:
+        failed.append(f"weather timeout answered after {adv_s:.2f}s")
+
+    for reason in failed:
+        print(f"FAIL: {reason}")
+    print('FAIL' if failed else 'OK')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
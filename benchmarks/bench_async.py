@@ -0,0 +1,186 @@
+"""
+Sustained concurrency of the async serving mode against the sync one.
+
+Serves the app twice against the local stand-ins: with gthread workers
+(app:app) and with aiohttp workers (async_app:app), both through
+gunicorn.conf.py with the same number of processes. Each is driven with
+``--clients`` concurrent closed-loop clients on /api/chatbot and
+/api/weather, using distinct questions and locations so every request
+misses the caches and waits on the stand-in. The sync mode cannot keep up
+with that many clients, so most of its requests time out; its errors are
+reported but only the async mode's are checked. Sustained concurrency is the
+average number of calls the stand-in had in flight during the measured
+window (its busy time over wall time), so requests queued in front of a
+saturated server do not count. Exits 1 if the async mode sustains less than
+``--min-gain`` times the concurrency of the sync mode on a route, or errors
+on more than 1% of requests. Past a point the ceiling is CPU: parsing,
+JSON and the load generator itself share the machine, so more cores reach
+higher concurrency. Needs aiohttp (requirements-async.txt).
+
+    python benchmarks/bench_async.py --clients 1000 --duration 15
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from load_test import wait_ready  # noqa: E402
+from standins import start_gemini_standin, start_weather_standin  # noqa: E402
+
+MODES = {
+    'sync': ('app:app', 'gthread'),
+    'async': ('async_app:app', 'aiohttp.GunicornWebWorker'),
+}
+
+
+def request_for(route, rng, counter):
+    if route == 'chatbot':
+        return {'message': f"How should I irrigate plot {counter} this week?", 'lang': 'en-US'}
+    # Random points over India; precision-5 cells are ~5 km, so nearly every one is new
+    return {'latitude': rng.uniform(8.0, 32.0), 'longitude': rng.uniform(69.0, 88.0)}
+
+
+async def drive(url, route, clients, duration, warmup, seed, upstream):
+    latencies, errors = [], 0
+    counter = 0
+    measure_from = time.perf_counter() + warmup
+    end = measure_from + duration
+    connector = aiohttp.TCPConnector(limit=clients)
+    timeout = aiohttp.ClientTimeout(total=30)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        async def client(index):
+            nonlocal counter, errors
+            rng = random.Random(seed * 100000 + index)
+            while time.perf_counter() < end:
+                counter += 1
+                started = time.perf_counter()
+                try:
+                    async with session.post(f"{url}/api/{route}", json=request_for(route, rng, counter)) as response:
+                        payload = await response.json(content_type=None)
+                        ok = response.status < 400 and payload.get('success', False)
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                    ok = False
+                if started >= measure_from:
+                    latencies.append(time.perf_counter() - started)
+                    errors += 0 if ok else 1
+
+        async def busy_at_measure_start():
+            await asyncio.sleep(max(0.0, measure_from - time.perf_counter()))
+            return upstream.counters['busy_seconds']
+
+        busy_start, *_ = await asyncio.gather(busy_at_measure_start(), *(client(i) for i in range(clients)))
+    elapsed = time.perf_counter() - measure_from
+    busy = upstream.counters['busy_seconds'] - busy_start
+
+    ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    throughput = len(latencies) / elapsed
+    return {
+        'requests': len(latencies),
+        'error_rate': errors / len(latencies) if latencies else 1.0,
+        'throughput_rps': throughput,
+        'concurrency': busy / elapsed,
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p99_ms': float(np.percentile(ms, 99)),
+    }
+
+
+def start_server(mode, args, weather, gemini, workdir):
+    module, worker_class = MODES[mode]
+    env = dict(os.environ)
+    env.update({
+        'PORT': str(args.port),
+        'WEB_CONCURRENCY': str(args.workers),
+        'GUNICORN_THREADS': str(args.threads),
+        'GUNICORN_WORKER_CLASS': worker_class,
+        'WEATHER_API_URL': weather.url,
+        'WEATHER_API_KEY': 'standin',
+        'GEMINI_API_ENDPOINT': gemini.url,
+        'GEMINI_API_KEY': 'standin',
+        'ANALYTICS_DB_PATH': os.path.join(workdir, f'{mode}-analytics.sqlite3'),
+        'IMAGE_STORE_DIR': os.path.join(workdir, 'images'),
+        'METRICS_DIR': os.path.join(workdir, f'{mode}-metrics'),
+    })
+    log = open(os.path.join(workdir, f'{mode}.log'), 'w')
+    # Own process group, so a forced stop takes the workers down with the master
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', module],
+                               cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+    return process, log
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare sustained concurrency of the sync and async modes')
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=15.0)
+    parser.add_argument('--warmup', type=float, default=3.0)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8, help='threads per sync (gthread) worker')
+    parser.add_argument('--routes', default='chatbot,weather')
+    parser.add_argument('--modes', default='sync,async')
+    parser.add_argument('--gemini-latency', type=float, default=2.0, help='stand-in latency in seconds')
+    parser.add_argument('--weather-latency', type=float, default=0.3, help='stand-in latency in seconds')
+    parser.add_argument('--min-gain', type=float, default=5.0, help='required async / sync sustained concurrency')
+    parser.add_argument('--port', type=int, default=8795)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    weather = start_weather_standin(args.weather_latency, seed=args.seed)
+    gemini = start_gemini_standin(args.gemini_latency, seed=args.seed)
+    routes = [r.strip() for r in args.routes.split(',') if r.strip()]
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for route in routes:
+            for mode in [m.strip() for m in args.modes.split(',') if m.strip()]:
+                # A fresh server per run, so a saturated sync server's backlog cannot spill over
+                process, log = start_server(mode, args, weather, gemini, workdir)
+                url = f"http://127.0.0.1:{args.port}"
+                try:
+                    wait_ready(url, process)
+                    upstream = gemini if route == 'chatbot' else weather
+                    summary = asyncio.run(drive(url, route, args.clients, args.duration, args.warmup, args.seed, upstream))
+                    results[(mode, route)] = summary
+                    print(f"{mode:<6} {route:<8} {summary['throughput_rps']:>8.1f} req/s  "
+                          f"concurrency {summary['concurrency']:>7.1f}/{args.clients}  "
+                          f"p50 {summary['p50_ms']:>7.1f}  p99 {summary['p99_ms']:>8.1f} ms  "
+                          f"errors {summary['error_rate']:.2%}")
+                finally:
+                    process.terminate()
+                    try:
+                        process.wait(timeout=10)
+                    except subprocess.TimeoutExpired:
+                        os.killpg(process.pid, signal.SIGKILL)
+                        process.wait()
+                    log.close()
+
+    failed = False
+    for (mode, route), summary in results.items():
+        if mode != 'async':
+            continue
+        sync = results.get(('sync', route))
+        if sync is not None:
+            gain = summary['concurrency'] / max(sync['concurrency'], 1e-9)
+            print(f"{route}: async sustains {gain:.1f}x the concurrency of sync")
+            if gain < args.min_gain:
+                print(f"FAIL: async {route} gain {gain:.1f}x is below {args.min_gain:.1f}x")
+                failed = True
+        if summary['error_rate'] > 0.01:
+            print(f"FAIL: async {route} errors on {summary['error_rate']:.2%} of requests")
+            failed = True
+    print('FAIL' if failed else 'OK')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
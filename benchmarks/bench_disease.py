@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the disease-detection classifier.
+
+Writes the deterministic synthetic sample set (backend.disease_samples) as
+JPEGs, then classifies every image through a thread pool at several pool
+sizes, reporting images/second, per-stage p50/p95 timings and accuracy.
+
+Usage:
+    python benchmarks/bench_disease.py [--per-class N] [--size PX] [--workers 1,2,4]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.disease_model import DEFAULT_DISEASE_MODEL_PATH, load_or_train_classifier
+from backend.disease_samples import write_samples
+
+
+def run(classifier, samples, workers):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda item: classifier.classify(item[1]), samples))
+    elapsed = time.perf_counter() - started
+    correct = sum(result[0] == label for result, (label, _) in zip(results, samples))
+    stages = {
+        stage: np.array([result[3][stage] for result in results])
+        for stage in ('decode_ms', 'features_ms', 'classify_ms')
+    }
+    return elapsed, correct, stages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=os.environ.get('DISEASE_MODEL_PATH', DEFAULT_DISEASE_MODEL_PATH))
+    parser.add_argument('--per-class', type=int, default=50)
+    parser.add_argument('--size', type=int, default=640, help='sample image side in pixels')
+    parser.add_argument('--seed', type=int, default=123)
+    parser.add_argument('--workers', default='1,2,4')
+    args = parser.parse_args(argv)
+
+    classifier = load_or_train_classifier(args.model)
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"Generating {args.per_class * 3} sample images of {args.size}px...")
+        samples = write_samples(directory, per_class=args.per_class, seed=args.seed, size=args.size)
+        run(classifier, samples[:6], 1)  # warm-up
+
+        print(f"\n{'workers':>8}{'images/s':>10}{'accuracy':>10}"
+              f"{'decode p50/p95':>18}{'features p50/p95':>20}{'classify p50/p95':>20}")
+        for workers in [int(w) for w in args.workers.split(',')]:
+            elapsed, correct, stages = run(classifier, samples, workers)
+            cells = ''.join(
+                f"{np.percentile(stages[s], 50):>10.2f}/{np.percentile(stages[s], 95):<7.2f}"
+                for s in ('decode_ms', 'features_ms', 'classify_ms')
+            )
+            print(f"{workers:>8}{len(samples) / elapsed:>10.1f}{correct / len(samples):>10.1%}   {cells}")
+    print("\nStage timings in ms. The sample set is synthetic, so accuracy reflects the generator, not field photos.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Equivalence check and microbenchmark for backend.inference.ForestEngine.
+
+Verifies that the flattened engine reproduces sklearn's predict_proba and
+predict on random inputs, then compares p50/p99 latency of the old
+/api/predict path (scaler.transform + predict + predict_proba) against
+ForestEngine for single rows and small batches.
+
+Usage:
+    python benchmarks/bench_inference.py [--artifact PATH] [--iterations N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.crop_model import DEFAULT_ARTIFACT_PATH, default_training_set, load_or_train
+from backend.inference import ForestEngine
+
+# Plausible ranges for N, P, K, temperature, humidity, ph, rainfall
+FEATURE_LOW = np.array([0, 0, 0, 5, 10, 3.5, 20], dtype=np.float64)
+FEATURE_HIGH = np.array([600, 300, 600, 45, 100, 9.5, 350], dtype=np.float64)
+
+
+def check_equivalence(artifact, engine, rows, seed):
+    """Return a list of mismatch descriptions (empty when equivalent)"""
+    rng = np.random.default_rng(seed)
+    X_train, _ = default_training_set()
+    X = np.vstack([
+        rng.uniform(FEATURE_LOW, FEATURE_HIGH, size=(rows, len(FEATURE_LOW))),
+        X_train,
+        # Training rows nudged a hair either side of their split thresholds
+        X_train * (1 + rng.normal(0, 1e-6, size=X_train.shape)),
+    ])
+    scaled = artifact.scaler.transform(X)
+    expected_proba = artifact.model.predict_proba(scaled)
+    expected_labels = artifact.model.predict(scaled)
+    labels, _, proba = engine.predict(X)
+
+    problems = []
+    if not np.allclose(proba, expected_proba, rtol=0, atol=1e-12):
+        problems.append(f"max probability difference {np.abs(proba - expected_proba).max():.3g}")
+    mismatched = int((labels != expected_labels).sum())
+    if mismatched:
+        problems.append(f"{mismatched} of {len(X)} labels differ")
+    return problems, len(X)
+
+
+def percentiles(fn, iterations):
+    timings = np.empty(iterations)
+    for i in range(iterations):
+        started = time.perf_counter()
+        fn()
+        timings[i] = time.perf_counter() - started
+    return np.percentile(timings, 50) * 1e6, np.percentile(timings, 99) * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--artifact', default=os.environ.get('CROP_MODEL_PATH', DEFAULT_ARTIFACT_PATH))
+    parser.add_argument('--rows', type=int, default=20000, help='random rows for the equivalence check')
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    artifact = load_or_train(args.artifact)
+    engine = ForestEngine.from_artifact(artifact)
+    print(f"Model {artifact.version}: {engine.n_trees} trees, {engine.n_nodes} nodes, depth {engine.depth}")
+
+    problems, checked = check_equivalence(artifact, engine, args.rows, args.seed)
+    if problems:
+        print(f"FAIL: engine differs from sklearn on {checked} rows: " + '; '.join(problems))
+        return 1
+    print(f"OK: engine matches sklearn predict/predict_proba on {checked} rows")
+
+    rng = np.random.default_rng(args.seed + 1)
+    scaler, model = artifact.scaler, artifact.model
+
+    def old_single():
+        row = [list(rng.uniform(FEATURE_LOW, FEATURE_HIGH))]
+        scaled = scaler.transform(row)
+        model.predict(scaled)[0]
+        float(max(model.predict_proba(scaled)[0]))
+
+    def new_single():
+        engine.predict_one(rng.uniform(FEATURE_LOW, FEATURE_HIGH))
+
+    batch = rng.uniform(FEATURE_LOW, FEATURE_HIGH, size=(16, len(FEATURE_LOW)))
+
+    cases = [
+        ('single row', old_single, new_single),
+        ('batch of 16', lambda: model.predict_proba(scaler.transform(batch)), lambda: engine.predict_proba(batch)),
+    ]
+    print(f"\n{'case':<14}{'sklearn p50':>14}{'p99':>12}{'engine p50':>14}{'p99':>12}{'p50 speedup':>14}")
+    for name, old, new in cases:
+        old_p50, old_p99 = percentiles(old, args.iterations)
+        new_p50, new_p99 = percentiles(new, args.iterations)
+        print(f"{name:<14}{old_p50:>12.0f}us{old_p99:>10.0f}us{new_p50:>12.0f}us{new_p99:>10.0f}us{old_p50 / new_p50:>13.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""
+Lookup table against the full crop model: agreement, memory and latency.
+
+Builds the lookup table for a copy of the crop model artifact (the default
+model-aligned bins, or ``--model-edges N``), then:
+
+- checks that the answered cells give the model's label at their midpoints
+  with a confidence within half the build's ``max_spread``, that vectorized
+  and per-row cell indexing agree, and that ``ServingModel`` mixes table hits
+  and model fallbacks row for row like the per-row path;
+- reports how many bundled rows, rows near them, uniform rows in the grid and
+  kit-precision readings the table answers, how often those answers disagree
+  with the model, and what the table costs in memory next to the engine;
+- times a single prediction through ``ServingModel.predict_one`` with and
+  without the table.
+
+Exits 1 if a check fails, if any sample set's disagreement exceeds
+``--max-disagreement`` or if table hits are not ``--min-speedup`` times faster
+than the engine.
+
+    python benchmarks/bench_lookup.py [--model-edges 8]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from backend.crop_model import DEFAULT_ARTIFACT_PATH, FEATURES, load_serving_engine  # noqa: E402
+from backend.lookup_table import (  # noqa: E402
+    CONFIDENCE_SCALE, DEFAULT_MAX_DISAGREEMENT, LookupTable, bins_from_model, build_for_artifact, compare,
+    lookup_path, report_samples,
+)
+from backend.model_registry import ServingModel  # noqa: E402
+
+# Reading precision of soil-test kits and weather stations, per feature
+KIT_PRECISION = {'N': 1, 'P': 1, 'K': 1, 'temperature': 0.5, 'humidity': 1, 'ph': 0.1, 'rainfall': 5}
+
+
+def kit_readings(table, rows, rng):
+    """Rows drawn from a few thousand kit-precision combinations, as repeat soil tests produce"""
+    low = np.array([e[0] for e in table.edges])
+    high = np.array([e[-1] for e in table.edges])
+    precision = np.array([KIT_PRECISION[f] for f in FEATURES])
+    distinct = np.round((low + rng.random((3000, len(FEATURES))) * (high - low)) / precision) * precision
+    return distinct[rng.integers(0, len(distinct), size=rows)]
+
+
+def time_per_call(fn, rows, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for row in rows:
+            fn(row)
+        timings.append((time.perf_counter() - started) / len(rows))
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the crop lookup table with the full model')
+    parser.add_argument('--artifact', default=DEFAULT_ARTIFACT_PATH)
+    parser.add_argument('--model-edges', type=int, default=None, metavar='N', help='bins per feature at split thresholds')
+    parser.add_argument('--samples', type=int, default=100_000)
+    parser.add_argument('--timed-rows', type=int, default=2000)
+    parser.add_argument('--max-disagreement', type=float, default=DEFAULT_MAX_DISAGREEMENT,
+                        help='allowed label disagreement on the rows the table answers')
+    parser.add_argument('--min-speedup', type=float, default=5.0, help='required engine / table time for a table hit')
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    failed = []
+
+    with tempfile.TemporaryDirectory() as workdir:
+        artifact = os.path.join(workdir, os.path.basename(args.artifact))
+        shutil.copy(args.artifact, artifact)
+        engine, info = load_serving_engine(artifact, allow_training=False)
+        bins = bins_from_model(engine, args.model_edges) if args.model_edges else None
+        table = build_for_artifact(artifact, bins, engine, info)
+        table_file_bytes = os.path.getsize(lookup_path(artifact))
+        table = LookupTable.load(lookup_path(artifact))
+
+    # Answered cells carry the model's label, and a confidence within half the allowed spread
+    cells = rng.choice(np.flatnonzero(table.codes != table.uncertain), size=20_000)
+    index = np.unravel_index(cells, table.shape)
+    midpoints = np.column_stack([(e[i] + e[i + 1]) / 2 for e, i in zip(table.edges, index)])
+    labels, confidences, _ = engine.predict(midpoints)
+    table_labels, table_confidences, hit = table.lookup(midpoints)
+    bound = table.metadata['max_spread'] / 2 + 0.5 / CONFIDENCE_SCALE + 1e-9
+    if not hit.all() or (table_labels != labels).any() or np.abs(table_confidences - confidences).max() > bound:
+        failed.append('answered cells do not match the model at their midpoints')
+
+    # Vectorized and per-row indexing, including rows on edges and outside the grid
+    edge_rows = np.column_stack([rng.choice(e, size=2000) for e in table.edges])
+    wide = report_samples(table, rows=5000)['uniform in grid'] * rng.uniform(0.8, 1.2, size=(5000, len(FEATURES)))
+    probe = np.concatenate([edge_rows, wide])
+    if (table.indices(probe) != np.array([table.index(row) for row in probe.tolist()])).any():
+        failed.append('vectorized and per-row cell indices differ')
+
+    model = ServingModel(engine, info, None, lookup=table)
+    batch_labels, batch_confidences, hits = model.predict(probe)
+    single = [model.predict_one(row) for row in probe.tolist()]
+    if list(batch_labels) != [s[0] for s in single] or not np.allclose(batch_confidences, [s[1] for s in single]):
+        failed.append('ServingModel.predict and predict_one disagree')
+    print(f"probe rows: {hits:,} of {len(probe):,} answered by the table, the rest by the model")
+
+    samples = report_samples(table, rows=args.samples)
+    samples['kit readings'] = kit_readings(table, args.samples, rng)
+    results = {name: compare(table, engine, X) for name, X in samples.items()}
+    engine_bytes = sum(a.nbytes for a in (engine.feature, engine.threshold, engine.left, engine.right, engine.leaf_values))
+    print(f"table: {table.cells:,} cells {table.shape}, {table.coverage:.1%} answered, {table.nbytes / 2**20:.2f} MiB in memory, "
+          f"{table_file_bytes / 2**20:.2f} MiB on disk, built in {table.metadata['build_seconds']:.1f} s "
+          f"(engine arrays {engine_bytes / 2**20:.2f} MiB)")
+    print(f"{'sample':<18} {'rows':>9} {'in grid':>8} {'answered':>9} {'disagree':>9} {'mean |dconf|':>13} {'max |dconf|':>12}")
+    for name, r in results.items():
+        print(f"{name:<18} {r['rows']:>9,} {r['in_grid'] / r['rows']:>8.1%} {r['answered'] / r['rows']:>9.1%} "
+              f"{r['disagreement']:>9.2%} {r['mean_confidence_error']:>13.3f} {r['max_confidence_error']:>12.3f}")
+        if r['disagreement'] > args.max_disagreement:
+            failed.append(f"{name}: disagreement above {args.max_disagreement:.2%}")
+
+    kit = samples['kit readings']
+    rows = kit[table.lookup(kit)[2]][:args.timed_rows].tolist()
+    plain = ServingModel(engine, info, None)
+    engine_s = time_per_call(plain.predict_one, rows, 3)
+    table_s = time_per_call(model.predict_one, rows, 3)
+    outside = (np.array(rows) * 2 + 500).tolist()
+    miss_s = time_per_call(model.predict_one, outside, 3)
+    print(f"predict_one: engine {engine_s * 1e6:.1f} us, table hit {table_s * 1e6:.2f} us "
+          f"({engine_s / table_s:.0f}x), table miss + engine {miss_s * 1e6:.1f} us")
+    if engine_s / table_s < args.min_speedup:
+        failed.append(f"table hits less than {args.min_speedup:.0f}x faster than the engine")
+
+    for reason in failed:
+        print(f"FAIL: {reason}")
+    print('FAIL' if failed else 'OK')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
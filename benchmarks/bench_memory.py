@@ -0,0 +1,152 @@
+"""
+Per-worker memory with and without gunicorn's preload-and-fork mode.
+
+Starts the app under gunicorn.conf.py twice, with GUNICORN_PRELOAD=1 and
+GUNICORN_PRELOAD=0, warms every worker with crop predictions and disease
+detections, then reads /proc/<pid>/smaps_rollup of each worker. USS (private
+pages) is what a worker costs on its own; PSS charges shared pages to the
+processes sharing them, so the PSS total of master plus workers is the
+footprint of the whole service. Exits 1 if preloading does not lower the
+mean worker USS. Linux only.
+
+    python benchmarks/bench_memory.py --workers 4
+"""
+
+import argparse
+import io
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from backend.disease_samples import generate_samples  # noqa: E402
+
+
+def memory(pid):
+    """USS, PSS and RSS in KiB from smaps_rollup"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return {
+        'uss': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+        'pss': fields.get('Pss', 0),
+        'rss': fields.get('Rss', 0),
+    }
+
+
+def children(pid):
+    found = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # ppid is the second field after the parenthesized command name
+        if int(stat.rsplit(')', 1)[1].split()[1]) == pid:
+            found.append(int(entry))
+    return found
+
+
+def wait_for_workers(url, master, count, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if master.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with {master.returncode}")
+        try:
+            if requests.get(f"{url}/", timeout=2).status_code == 200 and len(children(master.pid)) >= count:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"{count} workers not ready after {timeout}s")
+
+
+def warm(url, images, requests_count):
+    """Spread predictions and detections over the workers (fresh connection each)"""
+    rng = random.Random(1)
+    for i in range(requests_count):
+        sample = {'nitrogen': rng.uniform(0, 140), 'phosphorus': rng.uniform(5, 145), 'potassium': rng.uniform(5, 205),
+                  'temperature': rng.uniform(9, 43), 'humidity': rng.uniform(14, 99), 'ph': rng.uniform(3.5, 9.9),
+                  'rainfall': rng.uniform(20, 298)}
+        requests.post(f"{url}/api/predict", json=sample, timeout=30)
+        if i % 4 == 0:
+            data = images[i % len(images)]
+            requests.post(f"{url}/api/disease-detection", files={'image': ('leaf.jpg', io.BytesIO(data), 'image/jpeg')}, timeout=30)
+    requests.get(f"{url}/metrics", timeout=30)
+
+
+def measure(preload, args, images, workdir):
+    env = dict(os.environ)
+    env.update({
+        'PORT': str(args.port),
+        'WEB_CONCURRENCY': str(args.workers),
+        'GUNICORN_PRELOAD': '1' if preload else '0',
+        'ANALYTICS_DB_PATH': os.path.join(workdir, 'analytics.sqlite3'),
+        'IMAGE_STORE_DIR': os.path.join(workdir, 'images'),
+        'METRICS_DIR': os.path.join(workdir, 'metrics'),
+    })
+    url = f"http://127.0.0.1:{args.port}"
+    with open(os.path.join(workdir, f"server-{int(preload)}.log"), 'w') as log:
+        master = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                                  cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+        try:
+            wait_for_workers(url, master, args.workers)
+            warm(url, images, args.requests)
+            time.sleep(1)
+            workers = [memory(pid) for pid in children(master.pid)]
+            master_memory = memory(master.pid)
+        finally:
+            master.terminate()
+            master.wait(timeout=30)
+    return {
+        'master': master_memory,
+        'workers': workers,
+        'worker_uss_mean': sum(w['uss'] for w in workers) / len(workers),
+        'worker_rss_mean': sum(w['rss'] for w in workers) / len(workers),
+        'pss_total': master_memory['pss'] + sum(w['pss'] for w in workers),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare worker memory with and without preload')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=200, help='warm-up requests per mode')
+    parser.add_argument('--port', type=int, default=8798)
+    args = parser.parse_args()
+
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        print('smaps_rollup is not available; this benchmark needs Linux 4.14+')
+        return 1
+
+    images = [data for _, data in generate_samples(per_class=2, seed=1, size=640)]
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for preload in (False, True):
+            results[preload] = measure(preload, args, images, workdir)
+
+    print(f"{args.workers} workers, {args.requests} warm-up requests (KiB)")
+    print(f"{'mode':<12} {'worker USS':>11} {'worker RSS':>11} {'master RSS':>11} {'total PSS':>11}")
+    for preload, r in results.items():
+        print(f"{'preload' if preload else 'no preload':<12} {r['worker_uss_mean']:>11,.0f} {r['worker_rss_mean']:>11,.0f} "
+              f"{r['master']['rss']:>11,.0f} {r['pss_total']:>11,.0f}")
+    saved = results[False]['worker_uss_mean'] - results[True]['worker_uss_mean']
+    print(f"Preload saves {saved:,.0f} KiB of unique memory per worker, "
+          f"{results[False]['pss_total'] - results[True]['pss_total']:,.0f} KiB in total")
+    return 0 if saved > 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
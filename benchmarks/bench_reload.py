@@ -0,0 +1,142 @@
+"""
+Hot model swap under load.
+
+Publishes two versions into a temporary model registry (the second staged,
+not activated), serves the app under gunicorn.conf.py with that registry and
+drives /api/predict with ``--clients`` closed-loop clients. A third of the
+way in it activates the second version, as
+``python -m backend.model_registry activate`` would, and records the
+model_version of every response. Exits 1 if any request fails, if any worker
+still answers with the old version ``--converge`` seconds after activation,
+or if p99 latency around the swap exceeds ``--max-p99-ratio`` times the p99
+before it.
+
+    python benchmarks/bench_reload.py --workers 2 --duration 15
+"""
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from load_test import SAMPLE_RANGES, wait_ready  # noqa: E402
+
+from backend.model_registry import ModelRegistry  # noqa: E402
+
+
+def publish(registry, version, n_estimators, activate):
+    command = [sys.executable, '-m', 'backend.train_model', '--registry', registry, '--version', version,
+               '--n-estimators', str(n_estimators)]
+    if not activate:
+        command.append('--no-activate')
+    subprocess.run(command, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+
+
+def drive(url, clients, duration, swap_at, registry, new_version):
+    records = []
+    lock = threading.Lock()
+    started = time.monotonic()
+    end = started + duration
+    swapped = {}
+
+    def client(index):
+        rng = random.Random(index)
+        session = requests.Session()
+        while time.monotonic() < end:
+            sample = {k: rng.uniform(lo, hi) for k, (lo, hi) in SAMPLE_RANGES.items()}
+            sent = time.monotonic()
+            try:
+                response = session.post(f"{url}/api/predict", json=sample, timeout=10)
+                version = response.json().get('model_version') if response.status_code == 200 else None
+            except (requests.RequestException, ValueError):
+                version = None
+            with lock:
+                records.append((sent - started, time.monotonic() - sent, version))
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    time.sleep(swap_at)
+    ModelRegistry(registry).activate(new_version)
+    swapped['at'] = time.monotonic() - started
+    for thread in threads:
+        thread.join()
+    return records, swapped['at']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Swap the crop model under load')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=15.0)
+    parser.add_argument('--watch-interval', type=float, default=1.0, help='MODEL_WATCH_INTERVAL of the server')
+    parser.add_argument('--converge', type=float, default=3.0, help='seconds after activation by which every worker must have swapped')
+    parser.add_argument('--n-estimators', type=int, default=100)
+    parser.add_argument('--max-p99-ratio', type=float, default=3.0)
+    parser.add_argument('--port', type=int, default=8796)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        registry = os.path.join(workdir, 'registry')
+        publish(registry, 'old', args.n_estimators, activate=True)
+        publish(registry, 'new', args.n_estimators, activate=False)
+
+        env = dict(os.environ)
+        env.update({
+            'PORT': str(args.port),
+            'WEB_CONCURRENCY': str(args.workers),
+            'MODEL_REGISTRY_DIR': registry,
+            'MODEL_WATCH_INTERVAL': str(args.watch_interval),
+            'ANALYTICS_DB_PATH': os.path.join(workdir, 'analytics.sqlite3'),
+            'METRICS_DIR': os.path.join(workdir, 'metrics'),
+        })
+        url = f"http://127.0.0.1:{args.port}"
+        with open(os.path.join(workdir, 'server.log'), 'w') as log:
+            server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                                      cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+            try:
+                wait_ready(url, server)
+                records, swap_at = drive(url, args.clients, args.duration, args.duration / 3, registry, 'new')
+                metrics = requests.get(f"{url}/metrics", timeout=10).text
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+
+    errors = sum(1 for _, _, version in records if version is None)
+    stale = [t for t, _, version in records if version == 'old' and t > swap_at + args.converge]
+    swapped = [t for t, _, version in records if version == 'new']
+    before = np.array([latency for t, latency, _ in records if t < swap_at]) * 1000
+    around = np.array([latency for t, latency, _ in records if swap_at <= t < swap_at + args.converge]) * 1000
+    p99_before, p99_around = np.percentile(before, 99), np.percentile(around, 99)
+
+    print(f"{len(records)} requests, {errors} failed; swap at {swap_at:.1f}s, "
+          f"first 'new' answer after {min(swapped) - swap_at:.2f}s" if swapped else "no request saw the new version")
+    print(f"p99 before swap {p99_before:.1f} ms, in the {args.converge:.0f}s after it {p99_around:.1f} ms")
+    print('\n'.join(line for line in metrics.splitlines() if line.startswith(('crop_model_', 'crop_predictions'))))
+
+    failed = False
+    if errors:
+        print(f"FAIL: {errors} requests failed")
+        failed = True
+    if not swapped or stale:
+        print(f"FAIL: {len(stale)} answers from the old model more than {args.converge:.0f}s after activation")
+        failed = True
+    if p99_around > p99_before * args.max_p99_ratio:
+        print(f"FAIL: p99 rose {p99_around / p99_before:.1f}x around the swap")
+        failed = True
+    print('FAIL' if failed else 'OK')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
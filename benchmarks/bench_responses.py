@@ -0,0 +1,116 @@
+"""
+CPU and bytes per request of the precomputed GET responses and the JSON encoder.
+
+Builds the responses of /, /api/crops, /api/diseases and /api/hackathon-info
+for a fresh request three ways: re-serializing the payload with Flask's
+default provider on every hit (what jsonify did before), serving the
+precomputed gzip variant, and answering a 304 revalidation. Then times the
+app's JSON provider against Flask's default one on the dynamic prediction
+and disease payloads. Exits 1 if the precomputed responses cost more CPU
+than re-serializing over the four routes, if gzip does not shrink the catalogs, or if the
+provider is slower than the default one.
+
+    python benchmarks/bench_responses.py --requests 5000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+from werkzeug.test import EnvironBuilder  # noqa: E402
+
+import app as crop_app  # noqa: E402
+from backend.responses import FastJSONProvider, orjson  # noqa: E402
+
+ROUTES = {
+    '/': crop_app.home_response,
+    '/api/crops': crop_app.crops_response,
+    '/api/diseases': crop_app.diseases_response,
+    '/api/hackathon-info': crop_app.hackathon_response,
+}
+
+
+def cpu_per_call(fn, count):
+    started = time.process_time()
+    for _ in range(count):
+        fn()
+    return (time.process_time() - started) / count * 1e6
+
+
+def dynamic_payloads():
+    prediction = {'success': True, **crop_app.prediction_payload('rice', 0.91, crop_app.model_holder.current.version)}
+    info = crop_app.disease_database['early_blight']
+    disease = {
+        'success': True,
+        'image_id': 'f' * 32,
+        'disease': {'name': info['name'], 'confidence': 0.87, 'severity': info['severity'], 'emoji': info['emoji']},
+        'diagnosis': {k: info[k] for k in ('description', 'treatment', 'prevention')},
+        'probabilities': {name: 1 / len(crop_app.disease_database) for name in crop_app.disease_database},
+    }
+    return {'predict': prediction, 'disease-detection': disease}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure precomputed responses and the JSON provider')
+    parser.add_argument('--requests', type=int, default=5000, help='calls per route and variant')
+    args = parser.parse_args()
+
+    flask_app = crop_app.app
+    default_provider = DefaultJSONProvider(flask_app)
+    fast_provider = FastJSONProvider(flask_app)
+    failed = False
+
+    def per_request(path, view, **headers):
+        # A fresh Request per call, so header parsing is paid every time
+        environ = EnvironBuilder(path, headers=headers).get_environ()
+        with flask_app.app_context():
+            return cpu_per_call(lambda: view(flask_app.request_class(environ)), args.requests)
+
+    totals = [0.0, 0.0]
+    print(f"{'route':<22} {'jsonify':>9} {'gzip':>9} {'304':>9}   bytes: {'plain':>6} {'gzip':>6}")
+    for path, static in ROUTES.items():
+        payload = json.loads(static.body)
+        jsonify_us = per_request(path, lambda req: default_provider.response(payload))
+        gzip_us = per_request(path, static.response, **{'Accept-Encoding': 'gzip'})
+        etag = static.gzip_etag if static.gzip_body is not None else static.etag
+        revalidate_us = per_request(path, static.response, **{'Accept-Encoding': 'gzip', 'If-None-Match': f'"{etag}"'})
+        sizes = static.stats()
+        print(f"{path:<22} {jsonify_us:>7.1f}us {gzip_us:>7.1f}us {revalidate_us:>7.1f}us   "
+              f"{sizes['bytes']:>12} {sizes['gzip_bytes'] or '-':>6}")
+        totals[0] += jsonify_us
+        totals[1] += gzip_us
+        if path != '/' and not (sizes['gzip_bytes'] and sizes['gzip_bytes'] < sizes['bytes']):
+            print(f"FAIL: no smaller gzip variant for {path}")
+            failed = True
+
+    # Summed over the routes; the smallest payloads are within noise of each other
+    if totals[1] > totals[0]:
+        print(f"FAIL: precomputed responses cost {totals[1]:.1f}us against {totals[0]:.1f}us re-serialized")
+        failed = True
+
+    print(f"\nJSON encoder ({'orjson' if orjson is not None else 'standard library'}), whole response")
+    calls = args.requests * 4
+    for name, payload in dynamic_payloads().items():
+        with flask_app.app_context():
+            default_us = cpu_per_call(lambda: default_provider.response(payload), calls)
+            fast_us = cpu_per_call(lambda: fast_provider.response(payload), calls)
+            encode_default_us = cpu_per_call(lambda: default_provider.dumps(payload, separators=(',', ':')), calls)
+            encode_fast_us = cpu_per_call(lambda: fast_provider.encode(payload), calls)
+        print(f"{name:<22} default {default_us:>5.1f}us  app {fast_us:>5.1f}us  "
+              f"(encoding alone {encode_default_us:.1f}us -> {encode_fast_us:.1f}us, {encode_default_us / encode_fast_us:.1f}x)")
+        if orjson is not None and fast_us > default_us:
+            print(f"FAIL: the app provider is slower than the default one on {name}")
+            failed = True
+
+    print('FAIL' if failed else 'OK')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
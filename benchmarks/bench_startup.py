@@ -0,0 +1,84 @@
+"""
+Cold-start budget check for ``import app``.
+
+Imports the app in fresh interpreters, reports the median import time with
+the per-package breakdown from backend/startup.py, and exits 1 when the
+median is over the budget or a module that should stay off the serving path
+(sklearn, pandas, scipy, the Gemini SDK, requests) was imported.
+
+    python benchmarks/bench_startup.py --runs 5 --budget-ms 1000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded on first use (or only by the training scripts), never at import
+DEFERRED = ['sklearn', 'pandas', 'scipy', 'joblib', 'google.generativeai', 'requests']
+
+PROBE = """
+import json, sys
+import app
+print('STARTUP ' + json.dumps({
+    'timings': app.startup_timings,
+    'loaded': [m for m in %r if m in sys.modules],
+}))
+""" % (DEFERRED,)
+
+
+def run_once(env):
+    result = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env, capture_output=True, text=True, timeout=300)
+    for line in result.stdout.splitlines():
+        if line.startswith('STARTUP '):
+            return json.loads(line[len('STARTUP '):])
+    raise RuntimeError(f"import app failed ({result.returncode}):\n{result.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure app import time in fresh interpreters')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=float(os.environ.get('STARTUP_BUDGET_MS', 1000)))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env.update({
+            'ANALYTICS_DB_PATH': os.path.join(tmp, 'analytics.sqlite3'),
+            'IMAGE_STORE_DIR': os.path.join(tmp, 'images'),
+            'METRICS_DIR': os.path.join(tmp, 'metrics'),
+        })
+        runs = [run_once(env) for _ in range(args.runs)]
+
+    import_ms = statistics.median(r['timings']['import_ms'] for r in runs)
+    model_ms = statistics.median(r['timings']['model_load_ms'] for r in runs)
+    packages = {}
+    for r in runs:
+        for row in r['timings']['imports']['packages']:
+            packages.setdefault(row['package'], []).append(row['ms'])
+    loaded = sorted({m for r in runs for m in r['loaded']})
+
+    print(f"import app: median {import_ms:.1f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    print(f"  model load ({runs[0]['timings']['model_source']}): {model_ms:.1f} ms")
+    for name, values in sorted(packages.items(), key=lambda item: -statistics.median(item[1]))[:12]:
+        print(f"  {name:<20} {statistics.median(values):>7.1f} ms")
+
+    ok = True
+    if import_ms > args.budget_ms:
+        print(f"FAIL: over budget by {import_ms - args.budget_ms:.1f} ms")
+        ok = False
+    if loaded:
+        print(f"FAIL: imported at startup: {', '.join(loaded)}")
+        ok = False
+    if ok:
+        print('OK')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
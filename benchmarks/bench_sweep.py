@@ -0,0 +1,111 @@
+"""
+/api/predict/sweep against calling /api/predict in a loop.
+
+For a one-feature curve and a two-feature heatmap it compares one sweep
+request with posting every grid point to /api/predict (through the Flask test
+client, so no network time is counted), checks that the sweep's best crop
+and probabilities match the per-point answers, and measures the peak memory
+of scoring the largest allowed grid in chunks against a single unchunked
+probability pass over the whole grid. Exits 1 if the answers differ or if the
+sweep is not ``--min-speedup`` times faster than the loop.
+
+    python benchmarks/bench_sweep.py
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BASE = {'nitrogen': 90, 'phosphorus': 42, 'potassium': 43, 'temperature': 21, 'humidity': 82, 'ph': 6.5, 'rainfall': 203}
+GRIDS = {
+    'curve (rainfall x 50)': [{'feature': 'rainfall', 'min': 50, 'max': 300, 'steps': 50}],
+    'heatmap (rainfall x ph, 40x40)': [
+        {'feature': 'rainfall', 'min': 50, 'max': 300, 'steps': 40},
+        {'feature': 'ph', 'min': 4, 'max': 9, 'steps': 40},
+    ],
+}
+
+
+def loop_predictions(client, vary):
+    """Best crop and its confidence at every grid point via /api/predict, in grid order"""
+    axes = [np.linspace(v['min'], v['max'], v['steps']) for v in vary]
+    answers = []
+    for point in np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, len(axes)):
+        sample = {**BASE, **{v['feature']: float(x) for v, x in zip(vary, point)}}
+        prediction = client.post('/api/predict', json=sample).get_json()['prediction']
+        answers.append((prediction['crop'], prediction['confidence']))
+    return answers
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare /api/predict/sweep with a loop over /api/predict')
+    parser.add_argument('--min-speedup', type=float, default=10.0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ.setdefault('ANALYTICS_DB_PATH', os.path.join(workdir, 'analytics.sqlite3'))
+    os.environ.setdefault('METRICS_DIR', os.path.join(workdir, 'metrics'))
+    import app as app_module
+    from backend.sweep import Sweep
+
+    client = app_module.app.test_client()
+    failed = []
+    for name, vary in GRIDS.items():
+        client.post('/api/predict/sweep', json={'sample': BASE, 'vary': vary})
+        timings = []
+        for _ in range(3):
+            started = time.perf_counter()
+            response = client.post('/api/predict/sweep', json={'sample': BASE, 'vary': vary})
+            timings.append(time.perf_counter() - started)
+        sweep_s = min(timings)
+        result = response.get_json()
+        started = time.perf_counter()
+        answers = loop_predictions(client, vary)
+        loop_s = time.perf_counter() - started
+
+        best = [result['classes'][i] for i in np.ravel(result['best'])]
+        confidence = [np.ravel(result['probabilities'][crop])[i] for i, crop in enumerate(best)]
+        mismatched = sum(crop != expected for crop, (expected, _) in zip(best, answers))
+        error = max(abs(c - expected) for c, (_, expected) in zip(confidence, answers))
+        print(f"{name}: {result['points']:,} points, sweep {sweep_s * 1000:.1f} ms ({len(response.data) / 1024:.0f} KiB), "
+              f"/api/predict loop {loop_s * 1000:.0f} ms ({loop_s / sweep_s:.0f}x); "
+              f"{mismatched} best-crop mismatches, max confidence difference {error:.4f}")
+        if mismatched or error > 1e-4:
+            failed.append(f"{name}: sweep differs from /api/predict")
+        if loop_s / sweep_s < args.min_speedup:
+            failed.append(f"{name}: sweep less than {args.min_speedup:.0f}x faster than the loop")
+
+    # Memory of the largest allowed grid: bounded by the chunk, not the grid
+    side = int(app_module.SWEEP_MAX_POINTS ** 0.5)
+    sweep = Sweep.from_request({'sample': BASE, 'vary': [
+        {'feature': 'rainfall', 'min': 50, 'max': 300, 'steps': side},
+        {'feature': 'nitrogen', 'min': 0, 'max': 140, 'steps': side},
+    ]}, max_points=app_module.SWEEP_MAX_POINTS)
+    engine = app_module.model_holder.current.engine
+    runs = [(f"chunks of {n:,}", lambda n=n: sweep.proba(engine, n)) for n in (1000, app_module.BATCH_CHUNK_ROWS)]
+    runs.append(('one unchunked pass', lambda: engine.predict_proba(sweep.rows(0, sweep.points), chunk_rows=sweep.points)))
+    for label, run in runs:
+        tracemalloc.start()
+        started = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{sweep.points:,}-point grid, {label}: {elapsed * 1000:.0f} ms, peak {peak / 2**20:.1f} MiB")
+
+    for reason in failed:
+        print(f"FAIL: {reason}")
+    print('FAIL' if failed else 'OK')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+Wall time and peak memory of streaming training by dataset size.
+
+Writes synthetic survey CSVs of each ``--sizes`` row count (rows scattered
+around the bundled training rows, with /api/predict column names and a few
+malformed rows), then runs ``python -m backend.train_model --data`` on each in
+its own process and reads back its report. For comparison it also measures
+the peak RSS of loading the whole file with ``pandas.read_csv``, which is what
+training on the full dataset in memory would start from. Exits 1 if peak RSS
+grows by more than ``--max-growth`` from the smallest to the largest dataset:
+once a dataset exceeds ``--max-rows`` only the reservoir sample is held.
+
+    python benchmarks/bench_training.py --sizes 200000,1000000,3000000
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from backend.crop_model import FEATURES, REQUEST_FIELDS, TRAINING_DATA  # noqa: E402
+
+FULL_LOAD = (
+    "import resource, sys, pandas as pd; df = pd.read_csv(sys.argv[1]); "
+    "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)"
+)
+
+
+def write_survey(path, rows, seed=1, chunk_rows=200_000):
+    """CSV of ``rows`` noisy copies of the bundled rows; about 1 in 2000 rows is malformed"""
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    base = np.column_stack([np.asarray(TRAINING_DATA[f], dtype=np.float64) for f in FEATURES])
+    labels = np.asarray(TRAINING_DATA['label'])
+    spread = base.std(axis=0) * 0.08
+    written = 0
+    while written < rows:
+        n = min(chunk_rows, rows - written)
+        picks = rng.integers(0, len(base), size=n)
+        X = np.abs(base[picks] + rng.normal(0, 1, size=(n, len(FEATURES))) * spread)
+        frame = pd.DataFrame(np.round(X, 2), columns=REQUEST_FIELDS)
+        frame['label'] = labels[picks]
+        frame['ph'] = frame['ph'].astype(object)
+        frame.loc[rng.random(n) < 0.0005, 'ph'] = 'n/a'
+        frame.to_csv(path, mode='a', header=written == 0, index=False)
+        written += n
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure streaming training by dataset size')
+    parser.add_argument('--sizes', default='200000,1000000,3000000', help='comma-separated row counts')
+    parser.add_argument('--max-rows', type=int, default=200_000, help='forest training sample (train_model --max-rows)')
+    parser.add_argument('--chunk-rows', type=int, default=100_000)
+    parser.add_argument('--n-estimators', type=int, default=20)
+    parser.add_argument('--min-samples-leaf', type=int, default=5)
+    parser.add_argument('--max-growth', type=float, default=1.25, help='allowed peak RSS ratio, largest / smallest dataset')
+    parser.add_argument('--skip-full-load', action='store_true', help='do not measure the whole-file pandas load')
+    args = parser.parse_args()
+
+    sizes = sorted(int(s) for s in args.sizes.split(','))
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in sizes:
+            data = os.path.join(workdir, f'survey-{rows}.csv')
+            write_survey(data, rows)
+            report_path = os.path.join(workdir, f'report-{rows}.json')
+            subprocess.run(
+                [sys.executable, '-m', 'backend.train_model', '--data', data, '--report', report_path,
+                 '--output', os.path.join(workdir, f'model-{rows}.joblib'), '--version', f'bench-{rows}',
+                 '--max-rows', str(args.max_rows), '--chunk-rows', str(args.chunk_rows),
+                 '--n-estimators', str(args.n_estimators), '--min-samples-leaf', str(args.min_samples_leaf)],
+                cwd=ROOT, check=True, stdout=subprocess.DEVNULL,
+            )
+            with open(report_path) as f:
+                report = json.load(f)
+            full_load = None
+            if not args.skip_full_load:
+                out = subprocess.run([sys.executable, '-c', FULL_LOAD, data], check=True, capture_output=True, text=True)
+                full_load = int(out.stdout.strip())
+            results.append((rows, os.path.getsize(data), report, full_load))
+            os.remove(data)
+
+    print(f"{'rows':>10} {'file MiB':>9} {'read s':>7} {'forest s':>9} {'wall s':>7} {'peak RSS MiB':>13} {'full load MiB':>14} {'skipped':>8}")
+    for rows, size, report, full_load in results:
+        full = f"{full_load / 2**20:>14.0f}" if full_load else f"{'-':>14}"
+        print(f"{rows:>10,} {size / 2**20:>9.0f} {report['read_seconds']:>7.1f} {report['train_seconds']:>9.1f} "
+              f"{report['wall_seconds']:>7.1f} {report['peak_rss_bytes'] / 2**20:>13.0f} {full} {report['dataset']['skipped_rows']:>8,}")
+
+    smallest, largest = results[0][2]['peak_rss_bytes'], results[-1][2]['peak_rss_bytes']
+    growth = largest / smallest
+    print(f"Peak RSS grows {growth:.2f}x from {sizes[0]:,} to {sizes[-1]:,} rows")
+    if growth > args.max_growth:
+        print(f"FAIL: peak RSS grew more than {args.max_growth:.2f}x")
+        return 1
+    print('OK')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,280 @@
+"""
+Offline load test for the API routes.
+
+Starts the OpenWeatherMap and Gemini stand-ins (benchmarks/standins.py),
+serves the app with gunicorn against them, then drives each route in turn
+with ``--concurrency`` closed-loop clients for ``--duration`` seconds after a
+warm-up. Throughput, error rate and p50/p95/p99 latency per route are written
+as JSON. With ``--baseline`` the run fails (exit 1) when a route's p95 grows,
+or its throughput drops, by more than ``--threshold`` against the baseline, or
+its error rate rises by more than a percentage point.
+
+    python benchmarks/load_test.py --output load.json --baseline benchmarks/baseline.json
+    python benchmarks/load_test.py --save-baseline benchmarks/baseline.json
+
+Baselines are hardware specific; record one on the machine that compares.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from backend.disease_samples import generate_samples  # noqa: E402
+from standins import start_gemini_standin, start_weather_standin  # noqa: E402
+
+ROUTES = ['predict', 'weather', 'chatbot', 'upload-image', 'disease-detection']
+
+# Training-data ranges of the crop model inputs
+SAMPLE_RANGES = {
+    'nitrogen': (0, 140), 'phosphorus': (5, 145), 'potassium': (5, 205),
+    'temperature': (9, 43), 'humidity': (14, 99), 'ph': (3.5, 9.9), 'rainfall': (20, 298),
+}
+QUESTIONS = [
+    'How do I control aphids on mustard?', 'When should I sow wheat in Punjab?',
+    'What fertilizer suits paddy at tillering?', 'How much water does cotton need?',
+    'How do I improve soil organic carbon?', 'Which maize hybrids tolerate drought?',
+    'How do I treat early blight on tomato?', 'What is the right pH for chickpea?',
+]
+
+
+class RouteDriver:
+    """Builds one request for a route; ``distinct`` bounds how many different inputs are used"""
+
+    def __init__(self, base_url, images, weather_cells, chat_questions):
+        self.base_url = base_url.rstrip('/')
+        self.images = images
+        self.weather_cells = weather_cells
+        self.chat_questions = chat_questions
+
+    def send(self, session, route, rng):
+        url = f"{self.base_url}/api/{route}"
+        if route == 'predict':
+            sample = {k: round(rng.uniform(lo, hi), 2) for k, (lo, hi) in SAMPLE_RANGES.items()}
+            return session.post(url, json=sample, timeout=30)
+        if route == 'weather':
+            # Cells about 0.1 degrees apart, so each maps to its own cache entry
+            cell = rng.randrange(self.weather_cells)
+            return session.post(url, json={'latitude': 18.0 + (cell // 50) * 0.1, 'longitude': 73.0 + (cell % 50) * 0.1}, timeout=30)
+        if route == 'chatbot':
+            question = QUESTIONS[rng.randrange(self.chat_questions) % len(QUESTIONS)]
+            if self.chat_questions > len(QUESTIONS):
+                question = f"{question} (variant {rng.randrange(self.chat_questions)})"
+            return session.post(url, json={'message': question, 'lang': 'en-US'}, timeout=60)
+        if route == 'upload-image':
+            data = self.images[rng.randrange(len(self.images))]
+            return session.post(f"{url}?include_base64=0", files={'image': ('leaf.jpg', io.BytesIO(data), 'image/jpeg')}, timeout=30)
+        if route == 'disease-detection':
+            data = self.images[rng.randrange(len(self.images))]
+            return session.post(url, files={'image': ('leaf.jpg', io.BytesIO(data), 'image/jpeg')}, timeout=30)
+        raise ValueError(f"Unknown route {route}")
+
+
+def run_route(driver, route, concurrency, duration, warmup, seed):
+    """Closed-loop load on one route; returns its summary"""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    deadline = {}
+
+    def client(index):
+        rng = random.Random(seed * 1000 + index)
+        session = requests.Session()
+        local_latencies, local_errors = [], 0
+        while time.perf_counter() < deadline['end']:
+            started = time.perf_counter()
+            try:
+                response = driver.send(session, route, rng)
+                ok = response.status_code < 400 and response.json().get('success', True)
+            except (requests.RequestException, ValueError):
+                ok = False
+            finished = time.perf_counter()
+            if started >= deadline['measure']:
+                local_latencies.append(finished - started)
+                local_errors += 0 if ok else 1
+        with lock:
+            latencies.extend(local_latencies)
+            errors.append(local_errors)
+
+    start = time.perf_counter()
+    deadline['measure'] = start + warmup
+    deadline['end'] = start + warmup + duration
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - deadline['measure']
+
+    count = len(latencies)
+    ms = np.array(latencies) * 1000 if count else np.zeros(1)
+    return {
+        'requests': count,
+        'errors': sum(errors),
+        'error_rate': round(sum(errors) / count, 4) if count else None,
+        'throughput_rps': round(count / elapsed, 2),
+        'latency_ms': {
+            'p50': round(float(np.percentile(ms, 50)), 2),
+            'p95': round(float(np.percentile(ms, 95)), 2),
+            'p99': round(float(np.percentile(ms, 99)), 2),
+            'mean': round(float(ms.mean()), 2),
+            'max': round(float(ms.max()), 2),
+        },
+    }
+
+
+def compare(results, baseline, threshold):
+    """Per-route regressions against the baseline; returns (rows, failed)"""
+    rows, failed = [], False
+    for route, current in results['routes'].items():
+        before = baseline.get('routes', {}).get(route)
+        if before is None:
+            rows.append((route, 'no baseline', ''))
+            continue
+        problems = []
+        p95, base_p95 = current['latency_ms']['p95'], before['latency_ms']['p95']
+        if base_p95 and p95 > base_p95 * (1 + threshold):
+            problems.append(f"p95 {base_p95:.1f} -> {p95:.1f} ms")
+        rps, base_rps = current['throughput_rps'], before['throughput_rps']
+        if base_rps and rps < base_rps * (1 - threshold):
+            problems.append(f"throughput {base_rps:.1f} -> {rps:.1f} req/s")
+        if (current['error_rate'] or 0) > (before['error_rate'] or 0) + 0.01:
+            problems.append(f"error rate {before['error_rate']:.2%} -> {current['error_rate']:.2%}")
+        failed = failed or bool(problems)
+        rows.append((route, 'REGRESSION' if problems else 'ok', '; '.join(problems)))
+    return rows, failed
+
+
+def wait_ready(url, process, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"App server exited with {process.returncode}")
+        try:
+            if requests.get(f"{url}/", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"App server at {url} not ready after {timeout}s")
+
+
+def start_app(args, weather, gemini, workdir):
+    env = dict(os.environ)
+    env.update({
+        'WEATHER_API_URL': weather.url,
+        'WEATHER_API_KEY': 'standin',
+        'GEMINI_API_ENDPOINT': gemini.url,
+        'GEMINI_API_KEY': 'standin',
+        'ANALYTICS_DB_PATH': os.path.join(workdir, 'analytics.sqlite3'),
+        'IMAGE_STORE_DIR': os.path.join(workdir, 'images'),
+        'METRICS_DIR': os.path.join(workdir, 'metrics'),
+    })
+    command = [
+        sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{args.port}',
+        '--workers', str(args.workers), '--threads', str(args.threads), '--worker-class', 'gthread',
+        '--timeout', '120', '--log-level', 'warning', 'app:app',
+    ]
+    log = open(os.path.join(workdir, 'server.log'), 'w')
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    return process, log
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline load test of the API routes')
+    parser.add_argument('--routes', default=','.join(ROUTES), help=f"comma-separated subset of {', '.join(ROUTES)}")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0, help='measured seconds per route')
+    parser.add_argument('--warmup', type=float, default=2.0, help='unmeasured seconds per route')
+    parser.add_argument('--server-url', help='drive an already running server instead of starting one')
+    parser.add_argument('--port', type=int, default=8799)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--weather-latency', type=float, default=0.05, help='stand-in latency in seconds')
+    parser.add_argument('--weather-error-rate', type=float, default=0.0)
+    parser.add_argument('--gemini-latency', type=float, default=0.3, help='stand-in latency in seconds')
+    parser.add_argument('--gemini-error-rate', type=float, default=0.0)
+    parser.add_argument('--weather-cells', type=int, default=200, help='distinct locations requested')
+    parser.add_argument('--chat-questions', type=int, default=8, help='distinct questions asked')
+    parser.add_argument('--image-size', type=int, default=640)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default='load_test_results.json')
+    parser.add_argument('--baseline', help='baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed relative regression')
+    parser.add_argument('--save-baseline', help='also write the results here as the new baseline')
+    args = parser.parse_args()
+
+    routes = [r.strip() for r in args.routes.split(',') if r.strip()]
+    unknown = sorted(set(routes) - set(ROUTES))
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(unknown)}")
+
+    images = [data for _, data in generate_samples(per_class=4, seed=args.seed, size=args.image_size)]
+    weather = start_weather_standin(args.weather_latency, args.weather_error_rate, seed=args.seed)
+    gemini = start_gemini_standin(args.gemini_latency, args.gemini_error_rate, seed=args.seed)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        process = log = None
+        url = args.server_url
+        if url is None:
+            url = f"http://127.0.0.1:{args.port}"
+            process, log = start_app(args, weather, gemini, workdir)
+        try:
+            wait_ready(url, process)
+            driver = RouteDriver(url, images, args.weather_cells, args.chat_questions)
+            results = {'routes': {}}
+            for route in routes:
+                summary = run_route(driver, route, args.concurrency, args.duration, args.warmup, args.seed)
+                results['routes'][route] = summary
+                lat = summary['latency_ms']
+                print(f"{route:<18} {summary['throughput_rps']:>8.1f} req/s  p50 {lat['p50']:>7.1f}  "
+                      f"p95 {lat['p95']:>7.1f}  p99 {lat['p99']:>7.1f} ms  errors {summary['errors']}/{summary['requests']}")
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=30)
+                log.close()
+
+    results['meta'] = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'config': {k: v for k, v in vars(args).items() if k not in ('output', 'baseline', 'save_baseline')},
+        'upstream_calls': {'weather': weather.counters, 'gemini': gemini.counters},
+    }
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows, failed = compare(results, baseline, args.threshold)
+        print(f"\nAgainst {args.baseline} (threshold {args.threshold:.0%}):")
+        for route, status, detail in rows:
+            print(f"  {route:<18} {status:<11} {detail}")
+        if failed:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
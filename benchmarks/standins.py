@@ -0,0 +1,192 @@
+"""
+Local stand-ins for the OpenWeatherMap and Gemini APIs.
+
+Both serve just enough of the real API for the app (``GET /weather`` and
+``generateContent`` / ``streamGenerateContent`` over REST, JSON-array or
+``alt=sse`` framing) with configurable
+latency and error rate, so load tests run offline and do not spend quota.
+Point the app at them with::
+
+    WEATHER_API_URL=http://127.0.0.1:<port> WEATHER_API_KEY=test
+    GEMINI_API_ENDPOINT=http://127.0.0.1:<port> GEMINI_API_KEY=test
+
+Run ``python benchmarks/standins.py`` to start both in the foreground.
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+_GENERATE = re.compile(r'^/v1beta/models/(?P<model>[^/:]+):(?P<method>generateContent|streamGenerateContent)$')
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connections under a load test
+    request_queue_size = 1024
+
+    def __init__(self, handler, latency=0.0, error_rate=0.0, host='127.0.0.1', port=0, seed=None):
+        super().__init__((host, port), handler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        # busy_seconds / elapsed time = average number of calls in flight
+        self.counters = {'requests': 0, 'errors': 0, 'busy_seconds': 0.0}
+
+    def handle_error(self, request, client_address):
+        # A caller that gave up mid-response is expected under overload
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name=f'standin-{self.server_address[1]}', daemon=True).start()
+        return self
+
+    def roll(self):
+        """Count a request, sleep the configured latency (+-20%) and decide whether it fails"""
+        with self.lock:
+            self.counters['requests'] += 1
+            fail = self.random.random() < self.error_rate
+            delay = self.latency * self.random.uniform(0.8, 1.2)
+            if fail:
+                self.counters['errors'] += 1
+        if delay:
+            time.sleep(delay)
+            with self.lock:
+                self.counters['busy_seconds'] += delay
+        return fail
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class WeatherHandler(_Handler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.rstrip('/').rsplit('/', 1)[-1] != 'weather':
+            return self.send_json(404, {'cod': '404', 'message': 'Not found'})
+        query = parse_qs(url.query)
+        if 'appid' not in query:
+            return self.send_json(401, {'cod': 401, 'message': 'Invalid API key'})
+        if self.server.roll():
+            return self.send_json(503, {'cod': 503, 'message': 'Service unavailable'})
+        try:
+            lat, lon = float(query['lat'][0]), float(query['lon'][0])
+        except (KeyError, ValueError):
+            return self.send_json(400, {'cod': '400', 'message': 'wrong latitude'})
+        # Deterministic per location, so cache hits and misses look alike
+        rng = random.Random(f"{lat:.3f},{lon:.3f}")
+        self.send_json(200, {
+            'coord': {'lat': lat, 'lon': lon},
+            'weather': [{'id': 800, 'main': 'Clear', 'description': rng.choice(['clear sky', 'few clouds', 'light rain'])}],
+            'main': {'temp': round(rng.uniform(15, 38), 2), 'humidity': rng.randint(30, 95), 'pressure': 1010},
+            'name': 'Standin',
+            'cod': 200,
+        })
+
+
+class GeminiHandler(_Handler):
+    words = ('Rotate crops with legumes to restore nitrogen, water early in the morning, '
+             'and test soil pH before the next sowing season.').split()
+
+    def do_POST(self):
+        match = _GENERATE.match(urlparse(self.path).path)
+        if match is None:
+            return self.send_json(404, {'error': {'code': 404, 'message': 'Not found', 'status': 'NOT_FOUND'}})
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.server.roll():
+            return self.send_json(503, {'error': {'code': 503, 'message': 'The model is overloaded.', 'status': 'UNAVAILABLE'}})
+        if match.group('method') == 'generateContent':
+            return self.send_json(200, self._response(' '.join(self.words), finish=True))
+
+        chunks = [' '.join(self.words[i:i + 4]) + ' ' for i in range(0, len(self.words), 4)]
+        if parse_qs(urlparse(self.path).query).get('alt') == ['sse']:
+            return self._stream_sse(chunks)
+        # REST streaming sends a JSON array whose elements arrive one by one
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for i, text in enumerate(chunks):
+            piece = ('[' if i == 0 else ',\r\n') + json.dumps(self._response(text, finish=i == len(chunks) - 1))
+            if i == len(chunks) - 1:
+                piece += ']'
+            data = piece.encode('utf-8')
+            self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b'\r\n')
+            self.wfile.flush()
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _stream_sse(self, chunks):
+        """``alt=sse`` framing: one ``data:`` event per response element"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for i, text in enumerate(chunks):
+            data = f"data: {json.dumps(self._response(text, finish=i == len(chunks) - 1))}\r\n\r\n".encode('utf-8')
+            self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b'\r\n')
+            self.wfile.flush()
+        self.wfile.write(b'0\r\n\r\n')
+
+    @staticmethod
+    def _response(text, finish):
+        candidate = {'content': {'parts': [{'text': text}], 'role': 'model'}, 'index': 0}
+        if finish:
+            candidate['finishReason'] = 'STOP'
+        return {'candidates': [candidate]}
+
+
+def start_weather_standin(latency=0.0, error_rate=0.0, port=0, seed=None):
+    return StandinServer(WeatherHandler, latency, error_rate, port=port, seed=seed).start()
+
+
+def start_gemini_standin(latency=0.0, error_rate=0.0, port=0, seed=None):
+    return StandinServer(GeminiHandler, latency, error_rate, port=port, seed=seed).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the OpenWeatherMap and Gemini stand-ins')
+    parser.add_argument('--weather-port', type=int, default=8701)
+    parser.add_argument('--gemini-port', type=int, default=8702)
+    parser.add_argument('--weather-latency', type=float, default=0.05, help='seconds')
+    parser.add_argument('--gemini-latency', type=float, default=0.5, help='seconds')
+    parser.add_argument('--weather-error-rate', type=float, default=0.0)
+    parser.add_argument('--gemini-error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    weather = start_weather_standin(args.weather_latency, args.weather_error_rate, args.weather_port)
+    gemini = start_gemini_standin(args.gemini_latency, args.gemini_error_rate, args.gemini_port)
+    print(f"WEATHER_API_URL={weather.url} WEATHER_API_KEY=test")
+    print(f"GEMINI_API_ENDPOINT={gemini.url} GEMINI_API_KEY=test")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
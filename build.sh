@@ -7,4 +7,11 @@ echo "Starting Render build process..."
 echo "Installing Python dependencies..."
 pip install -r requirements.txt
 
+# Train the crop model; also writes the .engine.npz workers load without sklearn
+echo "Training crop model artifact..."
+python -m backend.train_model
+
+# The disease classifier ships trained (backend/data/disease_model.npz); retrain
+# it with `python -m backend.train_disease_model` after changing the features
+
 echo "Build completed successfully!"
@@ -62,20 +62,11 @@ const DiseaseDetection = () => {
     setApiError(null);
     
     try {
-      // First upload the image to get base64
+      // Send the image straight to disease detection as multipart
       const formData = new FormData();
       formData.append('image', selectedImage);
       
-      const uploadResponse = await api.postFormData('/api/upload-image', formData);
-      
-      if (!uploadResponse.success) {
-        throw new Error("Failed to upload image");
-      }
-
-      // Then analyze the image for disease detection
-      const analysisResponse = await api.post('/api/disease-detection', {
-        image_base64: uploadResponse.image_base64
-      });
+      const analysisResponse = await api.postFormData('/api/disease-detection', formData);
 
       if (analysisResponse.success) {
         const diseaseData = analysisResponse.disease;
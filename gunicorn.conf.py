@@ -0,0 +1,64 @@
+"""
+Production gunicorn settings; gunicorn reads this file from the working directory.
+
+The app is imported once in the master (``preload_app``) and workers are
+forked from it, so the crop engine, the disease classifier, the crop and
+disease databases and every imported module live in pages the workers share
+copy-on-write. ``gc.freeze()`` keeps the collector in the workers from
+touching, and so copying, those objects.
+
+Workers are ``gthread``: threads overlap the Gemini and weather calls, which
+mostly wait on the network, while one process per CPU spreads the GIL-bound
+forest scoring and image decoding. Override with WEB_CONCURRENCY,
+GUNICORN_THREADS and GUNICORN_TIMEOUT, or set GUNICORN_PRELOAD=0 to import
+the app in every worker instead. For the async mode in async_app.py set
+GUNICORN_WORKER_CLASS=aiohttp.GunicornWebWorker. benchmarks/bench_memory.py measures the
+per-worker memory of both modes. SIGHUP to a worker reloads its crop model;
+SIGHUP to the master replaces the workers.
+"""
+
+import gc
+import os
+
+
+def _cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+# At least two, so one worker restarting never leaves the service unavailable
+workers = int(os.environ.get('WEB_CONCURRENCY', max(2, _cpus())))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+# Streamed chatbot answers can run long; gthread workers heartbeat from their main thread
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+# Heartbeat files on tmpfs; a disk-backed /tmp can stall workers under I/O load
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+
+
+def when_ready(server):
+    if preload_app:
+        # Everything allocated while importing the app is shared with the workers
+        gc.freeze()
+    concurrency = f" x {threads} threads" if worker_class == 'gthread' else ''
+    server.log.info(f"Serving with {workers} {worker_class} workers{concurrency} (preload: {preload_app})")
+
+
+def post_fork(server, worker):
+    # Imports the app here when it was not preloaded; the worker reuses that module
+    from app import init_worker
+    init_worker()
+
+
+def post_worker_init(worker):
+    # After the worker installed its own signal handlers, which reset SIGHUP
+    from app import install_reload_signal
+    install_reload_signal()
@@ -16,7 +16,7 @@ def main():
     """Main function to start the Flask app."""
     try:
         # Import the Flask app
-        from app import app
+        from app import MODEL_WATCH_INTERVAL, app, model_holder
         
         # Get port from environment or default to 5000
         port = int(os.environ.get('PORT', 5000))
@@ -24,7 +24,8 @@ def main():
         print(f"Starting AI Crop Advisor on port {port}")
         print(f"Current directory: {os.getcwd()}")
         
-        # Run the app
+        # Run the app; pick up crop model versions activated in the registry
+        model_holder.start_watcher(MODEL_WATCH_INTERVAL)
         app.run(host='0.0.0.0', port=port, debug=False)
         
     except ImportError as e:
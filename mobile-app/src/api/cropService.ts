@@ -214,34 +214,17 @@ export const cropService = {
       // Append the image to FormData
       formData.append('image', imageFile as any);
 
-      console.log('Uploading image to:', `${apiUrl}/upload-image`);
+      console.log('Uploading image to:', `${apiUrl}/disease-detection`);
       
-      // First upload the image
-      const uploadResponse = await axios.post(`${apiUrl}/upload-image`, formData, {
+      // Send the image straight to disease detection as multipart; the server
+      // stores it by content hash, so no base64 round trip is needed
+      const diseaseResponse = await axios.post(`${apiUrl}/disease-detection`, formData, {
         headers: {
           'Content-Type': 'multipart/form-data',
         },
         timeout: 15000, // Reduced timeout for faster fallback
       });
 
-      console.log('Image upload response:', uploadResponse.data);
-
-      if (!uploadResponse.data.success || !uploadResponse.data.image_base64) {
-        throw new Error('Failed to upload image or get base64 data');
-      }
-
-      console.log('Sending to disease detection endpoint');
-      
-      // Then detect disease using the uploaded image
-      const diseaseResponse = await axios.post(`${apiUrl}/disease-detection`, {
-        image_base64: uploadResponse.data.image_base64,
-      }, {
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        timeout: 15000, // Reduced timeout for faster fallback
-      });
-
       console.log('Disease detection response:', diseaseResponse.data);
 
       if (!diseaseResponse.data.success) {
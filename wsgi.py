@@ -17,5 +17,7 @@ except ImportError as e:
     raise
 
 if __name__ == "__main__":
+    from app import MODEL_WATCH_INTERVAL, model_holder
+    model_holder.start_watcher(MODEL_WATCH_INTERVAL)
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port)